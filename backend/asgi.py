@@ -11,6 +11,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings.prod')
 
 application = get_asgi_application()
+
+# Compile notification templates before the first request; a no-op if the
+# database is not reachable yet
+from notifications.services import warm_notification_templates  # noqa: E402
+
+warm_notification_templates()
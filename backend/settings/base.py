@@ -149,6 +149,10 @@ CLOUDINARY_STORAGE = {
 }
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Direct-to-storage uploads (core.uploads); clients upload with short-lived signed tickets
+DIRECT_UPLOAD_BACKEND = env('DIRECT_UPLOAD_BACKEND', default='core.uploads.CloudinaryDirectUpload')
+UPLOAD_TICKET_MAX_AGE = env.int('UPLOAD_TICKET_MAX_AGE', default=15 * 60)
+
 # Paystack
 PAYSTACK_SECRET_KEY = env('PAYSTACK_SECRET_KEY', default='')
 PAYSTACK_PUBLIC_KEY = env('PAYSTACK_PUBLIC_KEY', default='')
@@ -214,6 +218,9 @@ else:
     }
 
 
+# Status streams (SSE / long-poll): Redis pub/sub when set, in-process otherwise
+STATUS_STREAM_BROKER_URL = env("STATUS_STREAM_BROKER_URL", default="")
+
 AUTH_USER_MODEL = "accounts.User"
 
 LOG_FORMAT = env("LOG_FORMAT", default="dev")
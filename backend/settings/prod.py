@@ -33,3 +33,6 @@ EMAIL_BACKEND = "sendgrid_backend.SendgridBackend"
 SENDGRID_API_KEY = env("SENDGRID_API_KEY")
 SENDGRID_SANDBOX_MODE_IN_DEBUG = False
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="noreply@dchops.com")
+
+# Status streams must fan out across ASGI workers
+STATUS_STREAM_BROKER_URL = env("STATUS_STREAM_BROKER_URL", default=REDIS_URL)
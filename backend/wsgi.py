@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings.prod')
 
 application = get_wsgi_application()
+
+# Compile notification templates before the first request; a no-op if the
+# database is not reachable yet
+from notifications.services import warm_notification_templates  # noqa: E402
+
+warm_notification_templates()
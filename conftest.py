@@ -12,3 +12,10 @@ def clear_cache():
     cache.clear()
     yield
     cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_notification_templates():
+    # compiled templates are cached per process and test rollbacks fire no save signals
+    from notifications.services import invalidate_notification_template_cache
+    invalidate_notification_template_cache()
@@ -0,0 +1,262 @@
+"""
+Lightweight pub/sub for status streams (SSE and long-poll).
+
+Publishers are ordinary sync code (services, views); subscribers are async
+views running under ASGI. Every published event gets a per-channel,
+increasing integer id and is kept in a short history so reconnecting
+clients can resume from `Last-Event-ID` without missing transitions.
+
+`get_broker()` returns a Redis broker when settings.STATUS_STREAM_BROKER_URL
+is set and an in-process broker otherwise (tests, local development, a
+single ASGI process).
+"""
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger("core.pubsub")
+
+STATUS_STREAM_HISTORY_SIZE = getattr(settings, "STATUS_STREAM_HISTORY_SIZE", 50)
+STATUS_STREAM_HISTORY_TTL = getattr(settings, "STATUS_STREAM_HISTORY_TTL", 60 * 60 * 24)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class InProcessBroker:
+    """Thread-safe broker for a single process; publishers may run in any thread."""
+
+    def __init__(self, history_size=STATUS_STREAM_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._history = defaultdict(lambda: deque(maxlen=history_size))
+        self._sequence = defaultdict(int)
+
+    def publish(self, channel, event):
+        with self._lock:
+            self._sequence[channel] += 1
+            message = {**event, "id": self._sequence[channel]}
+            self._history[channel].append(message)
+            subscribers = list(self._subscribers[channel])
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+        return message["id"]
+
+    def history(self, channel, after=0):
+        with self._lock:
+            return [message for message in self._history.get(channel, ()) if message["id"] > after]
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        try:
+            yield InProcessSubscription(entry[1])
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(entry)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class InProcessSubscription:
+    def __init__(self, queue):
+        self._queue = queue
+
+    async def get(self, timeout):
+        """Next message, or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+# INCR, history append and PUBLISH in one atomic step, so ids reach
+# subscribers in order even with concurrent publishers. ARGV[1] is the event
+# as a JSON object without "id"; the id is spliced in front of its fields.
+REDIS_PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+local fields = string.sub(ARGV[1], 2)
+local payload
+if fields == '}' then
+    payload = '{"id":' .. id .. '}'
+else
+    payload = '{"id":' .. id .. ',' .. fields
+end
+redis.call('RPUSH', KEYS[2], payload)
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', ARGV[4], payload)
+return id
+"""
+
+
+class RedisBroker:
+    """
+    Redis PUBLISH/SUBSCRIBE with a capped list per channel for replay.
+    Sync client for publishers. Subscribers share one asyncio pubsub
+    connection per event loop (see RedisFanout), so idle watchers cost a
+    queue each, not a Redis connection each.
+    """
+
+    def __init__(self, url, history_size=STATUS_STREAM_HISTORY_SIZE, prefix="status-stream:", async_client=None):
+        import redis
+
+        self.url = url
+        self.history_size = history_size
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._publish_script = self._client.register_script(REDIS_PUBLISH_SCRIPT)
+        self._async_client = async_client or self._default_async_client
+        self._fanouts = weakref.WeakKeyDictionary()
+
+    def _default_async_client(self):
+        import redis.asyncio as aioredis
+
+        return aioredis.Redis.from_url(self.url)
+
+    def _key(self, channel, suffix):
+        return f"{self.prefix}{channel}:{suffix}"
+
+    def publish(self, channel, event):
+        fields = json.dumps({key: value for key, value in event.items() if key != "id"}, default=str)
+        return int(self._publish_script(
+            keys=[self._key(channel, "seq"), self._key(channel, "history")],
+            args=[fields, self.history_size, STATUS_STREAM_HISTORY_TTL, self._key(channel, "events")],
+        ))
+
+    def history(self, channel, after=0):
+        messages = (json.loads(raw) for raw in self._client.lrange(self._key(channel, "history"), 0, -1))
+        return [message for message in messages if message["id"] > after]
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        loop = asyncio.get_running_loop()
+        key = self._key(channel, "events")
+        queue = asyncio.Queue()
+        while True:
+            fanout = self._fanouts.get(loop)
+            if fanout is None:
+                fanout = self._fanouts[loop] = RedisFanout(self._async_client())
+            if await fanout.add(key, queue):
+                break
+            # it was closed by the last subscriber leaving while we waited
+            if self._fanouts.get(loop) is fanout:
+                del self._fanouts[loop]
+        try:
+            yield InProcessSubscription(queue)
+        finally:
+            if await fanout.remove(key, queue):
+                if self._fanouts.get(loop) is fanout:
+                    del self._fanouts[loop]
+
+
+class RedisFanout:
+    """
+    One pubsub connection shared by every subscriber on an event loop. Redis
+    channels are subscribed while they have at least one local watcher, and a
+    single reader task fans each message out to the watchers' queues. The
+    connection is closed when the last watcher leaves.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.pubsub = client.pubsub()
+        self.queues = {}
+        self.closed = False
+        self._lock = asyncio.Lock()
+        self._reader = None
+
+    async def add(self, key, queue):
+        """Register `queue` for `key`; False if this fanout has been closed."""
+        async with self._lock:
+            if self.closed:
+                return False
+            if key not in self.queues:
+                await self.pubsub.subscribe(key)
+                self.queues[key] = set()
+            self.queues[key].add(queue)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+            return True
+
+    async def remove(self, key, queue):
+        """Unregister `queue`; returns True once the fanout closed because nobody is left."""
+        async with self._lock:
+            subscribers = self.queues.get(key, set())
+            subscribers.discard(queue)
+            if not subscribers and key in self.queues:
+                del self.queues[key]
+                await self.pubsub.unsubscribe(key)
+            if self.queues:
+                return False
+            self.closed = True
+            if self._reader is not None:
+                self._reader.cancel()
+            await self.pubsub.aclose()
+            await self.client.aclose()
+            return True
+
+    async def _read(self):
+        while True:
+            try:
+                raw = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Status stream subscription failed; retrying")
+                await asyncio.sleep(1)
+                continue
+            if raw is None or raw["type"] != "message":
+                continue
+            key = raw["channel"].decode() if isinstance(raw["channel"], bytes) else raw["channel"]
+            message = json.loads(raw["data"])
+            for queue in self.queues.get(key, ()):
+                queue.put_nowait(message)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = getattr(settings, "STATUS_STREAM_BROKER_URL", "")
+                _broker = RedisBroker(url) if url else InProcessBroker()
+    return _broker
+
+
+def reset_broker():
+    """Drop the process-wide broker (tests, settings changes)."""
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def publish(channel, event):
+    """Publish `event` (a JSON-serialisable dict) to `channel`; returns its event id."""
+    return get_broker().publish(channel, event)
+
+
+def publish_on_commit(channel, event):
+    """
+    Publish once the current transaction commits (immediately outside one).
+    A broker outage is logged, never raised into the request that changed
+    the status.
+    """
+    def send():
+        try:
+            publish(channel, event)
+        except Exception:
+            logger.exception("Failed to publish status event to %s", channel)
+
+    transaction.on_commit(send)
+
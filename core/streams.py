@@ -0,0 +1,144 @@
+"""
+Async status-stream views (Server-Sent Events with a long-poll fallback)
+built on core.pubsub. They are plain async Django views so that, under
+ASGI, an idle watcher costs an open socket rather than a worker thread.
+
+Apps provide a `resolve(user)` callable that checks access and returns
+`(channel, snapshot)`; see logistics.views.dispatch_status_stream and
+orders.views.order_status_stream.
+"""
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .pubsub import get_broker
+
+STATUS_STREAM_KEEPALIVE_SECONDS = getattr(settings, "STATUS_STREAM_KEEPALIVE_SECONDS", 15)
+STATUS_STREAM_MAX_SECONDS = getattr(settings, "STATUS_STREAM_MAX_SECONDS", 300)
+STATUS_STREAM_POLL_TIMEOUT = 25
+STATUS_STREAM_MAX_POLL_TIMEOUT = 55
+STATUS_STREAM_RETRY_MS = 3000
+
+
+def _envelope(data=None, message="", status=200, errors=None):
+    # Same shape as core.utils.response.StandardJSONRenderer
+    return JsonResponse(
+        {"success": status < 400, "message": message, "data": data, "errors": errors},
+        status=status,
+        json_dumps_params={"default": str},
+    )
+
+
+def _authenticate(request):
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return drf_request.user
+    except exceptions.AuthenticationFailed:
+        return AnonymousUser()
+
+
+def _parse_after(request):
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("after")
+    if raw in (None, ""):
+        return None
+    try:
+        return max(int(raw), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_event(data, event, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _history(broker, channel, after):
+    return await sync_to_async(broker.history, thread_sensitive=False)(channel, after)
+
+
+async def _event_stream(broker, channel, snapshot, after, max_seconds):
+    last_id = after or 0
+    # Subscribe before sending the snapshot and replaying history so nothing
+    # published in between is lost
+    async with broker.subscribe(channel) as subscription:
+        yield f"retry: {STATUS_STREAM_RETRY_MS}\n\n"
+        yield _format_event(snapshot, "snapshot")
+        if after is not None:
+            for message in await _history(broker, channel, after):
+                last_id = message["id"]
+                yield _format_event(message, message.get("event", "message"), message["id"])
+
+        deadline = time.monotonic() + max_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await subscription.get(min(STATUS_STREAM_KEEPALIVE_SECONDS, remaining))
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            if message["id"] <= last_id:
+                continue
+            last_id = message["id"]
+            yield _format_event(message, message.get("event", "message"), message["id"])
+
+
+async def _long_poll(broker, channel, snapshot, after, timeout):
+    after = after or 0
+    events = await _history(broker, channel, after)
+    if not events:
+        async with broker.subscribe(channel) as subscription:
+            events = await _history(broker, channel, after)
+            if not events:
+                message = await subscription.get(timeout)
+                events = [message] if message is not None else []
+    last_event_id = events[-1]["id"] if events else after
+    return _envelope({"snapshot": snapshot, "events": events, "last_event_id": last_event_id})
+
+
+async def status_stream_response(request, resolve):
+    """
+    Serve a status stream for the channel returned by `resolve(user)`.
+
+    SSE by default; `?mode=poll` returns the events after `?after=<id>` (or
+    waits up to `?timeout=` seconds for the next one) as a JSON envelope.
+    Reconnecting clients resume from the `Last-Event-ID` header.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if not user.is_authenticated:
+        return _envelope(message="Authentication credentials were not provided.", status=401)
+    if getattr(user, "is_verified", False) is not True:
+        return _envelope(message="Email address is not verified.", status=403)
+    try:
+        channel, snapshot = await sync_to_async(resolve)(user)
+    except Http404:
+        return _envelope(message="Not found.", status=404)
+    except PermissionDenied:
+        return _envelope(message="You do not have permission to watch this item.", status=403)
+
+    broker = get_broker()
+    after = _parse_after(request)
+    if request.GET.get("mode") == "poll":
+        try:
+            timeout = float(request.GET.get("timeout", STATUS_STREAM_POLL_TIMEOUT))
+        except (TypeError, ValueError):
+            return _envelope(message="timeout must be a number.", status=400)
+        timeout = min(max(timeout, 0), STATUS_STREAM_MAX_POLL_TIMEOUT)
+        return await _long_poll(broker, channel, snapshot, after, timeout)
+
+    response = StreamingHttpResponse(
+        _event_stream(broker, channel, snapshot, after, STATUS_STREAM_MAX_SECONDS),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
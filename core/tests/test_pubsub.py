@@ -0,0 +1,91 @@
+import asyncio
+import json
+import threading
+
+from core.pubsub import InProcessBroker, RedisBroker
+
+
+def test_in_process_broker_numbers_events_and_keeps_history():
+    broker = InProcessBroker(history_size=3)
+    ids = [broker.publish("dispatch:1", {"status": f"S{i}"}) for i in range(5)]
+    broker.publish("dispatch:2", {"status": "OTHER"})
+
+    assert ids == [1, 2, 3, 4, 5]
+    assert [m["status"] for m in broker.history("dispatch:1")] == ["S2", "S3", "S4"]
+    assert [m["id"] for m in broker.history("dispatch:1", after=3)] == [4, 5]
+
+
+def test_in_process_subscribers_receive_messages_published_from_other_threads():
+    broker = InProcessBroker()
+
+    async def watch():
+        async with broker.subscribe("order:7") as subscription:
+            assert await subscription.get(0.01) is None
+            thread = threading.Thread(target=broker.publish, args=("order:7", {"status": "DELIVERED"}))
+            thread.start()
+            message = await subscription.get(2)
+            thread.join()
+            return message
+
+    message = asyncio.run(watch())
+    assert message == {"status": "DELIVERED", "id": 1}
+    assert broker._subscribers == {}
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.inbox = asyncio.Queue()
+        self.closed = False
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeAsyncRedis:
+    created = []
+
+    def __init__(self):
+        self._pubsub = FakePubSub()
+        FakeAsyncRedis.created.append(self)
+
+    def pubsub(self):
+        return self._pubsub
+
+    async def aclose(self):
+        pass
+
+
+def test_redis_watchers_share_one_pubsub_connection_per_loop():
+    FakeAsyncRedis.created = []
+    broker = RedisBroker("redis://localhost:6399/0", async_client=FakeAsyncRedis)
+
+    def deliver(pubsub, channel, message):
+        pubsub.inbox.put_nowait({"type": "message", "channel": channel.encode(), "data": json.dumps(message)})
+
+    async def watch():
+        async with broker.subscribe("order:1") as a, broker.subscribe("order:1") as b, \
+                broker.subscribe("order:2") as c:
+            assert len(FakeAsyncRedis.created) == 1
+            pubsub = FakeAsyncRedis.created[0]._pubsub
+            assert pubsub.channels == {"status-stream:order:1:events", "status-stream:order:2:events"}
+            deliver(pubsub, "status-stream:order:1:events", {"id": 1, "status": "PAID"})
+            first = [await a.get(2), await b.get(2), await c.get(0.05)]
+        return pubsub, first
+
+    pubsub, first = asyncio.run(watch())
+    assert first == [{"id": 1, "status": "PAID"}, {"id": 1, "status": "PAID"}, None]
+    assert pubsub.channels == set() and pubsub.closed
+    assert len(broker._fanouts) == 0
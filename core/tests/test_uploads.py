@@ -0,0 +1,93 @@
+import pytest
+from cloudinary.utils import api_sign_request
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+
+from core import uploads
+
+User = get_user_model()
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def cloudinary_settings(settings):
+    settings.DIRECT_UPLOAD_BACKEND = "core.uploads.CloudinaryDirectUpload"
+    settings.CLOUDINARY_STORAGE = {"CLOUD_NAME": "demo", "API_KEY": "123", "API_SECRET": SECRET}
+
+
+@pytest.fixture
+def local_storage(settings, tmp_path):
+    settings.DIRECT_UPLOAD_BACKEND = "core.uploads.LocalDirectUpload"
+    settings.DIRECT_UPLOAD_LOCAL_ROOT = str(tmp_path)
+    settings.DIRECT_UPLOAD_LOCAL_URL = "http://storage.test/uploads/"
+    return uploads.get_upload_backend().storage
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(email="uploader@example.com", password="StrongPass123", full_name="Uploader")
+
+
+def _cloudinary_response(key, version=1700000000, secret=SECRET):
+    return {
+        "public_id": key,
+        "version": version,
+        "signature": api_sign_request({"public_id": key, "version": version}, secret, signature_version=1),
+        "secure_url": f"https://res.cloudinary.com/demo/image/upload/v{version}/{key}.jpg",
+    }
+
+
+@pytest.mark.django_db
+def test_cloudinary_ticket_is_signed_and_response_verified(cloudinary_settings, user):
+    issued = uploads.issue_upload_ticket("proof_of_delivery", "d1", user)
+    fields = issued["upload"]["fields"]
+    assert issued["upload"]["url"] == "https://api.cloudinary.com/v1_1/demo/auto/upload"
+    assert fields["public_id"] == issued["key"]
+    assert fields["signature"] == api_sign_request(
+        {"public_id": fields["public_id"], "timestamp": fields["timestamp"]}, SECRET
+    )
+
+    response = _cloudinary_response(issued["key"])
+    url = uploads.confirm_upload(issued["ticket"], response, "proof_of_delivery", "d1", user)
+    assert url == response["secure_url"]
+
+    for forged in (
+        _cloudinary_response(issued["key"], secret="wrong"),
+        _cloudinary_response("proof_of_delivery/d1/other"),
+        {**response, "secure_url": "https://evil.example.com/x.jpg"},
+    ):
+        with pytest.raises(uploads.UploadError):
+            uploads.confirm_upload(issued["ticket"], forged, "proof_of_delivery", "d1", user)
+
+
+@pytest.mark.django_db
+def test_ticket_is_bound_to_purpose_object_user_and_lifetime(local_storage, user, settings):
+    other = User.objects.create_user(email="other_uploader@example.com", password="StrongPass123", full_name="Other")
+    issued = uploads.issue_upload_ticket("farmer_document", "f1", user)
+    local_storage.save(issued["key"], ContentFile(b"%PDF"))
+
+    for purpose, object_id, who in (("product_image", "f1", user), ("farmer_document", "f2", user), ("farmer_document", "f1", other)):
+        with pytest.raises(uploads.UploadError, match="something else"):
+            uploads.confirm_upload(issued["ticket"], {}, purpose, object_id, who)
+    with pytest.raises(uploads.UploadError, match="invalid"):
+        uploads.confirm_upload(issued["ticket"] + "x", {}, "farmer_document", "f1", user)
+
+    assert uploads.confirm_upload(issued["ticket"], {}, "farmer_document", "f1", user) == (
+        f"http://storage.test/uploads/{issued['key']}"
+    )
+    settings.UPLOAD_TICKET_MAX_AGE = -1
+    with pytest.raises(uploads.UploadError, match="expired"):
+        uploads.confirm_upload(issued["ticket"], {}, "farmer_document", "f1", user)
+
+
+@pytest.mark.django_db
+def test_local_backend_requires_the_file_and_cloudinary_requires_config(local_storage, user, settings):
+    issued = uploads.issue_upload_ticket("product_image", "p1", user)
+    with pytest.raises(uploads.UploadError, match="not found"):
+        uploads.confirm_upload(issued["ticket"], {}, "product_image", "p1", user)
+
+    settings.DIRECT_UPLOAD_BACKEND = "core.uploads.CloudinaryDirectUpload"
+    settings.CLOUDINARY_STORAGE = {"CLOUD_NAME": "", "API_KEY": "", "API_SECRET": ""}
+    with pytest.raises(uploads.UploadError, match="not configured"):
+        uploads.issue_upload_ticket("product_image", "p1", user)
@@ -0,0 +1,151 @@
+"""
+Direct-to-storage uploads.
+
+Clients never send file bytes to our workers. The flow has three steps:
+
+1. The client asks an app endpoint for a ticket with `issue_upload_ticket`.
+   It gets back a short-lived signed ticket plus the storage URL and form
+   fields to POST the file to.
+2. The client uploads straight to storage, e.g. Cloudinary's signed upload
+   API.
+3. The client hands the ticket and the storage response to the app's
+   confirm endpoint. `confirm_upload` checks both and returns the stored
+   URL, and the app records that URL on its model.
+
+The storage side is pluggable through settings.DIRECT_UPLOAD_BACKEND.
+`CloudinaryDirectUpload` is the production backend. `LocalDirectUpload`
+keeps files in a local directory and stands in for storage in tests and
+local development.
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+UPLOAD_TICKET_SALT = "core.uploads.ticket"
+
+
+class UploadError(Exception):
+    """Invalid, expired or mismatched ticket, or an upload that cannot be verified."""
+
+
+def _ticket_max_age():
+    return getattr(settings, "UPLOAD_TICKET_MAX_AGE", 15 * 60)
+
+
+class CloudinaryDirectUpload:
+    """
+    Signed uploads to Cloudinary. The signature pins the public_id, so a
+    ticket can only create the one object it was issued for. On confirm,
+    the response signature (sha1 of public_id and version with the API
+    secret) proves that Cloudinary really stored it.
+    """
+
+    def __init__(self):
+        config = getattr(settings, "CLOUDINARY_STORAGE", {})
+        self.cloud_name = config.get("CLOUD_NAME", "")
+        self.api_key = config.get("API_KEY", "")
+        self.api_secret = config.get("API_SECRET", "")
+
+    def _sign(self, params, signature_version=2):
+        from cloudinary.utils import api_sign_request
+
+        return api_sign_request(params, self.api_secret, signature_version=signature_version)
+
+    def upload_params(self, key):
+        if not (self.cloud_name and self.api_key and self.api_secret):
+            raise UploadError("Direct uploads are not configured.")
+        params = {"public_id": key, "timestamp": int(time.time())}
+        return {
+            "method": "POST",
+            "url": f"https://api.cloudinary.com/v1_1/{self.cloud_name}/auto/upload",
+            "fields": {**params, "api_key": self.api_key, "signature": self._sign(params)},
+            "file_field": "file",
+        }
+
+    def confirm(self, key, result):
+        public_id, version, signature = result.get("public_id"), result.get("version"), result.get("signature")
+        url = result.get("secure_url") or ""
+        if public_id != key or not version or not signature:
+            raise UploadError("Upload result does not match the ticket.")
+        # Cloudinary signs API responses with signature version 1
+        if signature != self._sign({"public_id": public_id, "version": version}, signature_version=1):
+            raise UploadError("Upload signature is invalid.")
+        if not url.startswith(f"https://res.cloudinary.com/{self.cloud_name}/"):
+            raise UploadError("Upload URL is not on the configured storage.")
+        return url
+
+
+class LocalDirectUpload:
+    """
+    Stand-in for tests and local development. The bucket is a directory
+    (settings.DIRECT_UPLOAD_LOCAL_ROOT), and whatever writes the file there
+    plays the storage service: a test or a local static file server.
+    Confirming only checks that the object exists.
+    """
+
+    def __init__(self):
+        self.storage = FileSystemStorage(
+            location=getattr(settings, "DIRECT_UPLOAD_LOCAL_ROOT", None),
+            base_url=getattr(settings, "DIRECT_UPLOAD_LOCAL_URL", "http://localhost:9000/uploads/"),
+        )
+
+    def upload_params(self, key):
+        return {
+            "method": "PUT",
+            "url": self.storage.url(key),
+            "fields": {},
+            "file_field": None,
+        }
+
+    def confirm(self, key, result):
+        if not self.storage.exists(key):
+            raise UploadError("Uploaded file was not found in storage.")
+        return self.storage.url(key)
+
+
+def get_upload_backend():
+    return import_string(getattr(settings, "DIRECT_UPLOAD_BACKEND", "core.uploads.CloudinaryDirectUpload"))()
+
+
+def issue_upload_ticket(purpose, object_id, user):
+    """
+    Start a direct upload for `purpose` on `object_id` (the caller has
+    already checked that `user` may upload there). Returns
+    {"ticket", "key", "expires_at", "upload": {"method", "url", "fields", "file_field"}}.
+    """
+    key = f"{purpose}/{object_id}/{uuid.uuid4().hex}"
+    upload = get_upload_backend().upload_params(key)
+    ticket = signing.dumps(
+        {"purpose": purpose, "object": str(object_id), "user": str(user.pk), "key": key}, salt=UPLOAD_TICKET_SALT
+    )
+    return {
+        "ticket": ticket,
+        "key": key,
+        "expires_at": timezone.now() + timedelta(seconds=_ticket_max_age()),
+        "upload": upload,
+    }
+
+
+def confirm_upload(ticket, result, purpose, object_id, user):
+    """
+    Check that `ticket` was issued to `user` for this purpose and object and
+    has not expired, and that storage holds the file (`result` is the
+    storage's upload response). Returns the file's URL or raises UploadError.
+    """
+    try:
+        claims = signing.loads(ticket or "", salt=UPLOAD_TICKET_SALT, max_age=_ticket_max_age())
+    except signing.SignatureExpired:
+        raise UploadError("Upload ticket has expired.")
+    except signing.BadSignature:
+        raise UploadError("Upload ticket is invalid.")
+    if (claims.get("purpose"), claims.get("object"), claims.get("user")) != (purpose, str(object_id), str(user.pk)):
+        raise UploadError("Upload ticket was issued for something else.")
+    if not isinstance(result, dict):
+        raise UploadError("Upload result must be an object.")
+    return get_upload_backend().confirm(claims["key"], result)
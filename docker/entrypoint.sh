@@ -1,6 +1,9 @@
 #!/usr/bin/env bash
 set -e
 
+# manage.py defaults to dev settings; the container runs prod unless told otherwise
+export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:-backend.settings.prod}"
+
 python - <<'PY'
 import os
 import time
@@ -24,7 +27,9 @@ PY
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
 
-exec gunicorn backend.wsgi:application \
+# ASGI workers so idle status-stream (SSE) watchers do not pin a sync worker each
+exec gunicorn backend.asgi:application \
+  --worker-class uvicorn_worker.UvicornWorker \
   --bind 0.0.0.0:8000 \
   --workers 3 \
   --timeout 60
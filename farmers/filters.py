@@ -0,0 +1,20 @@
+# farmers/filters.py
+from rest_framework import filters
+
+from .services import search_farmer_directory
+
+
+class FarmerDirectorySearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter on the farmer directory: `?search=`
+    goes through the normalised, indexed search keys instead of five icontains
+    clauses, and `?state=` / `?lga=` are exact-match fast paths.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return search_farmer_directory(
+            queryset,
+            term=request.query_params.get(self.search_param, ""),
+            state=request.query_params.get("state", ""),
+            lga=request.query_params.get("lga", ""),
+        )
@@ -0,0 +1,38 @@
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from farmers.services import SUPPLY_INGEST_CHUNK_SIZE, SUPPLY_INGEST_FORMATS, decode_lines, ingest_supply_records
+
+
+class Command(BaseCommand):
+    help = "Bulk-ingest warehouse supply records from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (with header) or NDJSON file")
+        parser.add_argument("--format", dest="data_format", choices=SUPPLY_INGEST_FORMATS,
+                            help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=SUPPLY_INGEST_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        data_format = options["data_format"]
+        if not data_format:
+            data_format = "ndjson" if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl") else "csv"
+        try:
+            with open(path, "rb") as stream:
+                report = ingest_supply_records(
+                    decode_lines(stream), data_format=data_format, chunk_size=options["chunk_size"]
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except ValidationError as exc:
+            raise CommandError(exc.messages[0])
+
+        for error in report["errors"]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {report['processed']} rows: {report['created']} created, {report['failed']} failed."
+        ))
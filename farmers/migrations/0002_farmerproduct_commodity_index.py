@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:40
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='farmerproduct',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('title')), django.db.models.functions.text.Lower('unit'), name='farmers_product_commodity'),
+        ),
+    ]
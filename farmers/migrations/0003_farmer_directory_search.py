@@ -0,0 +1,90 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:47
+
+import re
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Frozen copies of farmers.models.normalize_search_text/normalize_phone as of this migration
+NON_DIGITS_RE = re.compile(r"\D+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_search_text(*values):
+    text = " ".join(v for v in values if v)
+    return WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def normalize_phone(value):
+    digits = NON_DIGITS_RE.sub("", value or "")
+    if digits.startswith("234") and len(digits) == 13:
+        digits = "0" + digits[3:]
+    return digits
+
+
+def backfill_search_fields(apps, schema_editor):
+    Farmer = apps.get_model("farmers", "Farmer")
+    batch = []
+    source_fields = ("contact_name", "business_name", "email", "phone", "state", "lga")
+    for farmer in Farmer.objects.only(*source_fields).iterator(chunk_size=2000):
+        farmer.search_text = normalize_search_text(
+            farmer.contact_name, farmer.business_name, farmer.email, farmer.state, farmer.lga
+        )
+        farmer.phone_digits = normalize_phone(farmer.phone)
+        batch.append(farmer)
+        if len(batch) >= 2000:
+            Farmer.objects.bulk_update(batch, ["search_text", "phone_digits"])
+            batch = []
+    if batch:
+        Farmer.objects.bulk_update(batch, ["search_text", "phone_digits"])
+
+
+def create_trigram_index(apps, schema_editor):
+    # Substring (word-inside-name) matches need pg_trgm; other backends fall back to the prefix index.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS farmers_farmer_search_trgm "
+        "ON farmers_farmer USING gin (search_text gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS farmers_farmer_search_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0002_farmerproduct_commodity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farmer',
+            name='phone_digits',
+            field=models.CharField(blank=True, editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='farmer',
+            name='search_text',
+            field=models.CharField(blank=True, editable=False, max_length=600),
+        ),
+        migrations.AddIndex(
+            model_name='farmer',
+            index=models.Index(fields=['search_text'], name='farmers_farmer_search_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='farmer',
+            index=models.Index(fields=['phone_digits'], name='farmers_farmer_phone_digits', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='farmer',
+            index=models.Index(django.db.models.functions.text.Lower('state'), django.db.models.functions.text.Lower('lga'), name='farmers_farmer_location'),
+        ),
+        migrations.RunPython(backfill_search_fields, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_review_status(apps, schema_editor):
+    FarmerDocument = apps.get_model("farmers", "FarmerDocument")
+    FarmerDocument.objects.filter(verified=True).update(review_status="VERIFIED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0003_farmer_directory_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farmerdocument',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='farmerdocument',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='farmerdocument',
+            name='review_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('VERIFIED', 'Verified'), ('REJECTED', 'Rejected')], default='PENDING', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='farmerdocument',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='farmerdocument',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='farmerdocument',
+            index=models.Index(condition=models.Q(('review_status', 'PENDING')), fields=['uploaded_at'], name='farmers_doc_review_queue'),
+        ),
+        migrations.RunPython(backfill_review_status, migrations.RunPython.noop),
+    ]
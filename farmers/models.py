@@ -1,9 +1,11 @@
 # farmers/models.py
+import re
 import uuid
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Lower, Trim
 
 # Choices
 FARM_TYPE_CHOICES = [
@@ -33,6 +35,27 @@ UNIT_CHOICES = [
 ]
 
 
+NON_DIGITS_RE = re.compile(r"\D+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_search_text(*values) -> str:
+    """Lowercase, whitespace-collapsed concatenation used for directory search."""
+    text = " ".join(v for v in values if v)
+    return WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def normalize_phone(value) -> str:
+    """
+    Digits-only phone number. Nigerian numbers in international form
+    (+234 803 ...) are folded to the local 0803... form so both spellings match.
+    """
+    digits = NON_DIGITS_RE.sub("", value or "")
+    if digits.startswith("234") and len(digits) == 13:
+        digits = "0" + digits[3:]
+    return digits
+
+
 class Farmer(models.Model):
     """
     Farmer profile. Can be linked to a User account (if farmer signs up).
@@ -62,11 +85,32 @@ class Farmer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     metadata = models.JSONField(blank=True, null=True, help_text="Optional free-form metadata")
+    # Denormalised search keys, maintained in save()
+    search_text = models.CharField(max_length=600, blank=True, editable=False)
+    phone_digits = models.CharField(max_length=30, blank=True, editable=False)
+
+    SEARCH_SOURCE_FIELDS = ("contact_name", "business_name", "email", "phone", "state", "lga")
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Farmer"
         verbose_name_plural = "Farmers"
+        indexes = [
+            models.Index(fields=["search_text"], name="farmers_farmer_search_prefix", opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["phone_digits"], name="farmers_farmer_phone_digits", opclasses=["varchar_pattern_ops"]),
+            models.Index(Lower("state"), Lower("lga"), name="farmers_farmer_location"),
+        ]
+
+    def refresh_search_fields(self):
+        self.search_text = normalize_search_text(self.contact_name, self.business_name, self.email, self.state, self.lga)
+        self.phone_digits = normalize_phone(self.phone)
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_SOURCE_FIELDS):
+            kwargs["update_fields"] = {*update_fields, "search_text", "phone_digits"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         if self.business_name:
@@ -85,11 +129,29 @@ class FarmerDocument(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     verified = models.BooleanField(default=False)
     notes = models.TextField(blank=True)
+    # Review queue state; `verified` mirrors review_status == "VERIFIED"
+    review_status = models.CharField(max_length=10, choices=VERIFICATION_STATUS_CHOICES, default="PENDING")
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+    reviewed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    reviewed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-uploaded_at"]
         verbose_name = "Farmer Document"
         verbose_name_plural = "Farmer Documents"
+        indexes = [
+            # Only pending documents are indexed, so the queue index stays as small as the backlog
+            models.Index(
+                fields=["uploaded_at"],
+                condition=models.Q(review_status="PENDING"),
+                name="farmers_doc_review_queue",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.farmer}"
@@ -122,6 +184,7 @@ class FarmerProduct(models.Model):
         verbose_name_plural = "Farmer Products"
         indexes = [
             models.Index(fields=["farmer", "title"]),
+            models.Index(Lower(Trim("title")), Lower("unit"), name="farmers_product_commodity"),
         ]
 
     def __str__(self):
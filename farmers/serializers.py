@@ -7,8 +7,15 @@ from .models import Farmer, FarmerDocument, FarmerProduct, SupplyRecord
 class FarmerDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = FarmerDocument
-        fields = ("id", "farmer", "name", "file_url", "uploaded_at", "verified", "notes")
-        read_only_fields = ("id", "uploaded_at")
+        fields = (
+            "id", "farmer", "name", "file_url", "uploaded_at", "verified", "notes",
+            "review_status", "claimed_by", "claim_expires_at", "reviewed_by", "reviewed_at",
+        )
+        # `verified` mirrors review_status and only changes through the review actions
+        read_only_fields = (
+            "id", "uploaded_at", "verified", "review_status", "claimed_by", "claim_expires_at", "reviewed_by",
+            "reviewed_at",
+        )
 
 
 class FarmerProductSerializer(serializers.ModelSerializer):
@@ -67,9 +74,66 @@ class SupplyRecordSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class BatchLookupRelatedField(serializers.RelatedField):
+    """
+    Primary-key related field that resolves against a dict of pre-fetched
+    objects in `context[lookup]` instead of querying once per row.
+    Used by bulk ingestion, where references are loaded one chunk at a time.
+    """
+    default_error_messages = {
+        "does_not_exist": 'Invalid pk "{pk_value}" - object does not exist.',
+    }
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        return None
+
+    def to_internal_value(self, data):
+        obj = self.context.get(self.lookup, {}).get(str(data))
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+    def to_representation(self, value):
+        return str(value.pk)
+
+
+class SupplyRecordIngestSerializer(SupplyRecordSerializer):
+    """
+    SupplyRecordSerializer rules for bulk ingestion: farmer/product references
+    come from the chunk's batched lookups and the product must belong to the farmer.
+    """
+    farmer = BatchLookupRelatedField(lookup="farmers")
+    product = BatchLookupRelatedField(lookup="products", allow_null=True, required=False)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        product = attrs.get("product")
+        if product is not None and product.farmer_id != attrs["farmer"].id:
+            raise serializers.ValidationError({"product": "Product does not belong to this farmer."})
+        if not attrs.get("supply_date"):
+            attrs["supply_date"] = timezone.now()
+        return attrs
+
+
+FARMER_EXPANDABLE_RELATIONS = ("products", "documents")
+FARMER_EXPAND_DEFAULT_LIMIT = 10
+FARMER_EXPAND_MAX_LIMIT = 50
+
+
 class FarmerSerializer(serializers.ModelSerializer):
-    products = FarmerProductSerializer(many=True, read_only=True)
-    documents = FarmerDocumentSerializer(many=True, read_only=True)
+    """
+    Nested products/documents are opt-in: pass context["expand"] (e.g. from
+    ?expand=products,documents) and they are included, capped to the latest
+    context["expand_limit"] rows each. The view prefetches matching
+    `expanded_<relation>` attributes so expansion costs one query per relation.
+    """
+    products = serializers.SerializerMethodField()
+    documents = serializers.SerializerMethodField()
+
     class Meta:
         model = Farmer
         fields = (
@@ -79,3 +143,25 @@ class FarmerSerializer(serializers.ModelSerializer):
             "created_at", "updated_at", "metadata", "products", "documents",
         )
         read_only_fields = ("id", "created_at", "updated_at", "products", "documents")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get("expand") or ()
+        for name in FARMER_EXPANDABLE_RELATIONS:
+            if name not in expand:
+                self.fields.pop(name, None)
+
+    def _expanded(self, obj, relation, ordering):
+        prefetched = getattr(obj, f"expanded_{relation}", None)
+        if prefetched is not None:
+            return prefetched
+        limit = self.context.get("expand_limit", FARMER_EXPAND_DEFAULT_LIMIT)
+        return getattr(obj, relation).order_by(ordering)[:limit]
+
+    def get_products(self, obj):
+        products = self._expanded(obj, "products", "-created_at")
+        return FarmerProductSerializer(products, many=True, context=self.context).data
+
+    def get_documents(self, obj):
+        documents = self._expanded(obj, "documents", "-uploaded_at")
+        return FarmerDocumentSerializer(documents, many=True, context=self.context).data
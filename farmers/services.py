@@ -1,7 +1,38 @@
 # farmers/services.py
+import csv
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from .models import FarmerProduct
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest, Lower
+from django.utils import timezone
+from .models import Farmer, FarmerDocument, FarmerProduct, SupplyRecord, normalize_phone, normalize_search_text
+from .serializers import SupplyRecordIngestSerializer
+from rest_framework.exceptions import ValidationError as DRFValidationError
+
+# Digits-only terms at least this long are treated as phone lookups
+PHONE_SEARCH_MIN_DIGITS = 4
+PHONE_SEARCH_CHARS = set("0123456789+-() ")
+
+# Supply statuses whose quantity has been received into FarmerProduct stock
+SUPPLY_STOCKED_STATUSES = ("APPROVED", "COMPLETED")
+# Allowed bulk transitions: target status -> statuses it may be reached from
+SUPPLY_BULK_TRANSITIONS = {
+    "APPROVED": ("PENDING",),
+    "COMPLETED": ("PENDING", "APPROVED"),
+}
+
+DOCUMENT_CLAIM_LEASE = timedelta(minutes=getattr(settings, "FARMER_DOCUMENT_CLAIM_LEASE_MINUTES", 15))
+DOCUMENT_CLAIM_MAX_BATCH = 50
+DOCUMENT_REVIEW_DECISIONS = {"verify": "VERIFIED", "reject": "REJECTED"}
+
+SUPPLY_INGEST_FORMATS = ("csv", "ndjson")
+SUPPLY_INGEST_CHUNK_SIZE = 1000
+# Cap the per-row error report so a completely malformed file cannot exhaust memory
+SUPPLY_INGEST_MAX_REPORTED_ERRORS = 1000
 
 
 def reserve_product_stock(product_id: int, quantity: int) -> None:
@@ -38,37 +69,514 @@ def release_product_stock(product_id: int, quantity: int) -> None:
         product.save(update_fields=['quantity_available'])
 
 
-def reserve_bulk_stock(items: list[dict]) -> None:
+def _merge_reservation_lines(items: list[dict]) -> dict:
+    """
+    Collapse duplicate product lines into a single requested quantity per product.
+    Keys are normalised to the FarmerProduct primary key type so "uuid-string"
+    and UUID inputs for the same product merge together.
+    """
+    pk_field = FarmerProduct._meta.pk
+    merged = {}
+    for item in items:
+        try:
+            pid = pk_field.to_python(item["product_id"])
+            qty = Decimal(str(item["quantity"]))
+        except (KeyError, TypeError, ValueError, ArithmeticError, ValidationError):
+            raise ValidationError("Each item needs a valid product_id and quantity.")
+        if qty <= 0:
+            raise ValidationError("Quantities must be positive.")
+        merged[pid] = merged.get(pid, Decimal("0")) + qty
+    return merged
+
+
+class InsufficientStockError(ValidationError):
+    """
+    Raised by reserve_bulk_stock when one or more lines cannot be fulfilled.
+    `shortfalls` holds one dict per failing product line.
+    """
+    def __init__(self, shortfalls: list[dict]):
+        self.shortfalls = shortfalls
+        super().__init__([
+            f"Insufficient stock for {line['title']}. Available: {line['available']}"
+            for line in shortfalls
+        ])
+
+
+def reserve_bulk_stock(items: list[dict]) -> list[dict]:
     """
     Reserve multiple products atomically.
-    `items` is a list of dicts: [{"product_id": 1, "quantity": 3}, ...]
-    
-    Raises ValidationError if any product has insufficient stock.
+    `items` is a list of dicts: [{"product_id": <uuid>, "quantity": 3}, ...]
+
+    Duplicate product lines are merged before checking stock, rows are locked in
+    primary-key order (so concurrent baskets cannot deadlock each other), every
+    line is validated in memory and all decrements are written with a single
+    bulk_update — the number of writes does not grow with the basket size.
+
+    Returns one entry per merged line:
+        [{"product_id": ..., "title": ..., "reserved": Decimal, "remaining": Decimal}, ...]
+
+    Raises InsufficientStockError (a ValidationError) with a per-line
+    `shortfalls` report if any product has insufficient stock.
     All reservations succeed or none do (atomic).
     """
     if not items:
         raise ValidationError("No items provided for reservation.")
 
+    requested = _merge_reservation_lines(items)
+
     with transaction.atomic():
-        # Lock all products at once
-        product_ids = [item['product_id'] for item in items]
-        products = FarmerProduct.objects.select_for_update().filter(id__in=product_ids)
+        # Lock all products at once, in a stable order
+        products = list(
+            FarmerProduct.objects.select_for_update()
+            .filter(id__in=requested.keys())
+            .order_by("pk")
+        )
         product_map = {p.id: p for p in products}
 
+        missing = [pid for pid in requested if pid not in product_map]
+        if missing:
+            raise ValidationError(f"Product with id {missing[0]} not found.")
+
         # Check availability first
-        for item in items:
-            pid = item['product_id']
-            qty = item['quantity']
-            if qty <= 0:
-                raise ValidationError("Quantities must be positive.")
-            if pid not in product_map:
-                raise ValidationError(f"Product with id {pid} not found.")
-            if product_map[pid].quantity_available < qty:
-                raise ValidationError(
-                    f"Insufficient stock for {product_map[pid].title}. Available: {product_map[pid].quantity_available}"
-                )
-
-        # Deduct stock
-        for item in items:
-            product_map[item['product_id']].quantity_available -= item['quantity']
-            product_map[item['product_id']].save(update_fields=['quantity_available'])
+        shortfalls = []
+        for pid, qty in requested.items():
+            product = product_map[pid]
+            if product.quantity_available < qty:
+                shortfalls.append({
+                    "product_id": pid,
+                    "title": product.title,
+                    "requested": qty,
+                    "available": product.quantity_available,
+                    "shortfall": qty - product.quantity_available,
+                })
+        if shortfalls:
+            raise InsufficientStockError(shortfalls)
+
+        # Deduct stock in one statement
+        for pid, qty in requested.items():
+            product_map[pid].quantity_available -= qty
+        FarmerProduct.objects.bulk_update(products, ["quantity_available"])
+
+        # bulk_update skips signals, so refresh the cross-farmer price index explicitly
+        from marketplace.services import schedule_commodity_refresh
+        schedule_commodity_refresh({(p.title, p.unit) for p in products})
+
+    return [
+        {
+            "product_id": pid,
+            "title": product_map[pid].title,
+            "reserved": qty,
+            "remaining": product_map[pid].quantity_available,
+        }
+        for pid, qty in requested.items()
+    ]
+
+
+def search_farmer_directory(queryset, term: str = "", state: str = "", lga: str = ""):
+    """
+    Directory lookup over the denormalised Farmer search keys.
+
+    - phone-looking terms hit `phone_digits` with an indexed prefix match;
+    - other terms must each prefix a word of the normalised name, business,
+      email, state or LGA (`search_text`), served by the prefix index and by
+      pg_trgm on Postgres;
+    - state/LGA are exact, case-insensitive matches on the location index.
+    """
+    if state:
+        queryset = queryset.alias(state_key=Lower("state")).filter(state_key=state.strip().lower())
+    if lga:
+        queryset = queryset.alias(lga_key=Lower("lga")).filter(lga_key=lga.strip().lower())
+
+    term = (term or "").strip()
+    if not term:
+        return queryset
+
+    digits = normalize_phone(term)
+    if set(term) <= PHONE_SEARCH_CHARS and len(digits) >= PHONE_SEARCH_MIN_DIGITS:
+        if digits.startswith("234"):
+            # partial international prefix, e.g. "+234803"
+            digits = "0" + digits[3:]
+        return queryset.filter(phone_digits__startswith=digits)
+
+    for word in normalize_search_text(term).split(" "):
+        queryset = queryset.filter(Q(search_text__startswith=word) | Q(search_text__contains=f" {word}"))
+    return queryset
+
+
+def decode_lines(binary_stream, encoding: str = "utf-8-sig"):
+    """
+    Decode an uploaded binary file one line at a time, so a bad byte surfaces
+    at the row that holds it rather than at the start of a larger read buffer.
+    """
+    for line in binary_stream:
+        yield line.decode(encoding)
+
+
+def _iter_supply_rows(stream, data_format: str):
+    """
+    Yield (row_number, row_dict_or_None, parse_error) from a text stream without
+    loading it whole. Blank CSV cells are dropped so serializer defaults apply.
+
+    A stream that cannot be decoded or parsed any further (bad UTF-8, a
+    malformed CSV record) ends with one error row for the row it stopped at,
+    so the rows read before it are still ingested and reported.
+    """
+    number = 0
+    try:
+        if data_format == "csv":
+            for row in csv.DictReader(stream):
+                number += 1
+                yield number, {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}, None
+            return
+        for line in stream:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "Each line must be a JSON object."
+                continue
+            yield number, row, None
+    except UnicodeDecodeError:
+        yield number + 1, None, "File must be UTF-8 encoded; stopped reading here."
+    except csv.Error as exc:
+        yield number + 1, None, f"Invalid CSV: {exc}; stopped reading here."
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _lookup_by_pk(model, raw_ids):
+    pk_field = model._meta.pk
+    ids = set()
+    for raw in raw_ids:
+        try:
+            ids.add(pk_field.to_python(raw))
+        except (ValidationError, TypeError, ValueError):
+            continue
+    if not ids:
+        return {}
+    return {str(obj.pk): obj for obj in model.objects.filter(pk__in=ids)}
+
+
+def ingest_supply_records(stream, data_format: str = "csv", chunk_size: int = SUPPLY_INGEST_CHUNK_SIZE) -> dict:
+    """
+    Stream-parse warehouse intake rows (CSV with a header, or NDJSON) into SupplyRecords.
+
+    Rows are handled `chunk_size` at a time: farmer and product references for the
+    chunk are resolved with one query each, each row is validated with the
+    SupplyRecordSerializer rules, and the valid rows are written with one
+    bulk_create. Memory stays bounded by the chunk size, not the file size.
+
+    Returns {"processed", "created", "failed", "errors": [{"row", "errors"}, ...]}.
+    Invalid rows are skipped and reported; valid rows are still inserted. A
+    decode or CSV error ends the read and is reported as the last failed row,
+    while the chunks before it stay committed and are counted in "created".
+    """
+    if data_format not in SUPPLY_INGEST_FORMATS:
+        raise ValidationError(f"Unsupported format '{data_format}'. Use one of: {', '.join(SUPPLY_INGEST_FORMATS)}.")
+
+    report = {"processed": 0, "created": 0, "failed": 0, "errors": []}
+
+    def record_error(row_number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < SUPPLY_INGEST_MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "errors": errors})
+
+    for chunk in _chunks(_iter_supply_rows(stream, data_format), chunk_size):
+        rows = [(number, row) for number, row, _ in chunk if row is not None]
+        for number, _, parse_error in chunk:
+            if parse_error:
+                record_error(number, {"non_field_errors": [parse_error]})
+        report["processed"] += len(chunk)
+
+        context = {
+            "farmers": _lookup_by_pk(Farmer, (row.get("farmer") for _, row in rows)),
+            "products": _lookup_by_pk(FarmerProduct, (row.get("product") for _, row in rows)),
+        }
+        # One bound serializer per chunk; run_validation applies the same field,
+        # validate_* and validate() rules as is_valid() without re-building fields per row.
+        validator = SupplyRecordIngestSerializer(context=context)
+        records = []
+        for number, row in rows:
+            try:
+                records.append(SupplyRecord(**validator.run_validation(row)))
+            except DRFValidationError as exc:
+                record_error(number, exc.detail)
+
+        if records:
+            with transaction.atomic():
+                SupplyRecord.objects.bulk_create(records, batch_size=chunk_size)
+            report["created"] += len(records)
+
+    return report
+
+
+class SupplyTransitionError(ValidationError):
+    """
+    Raised by bulk_update_supply_status when any record cannot be moved.
+    `problems` holds one {"id", "error"} dict per rejected record.
+    """
+    def __init__(self, problems: list[dict]):
+        self.problems = problems
+        super().__init__([f"{p['id']}: {p['error']}" for p in problems])
+
+
+def bulk_update_supply_status(ids, new_status: str, quality_notes=None, received_by=None) -> dict:
+    """
+    Move many SupplyRecords to APPROVED or COMPLETED in one transaction and
+    receive their quantities into the linked FarmerProducts.
+
+    Stock is added exactly once per record: only records leaving PENDING are
+    restocked (APPROVED -> COMPLETED is a status change only), and records
+    already in `new_status` are left untouched so retries are idempotent.
+    Received quantities are summed per product and applied in a single
+    CASE/WHEN UPDATE, so the write count does not grow with the number of records.
+
+    Raises SupplyTransitionError (nothing is written) if any id is unknown,
+    cannot make the transition, or its unit differs from its product's unit.
+    Returns {"updated", "unchanged", "restocked": [{"product_id", "added"}]}.
+    """
+    if new_status not in SUPPLY_BULK_TRANSITIONS:
+        raise ValidationError(f"Bulk status must be one of: {', '.join(SUPPLY_BULK_TRANSITIONS)}.")
+
+    pk_field = SupplyRecord._meta.pk
+    try:
+        wanted = {pk_field.to_python(i) for i in ids}
+    except (ValidationError, TypeError, ValueError):
+        raise ValidationError("ids must be a list of supply record ids.")
+    if not wanted:
+        raise ValidationError("No supply records provided.")
+
+    with transaction.atomic():
+        supplies = list(
+            SupplyRecord.objects.select_for_update()
+            .filter(pk__in=wanted)
+            .order_by("pk")
+            .values("id", "status", "quantity", "unit", "product_id")
+        )
+        found = {row["id"] for row in supplies}
+        problems = [{"id": str(pk), "error": "Supply record not found."} for pk in wanted - found]
+
+        product_ids = {row["product_id"] for row in supplies if row["product_id"]}
+        products = {
+            row["id"]: row
+            for row in FarmerProduct.objects.filter(pk__in=product_ids).values("id", "unit", "title")
+        }
+
+        to_update, unchanged, received = [], 0, {}
+        for row in supplies:
+            if row["status"] == new_status:
+                unchanged += 1
+                continue
+            if row["status"] not in SUPPLY_BULK_TRANSITIONS[new_status]:
+                problems.append({"id": str(row["id"]), "error": f"Cannot move from {row['status']} to {new_status}."})
+                continue
+            if row["product_id"] and row["status"] not in SUPPLY_STOCKED_STATUSES:
+                product = products[row["product_id"]]
+                if product["unit"] != row["unit"]:
+                    problems.append({
+                        "id": str(row["id"]),
+                        "error": f"Supply unit '{row['unit']}' does not match product unit '{product['unit']}'.",
+                    })
+                    continue
+                received[row["product_id"]] = received.get(row["product_id"], Decimal("0")) + row["quantity"]
+            to_update.append(row["id"])
+
+        if problems:
+            raise SupplyTransitionError(problems)
+
+        now = timezone.now()
+        changes = {"status": new_status, "updated_at": now}
+        if quality_notes is not None:
+            changes["quality_notes"] = quality_notes
+        if received_by is not None:
+            changes["received_by"] = received_by
+        updated = SupplyRecord.objects.filter(pk__in=to_update).update(**changes) if to_update else 0
+
+        if received:
+            quantity_field = FarmerProduct._meta.get_field("quantity_available")
+            FarmerProduct.objects.filter(pk__in=received.keys()).update(
+                quantity_available=F("quantity_available") + Case(
+                    *[When(pk=pid, then=Value(qty, output_field=quantity_field)) for pid, qty in received.items()],
+                    default=Value(Decimal("0"), output_field=quantity_field),
+                    output_field=quantity_field,
+                ),
+                updated_at=now,
+            )
+            # queryset.update skips signals, so refresh the cross-farmer price index explicitly
+            from marketplace.services import schedule_commodity_refresh
+            schedule_commodity_refresh({(products[pid]["title"], products[pid]["unit"]) for pid in received})
+
+    return {
+        "updated": updated,
+        "unchanged": unchanged,
+        "restocked": [{"product_id": pid, "added": qty} for pid, qty in received.items()],
+    }
+
+
+def update_supply_status(supply_id, new_status: str, quality_notes=None, received_by=None) -> SupplyRecord:
+    """
+    Move one SupplyRecord to any status and keep its FarmerProduct's stock in
+    step: entering APPROVED/COMPLETED from another status receives the
+    quantity, leaving them (e.g. APPROVED -> REJECTED) takes it back out,
+    never below zero. Notes and receiver are saved even when the status does
+    not change.
+
+    Raises SupplyTransitionError if a restock would mix units. Returns the record.
+    """
+    with transaction.atomic():
+        supply = SupplyRecord.objects.select_for_update().select_related("product").get(pk=supply_id)
+        product = supply.product
+        was_stocked = supply.status in SUPPLY_STOCKED_STATUSES
+        stocked = new_status in SUPPLY_STOCKED_STATUSES
+        # a record whose unit differs from its product's was never received into stock
+        if product and was_stocked != stocked and (product.unit == supply.unit or stocked):
+            if product.unit != supply.unit:
+                raise SupplyTransitionError([{
+                    "id": str(supply.pk),
+                    "error": f"Supply unit '{supply.unit}' does not match product unit '{product.unit}'.",
+                }])
+            quantity_field = FarmerProduct._meta.get_field("quantity_available")
+            change = supply.quantity if stocked else -supply.quantity
+            FarmerProduct.objects.filter(pk=product.pk).update(
+                quantity_available=Greatest(
+                    F("quantity_available") + Value(change, output_field=quantity_field),
+                    Value(Decimal("0"), output_field=quantity_field),
+                ),
+                updated_at=timezone.now(),
+            )
+            from marketplace.services import schedule_commodity_refresh
+            schedule_commodity_refresh({(product.title, product.unit)})
+
+        supply.status = new_status
+        if quality_notes is not None:
+            supply.quality_notes = quality_notes
+        if received_by is not None:
+            supply.received_by = received_by
+        supply.save(update_fields=["status", "quality_notes", "received_by", "updated_at"])
+    return supply
+
+
+def document_review_queue(now=None):
+    """Pending documents nobody currently holds a lease on, oldest first (served by the partial index)."""
+    now = now or timezone.now()
+    return (
+        FarmerDocument.objects.filter(review_status="PENDING")
+        .filter(Q(claim_expires_at__isnull=True) | Q(claim_expires_at__lte=now))
+        .order_by("uploaded_at")
+    )
+
+
+def claim_documents(reviewer, limit: int = 10, now=None) -> list:
+    """
+    Lease up to `limit` pending documents to `reviewer` for DOCUMENT_CLAIM_LEASE.
+
+    Candidate rows are locked with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent reviewers claiming at the same time each get a disjoint batch
+    instead of queueing behind each other. Leases the reviewer already holds are
+    renewed and returned too, so claiming again is safe after a page reload.
+    """
+    now = now or timezone.now()
+    limit = max(1, min(int(limit), DOCUMENT_CLAIM_MAX_BATCH))
+    with transaction.atomic():
+        held = list(
+            FarmerDocument.objects.filter(review_status="PENDING", claimed_by=reviewer, claim_expires_at__gt=now)
+            .values_list("id", flat=True)
+        )
+        fresh = []
+        if len(held) < limit:
+            fresh = list(
+                document_review_queue(now)
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[: limit - len(held)]
+            )
+        ids = held + fresh
+        if ids:
+            FarmerDocument.objects.filter(pk__in=ids).update(
+                claimed_by=reviewer, claim_expires_at=now + DOCUMENT_CLAIM_LEASE
+            )
+    return list(FarmerDocument.objects.filter(pk__in=ids).select_related("farmer").order_by("uploaded_at"))
+
+
+def release_documents(reviewer) -> int:
+    """Give back every lease `reviewer` holds."""
+    return FarmerDocument.objects.filter(claimed_by=reviewer, review_status="PENDING").update(
+        claimed_by=None, claim_expires_at=None
+    )
+
+
+def bulk_review_documents(reviewer, ids, decision: str, notes=None, now=None) -> dict:
+    """
+    Verify or reject many pending documents and update their farmers, in a
+    fixed number of statements regardless of batch size.
+
+    Documents leased to another reviewer (lease not yet expired) are skipped
+    and reported. Farmers are then updated set-wise: any rejected document in
+    this batch marks its farmer REJECTED; a farmer whose documents are all
+    verified becomes VERIFIED; everyone else is left as is.
+
+    Returns {"reviewed", "skipped": [ids], "farmers_verified", "farmers_rejected"}.
+    """
+    if decision not in DOCUMENT_REVIEW_DECISIONS:
+        raise ValidationError(f"decision must be one of: {', '.join(DOCUMENT_REVIEW_DECISIONS)}.")
+    new_status = DOCUMENT_REVIEW_DECISIONS[decision]
+    pk_field = FarmerDocument._meta.pk
+    try:
+        wanted = {pk_field.to_python(i) for i in ids}
+    except (ValidationError, TypeError, ValueError):
+        raise ValidationError("ids must be a list of document ids.")
+    if not wanted:
+        raise ValidationError("No documents provided.")
+
+    now = now or timezone.now()
+    reviewable = Q(claimed_by__isnull=True) | Q(claimed_by=reviewer) | Q(claim_expires_at__lte=now)
+    with transaction.atomic():
+        rows = list(
+            FarmerDocument.objects.select_for_update()
+            .filter(pk__in=wanted, review_status="PENDING")
+            .filter(reviewable)
+            .values_list("id", "farmer_id")
+        )
+        doc_ids = [doc_id for doc_id, _ in rows]
+        farmer_ids = {farmer_id for _, farmer_id in rows}
+
+        changes = {
+            "review_status": new_status,
+            "verified": new_status == "VERIFIED",
+            "reviewed_by": reviewer,
+            "reviewed_at": now,
+            "claimed_by": None,
+            "claim_expires_at": None,
+        }
+        if notes is not None:
+            changes["notes"] = notes
+        reviewed = FarmerDocument.objects.filter(pk__in=doc_ids).update(**changes) if doc_ids else 0
+
+        farmers_verified = farmers_rejected = 0
+        if farmer_ids:
+            farmers = Farmer.objects.filter(pk__in=farmer_ids)
+            if new_status == "REJECTED":
+                farmers_rejected = farmers.update(verified="REJECTED", updated_at=now)
+            else:
+                unverified_docs = FarmerDocument.objects.filter(farmer=OuterRef("pk")).exclude(review_status="VERIFIED")
+                farmers_verified = farmers.exclude(Exists(unverified_docs)).update(verified="VERIFIED", updated_at=now)
+
+    return {
+        "reviewed": reviewed,
+        "skipped": sorted(str(pk) for pk in wanted - set(doc_ids)),
+        "farmers_verified": farmers_verified,
+        "farmers_rejected": farmers_rejected,
+    }
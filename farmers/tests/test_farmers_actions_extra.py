@@ -52,3 +52,35 @@ def test_admin_can_update_supply_status_valid(client):
         data={"status": "APPROVED", "quality_notes": "ok"},
     )
     assert r.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_farmer_document_direct_upload(client, settings, tmp_path):
+    settings.DIRECT_UPLOAD_BACKEND = "core.uploads.LocalDirectUpload"
+    settings.DIRECT_UPLOAD_LOCAL_ROOT = str(tmp_path)
+    settings.DIRECT_UPLOAD_LOCAL_URL = "http://storage.test/uploads/"
+    user = User.objects.create_user(email="kyc_farmer@example.com", password="StrongPass123", full_name="KYC", role="farmer")
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    farmer = Farmer.objects.create(contact_name="KYC Farmer", user=user)
+    other = Farmer.objects.create(contact_name="Someone Else")
+
+    client.force_login(user)
+    assert client.post(f"/api/farmers/farmers/{other.id}/documents/upload-ticket/").status_code in (
+        status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND,
+    )
+    r_ticket = client.post(f"/api/farmers/farmers/{farmer.id}/documents/upload-ticket/")
+    assert r_ticket.status_code == status.HTTP_201_CREATED
+    ticket = r_ticket.json()["data"]
+
+    (tmp_path / ticket["key"]).parent.mkdir(parents=True)
+    (tmp_path / ticket["key"]).write_bytes(b"%PDF-1.7")
+    r = client.post(
+        f"/api/farmers/farmers/{farmer.id}/documents/confirm-upload/",
+        {"upload_ticket": ticket["ticket"], "upload": {}, "name": "NIN"},
+        format="json",
+    )
+    assert r.status_code == status.HTTP_201_CREATED
+    document = FarmerDocument.objects.get(farmer=farmer)
+    assert (document.name, document.review_status) == ("NIN", "PENDING")
+    assert document.file_url == f"http://storage.test/uploads/{ticket['key']}"
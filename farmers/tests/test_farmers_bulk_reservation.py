@@ -0,0 +1,92 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from farmers.models import Farmer, FarmerProduct
+from farmers import services
+
+
+def _make_products(count, quantity=5):
+    farmer = Farmer.objects.create(contact_name="Farmer Basket")
+    return [
+        FarmerProduct.objects.create(
+            farmer=farmer,
+            title=f"Item {i}",
+            price_per_unit=10,
+            quantity_available=quantity,
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_reserve_bulk_stock_merges_duplicate_lines():
+    product = _make_products(1, quantity=5)[0]
+
+    # 3 + 3 exceeds stock even though each line alone would fit
+    with pytest.raises(services.InsufficientStockError) as exc:
+        services.reserve_bulk_stock([
+            {"product_id": product.id, "quantity": 3},
+            {"product_id": str(product.id), "quantity": 3},
+        ])
+    shortfall = exc.value.shortfalls[0]
+    assert shortfall["requested"] == Decimal("6")
+    assert shortfall["shortfall"] == Decimal("1")
+    product.refresh_from_db()
+    assert product.quantity_available == Decimal("5")
+
+    report = services.reserve_bulk_stock([
+        {"product_id": product.id, "quantity": 2},
+        {"product_id": str(product.id), "quantity": 2},
+    ])
+    assert report == [{
+        "product_id": product.id,
+        "title": product.title,
+        "reserved": Decimal("4"),
+        "remaining": Decimal("1"),
+    }]
+    product.refresh_from_db()
+    assert product.quantity_available == Decimal("1")
+
+
+@pytest.mark.django_db
+def test_reserve_bulk_stock_reports_every_short_line_and_writes_nothing():
+    ok, short_a, short_b = _make_products(3, quantity=2)
+    with pytest.raises(services.InsufficientStockError) as exc:
+        services.reserve_bulk_stock([
+            {"product_id": ok.id, "quantity": 1},
+            {"product_id": short_a.id, "quantity": 3},
+            {"product_id": short_b.id, "quantity": 5},
+        ])
+    assert {line["product_id"] for line in exc.value.shortfalls} == {short_a.id, short_b.id}
+    ok.refresh_from_db()
+    assert ok.quantity_available == Decimal("2")
+
+
+@pytest.mark.django_db
+def test_reserve_bulk_stock_rejects_bad_lines():
+    product = _make_products(1)[0]
+    with pytest.raises(services.ValidationError):
+        services.reserve_bulk_stock([{"product_id": product.id, "quantity": 0}])
+    with pytest.raises(services.ValidationError):
+        services.reserve_bulk_stock([{"product_id": "not-a-uuid", "quantity": 1}])
+    with pytest.raises(services.ValidationError):
+        services.reserve_bulk_stock([{"quantity": 1}])
+
+
+@pytest.mark.django_db
+def test_reserve_bulk_stock_query_count_is_constant():
+    small = _make_products(2)
+    large = _make_products(20)
+
+    with CaptureQueriesContext(connection) as small_ctx:
+        services.reserve_bulk_stock([{"product_id": p.id, "quantity": 1} for p in small])
+    with CaptureQueriesContext(connection) as large_ctx:
+        services.reserve_bulk_stock([{"product_id": p.id, "quantity": 1} for p in large])
+
+    assert len(large_ctx.captured_queries) == len(small_ctx.captured_queries)
+    assert all(
+        p.quantity_available == Decimal("4")
+        for p in FarmerProduct.objects.filter(id__in=[p.id for p in large])
+    )
@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework import status
+
+from farmers.models import Farmer
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_client(client):
+    admin = User.objects.create_superuser(username="admin_search", password="p", email="admin_search@test.com")
+    client.force_login(admin)
+    return client
+
+
+@pytest.fixture
+def directory():
+    return {
+        "ada": Farmer.objects.create(
+            contact_name="Ada  Okafor", business_name="Green Acres", phone="+234 803 123 4567", state="Enugu", lga="Nsukka"
+        ),
+        "bello": Farmer.objects.create(contact_name="Bello Musa", phone="0805-999-0000", state="Kano", lga="Nassarawa"),
+        "chi": Farmer.objects.create(contact_name="Chiamaka Obi", state="Enugu", lga="Udi"),
+    }
+
+
+def _ids(response):
+    return {row["id"] for row in response.json()["data"]["results"]}
+
+
+@pytest.mark.django_db
+def test_search_keys_are_maintained_on_save(directory):
+    ada = directory["ada"]
+    assert ada.search_text == "ada okafor green acres enugu nsukka"
+    assert ada.phone_digits == "08031234567"
+
+    ada.phone = "0701 000 1111"
+    ada.contact_name = "Adaeze Okafor"
+    ada.save(update_fields=["phone", "contact_name"])
+    ada.refresh_from_db()
+    assert ada.phone_digits == "07010001111"
+    assert ada.search_text.startswith("adaeze okafor")
+
+
+@pytest.mark.django_db
+def test_word_prefix_and_phone_search(admin_client, directory):
+    r = admin_client.get("/api/farmers/farmers/", {"search": "OKAF"})
+    assert r.status_code == status.HTTP_200_OK
+    assert _ids(r) == {str(directory["ada"].id)}
+
+    assert _ids(admin_client.get("/api/farmers/farmers/", {"search": "green bello"})) == set()
+    assert _ids(admin_client.get("/api/farmers/farmers/", {"search": "enugu"})) == {
+        str(directory["ada"].id), str(directory["chi"].id)
+    }
+    # Infix fragments do not match; only word prefixes do
+    assert _ids(admin_client.get("/api/farmers/farmers/", {"search": "kafor"})) == set()
+
+    r_phone = admin_client.get("/api/farmers/farmers/", {"search": "+2348031"})
+    assert _ids(r_phone) == {str(directory["ada"].id)}
+    assert _ids(admin_client.get("/api/farmers/farmers/", {"search": "0805 999"})) == {str(directory["bello"].id)}
+
+
+@pytest.mark.django_db
+def test_state_and_lga_fast_paths(admin_client, directory):
+    r = admin_client.get("/api/farmers/farmers/", {"state": "enugu"})
+    assert _ids(r) == {str(directory["ada"].id), str(directory["chi"].id)}
+    r = admin_client.get("/api/farmers/farmers/", {"state": "ENUGU", "lga": "udi"})
+    assert _ids(r) == {str(directory["chi"].id)}
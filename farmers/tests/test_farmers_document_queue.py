@@ -0,0 +1,119 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from farmers.models import Farmer, FarmerDocument
+from farmers.services import DOCUMENT_CLAIM_LEASE, bulk_review_documents, claim_documents, document_review_queue
+
+User = get_user_model()
+
+
+def _reviewer(name):
+    user = User.objects.create_superuser(username=name, password="p", email=f"{name}@test.com")
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    return user
+
+
+def _docs(farmer, count):
+    return [
+        FarmerDocument.objects.create(farmer=farmer, name=f"Doc {i}", file_url=f"https://files.example.com/{i}.pdf")
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def farmer():
+    return Farmer.objects.create(contact_name="KYC Farmer")
+
+
+@pytest.mark.django_db
+def test_claims_are_disjoint_and_expire(farmer):
+    _docs(farmer, 5)
+    ada, bola = _reviewer("ada"), _reviewer("bola")
+
+    first = claim_documents(ada, limit=3)
+    second = claim_documents(bola, limit=3)
+    assert len(first) == 3 and len(second) == 2
+    assert not {d.id for d in first} & {d.id for d in second}
+    assert document_review_queue().count() == 0
+
+    # Re-claiming renews the reviewer's own leases instead of taking more
+    assert {d.id for d in claim_documents(ada, limit=3)} == {d.id for d in first}
+
+    later = timezone.now() + DOCUMENT_CLAIM_LEASE + timedelta(seconds=1)
+    assert document_review_queue(now=later).count() == 5
+
+
+@pytest.mark.django_db
+def test_bulk_verify_updates_documents_and_farmer_in_constant_statements(farmer):
+    reviewer = _reviewer("rev")
+    few = _docs(farmer, 2)
+    other = Farmer.objects.create(contact_name="Big Farmer")
+    many = _docs(other, 25)
+
+    with CaptureQueriesContext(connection) as small:
+        bulk_review_documents(reviewer, [d.id for d in few], "verify")
+    with CaptureQueriesContext(connection) as large:
+        result = bulk_review_documents(reviewer, [d.id for d in many], "verify", notes="ok")
+    assert len(large.captured_queries) == len(small.captured_queries)
+    assert result["reviewed"] == 25
+    assert FarmerDocument.objects.filter(review_status="VERIFIED", verified=True).count() == 27
+    farmer.refresh_from_db()
+    other.refresh_from_db()
+    assert farmer.verified == other.verified == "VERIFIED"
+
+
+@pytest.mark.django_db
+def test_bulk_review_skips_documents_leased_to_others(farmer):
+    ada, bola = _reviewer("ada2"), _reviewer("bola2")
+    doc_a, doc_b = _docs(farmer, 2)
+    claim_documents(ada, limit=1)
+
+    held_by_ada = FarmerDocument.objects.get(claimed_by=ada)
+    result = bulk_review_documents(bola, [doc_a.id, doc_b.id], "reject")
+    assert result["reviewed"] == 1
+    assert result["skipped"] == [str(held_by_ada.id)]
+    farmer.refresh_from_db()
+    assert farmer.verified == "REJECTED"
+
+
+@pytest.mark.django_db
+def test_queue_claim_and_bulk_review_endpoints(client, farmer):
+    reviewer = _reviewer("rev_api")
+    docs = _docs(farmer, 3)
+    client.force_login(reviewer)
+
+    r_queue = client.get("/api/farmers/farmer-docs/queue/")
+    assert r_queue.status_code == status.HTTP_200_OK
+    assert r_queue.json()["data"]["count"] == 3
+
+    r_claim = client.post("/api/farmers/farmer-docs/claim/", {"limit": 2}, format="json")
+    assert r_claim.status_code == status.HTTP_200_OK
+    assert len(r_claim.json()["data"]) == 2
+
+    r_review = client.post(
+        "/api/farmers/farmer-docs/bulk_review/", {"ids": [str(d.id) for d in docs], "decision": "verify"}, format="json"
+    )
+    assert r_review.status_code == status.HTTP_200_OK
+    assert r_review.json()["data"]["farmers_verified"] == 1
+
+    r_bad = client.post("/api/farmers/farmer-docs/bulk_review/", {"ids": [], "decision": "maybe"}, format="json")
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_verified_cannot_be_set_through_the_api(client, farmer):
+    client.force_login(_reviewer("doc_writer"))
+    r = client.post(
+        "/api/farmers/farmer-docs/",
+        {"farmer": str(farmer.id), "name": "NIN", "file_url": "https://files.example.com/nin.pdf", "verified": True},
+        format="json",
+    )
+    assert r.status_code == status.HTTP_201_CREATED
+    document = FarmerDocument.objects.get(pk=r.json()["data"]["id"])
+    assert (document.verified, document.review_status) == (False, "PENDING")
@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from farmers.models import Farmer, FarmerDocument, FarmerProduct
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_client(client):
+    admin = User.objects.create_superuser(username="admin_expand", password="p", email="admin_expand@test.com")
+    client.force_login(admin)
+    return client
+
+
+def _farmers_with_products(count, products_each):
+    farmers = []
+    for i in range(count):
+        farmer = Farmer.objects.create(contact_name=f"Farmer {i}")
+        for j in range(products_each):
+            FarmerProduct.objects.create(farmer=farmer, title=f"Crop {j}", price_per_unit=1, quantity_available=1)
+        FarmerDocument.objects.create(farmer=farmer, name="ID card", file_url="https://files.example.com/id.pdf")
+        farmers.append(farmer)
+    return farmers
+
+
+@pytest.mark.django_db
+def test_relations_are_not_nested_by_default(admin_client):
+    _farmers_with_products(2, 3)
+    r = admin_client.get("/api/farmers/farmers/")
+    assert r.status_code == status.HTTP_200_OK
+    row = r.json()["data"]["results"][0]
+    assert "products" not in row
+    assert "documents" not in row
+
+
+@pytest.mark.django_db
+def test_expand_nests_capped_latest_products(admin_client):
+    _farmers_with_products(2, 8)
+    r = admin_client.get("/api/farmers/farmers/", {"expand": "products,documents", "expand_limit": "5"})
+    assert r.status_code == status.HTTP_200_OK
+    for row in r.json()["data"]["results"]:
+        assert len(row["products"]) == 5
+        assert row["products"][0]["title"] == "Crop 7"
+        assert len(row["documents"]) == 1
+
+
+@pytest.mark.django_db
+def test_list_query_count_is_independent_of_catalog_size(admin_client):
+    _farmers_with_products(2, 1)
+    with CaptureQueriesContext(connection) as small:
+        admin_client.get("/api/farmers/farmers/", {"expand": "products,documents"})
+    _farmers_with_products(8, 6)
+    with CaptureQueriesContext(connection) as large:
+        r = admin_client.get("/api/farmers/farmers/", {"expand": "products,documents"})
+    assert len(r.json()["data"]["results"]) == 10
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+@pytest.mark.django_db
+def test_farmer_products_endpoint_is_paginated(admin_client):
+    farmer = _farmers_with_products(1, 12)[0]
+    r = admin_client.get(f"/api/farmers/farmers/{farmer.id}/products/")
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["data"]["count"] == 12
+    assert len(r.json()["data"]["results"]) == 10
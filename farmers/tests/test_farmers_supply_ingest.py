@@ -0,0 +1,114 @@
+import io
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from farmers.models import Farmer, FarmerProduct, SupplyRecord
+from farmers.services import ingest_supply_records
+
+User = get_user_model()
+
+
+@pytest.fixture
+def catalog():
+    farmer = Farmer.objects.create(contact_name="Intake Farmer")
+    other = Farmer.objects.create(contact_name="Other Farmer")
+    product = FarmerProduct.objects.create(farmer=farmer, title="Maize", price_per_unit=1, quantity_available=1)
+    foreign = FarmerProduct.objects.create(farmer=other, title="Rice", price_per_unit=1, quantity_available=1)
+    return farmer, product, foreign
+
+
+def _csv(rows):
+    lines = ["farmer,product,quantity,unit,reference_code"]
+    lines += [",".join(str(v) for v in row) for row in rows]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.django_db
+def test_csv_ingest_reports_bad_rows_and_creates_the_rest(catalog):
+    farmer, product, foreign = catalog
+    data = _csv([
+        (farmer.id, product.id, "10.5", "kg", "WH-1"),
+        (farmer.id, "", "3", "bag", "WH-2"),
+        (farmer.id, product.id, "0", "kg", "WH-3"),
+        ("not-a-uuid", "", "1", "kg", "WH-4"),
+        (farmer.id, foreign.id, "1", "kg", "WH-5"),
+        (farmer.id, product.id, "1", "tonnes", "WH-6"),
+    ])
+    report = ingest_supply_records(io.StringIO(data), "csv")
+
+    assert (report["processed"], report["created"], report["failed"]) == (6, 2, 4)
+    assert [e["row"] for e in report["errors"]] == [3, 4, 5, 6]
+    assert "quantity" in report["errors"][0]["errors"]
+    assert "farmer" in report["errors"][1]["errors"]
+    assert "product" in report["errors"][2]["errors"]
+    assert "unit" in report["errors"][3]["errors"]
+    assert set(SupplyRecord.objects.values_list("reference_code", flat=True)) == {"WH-1", "WH-2"}
+    assert SupplyRecord.objects.get(reference_code="WH-2").product is None
+
+
+@pytest.mark.django_db
+def test_ingest_queries_scale_with_chunks_not_rows(catalog):
+    farmer, product, _ = catalog
+    rows = [(farmer.id, product.id, "1", "kg", f"R{i}") for i in range(40)]
+
+    with CaptureQueriesContext(connection) as small:
+        ingest_supply_records(io.StringIO(_csv(rows[:5])), "csv", chunk_size=50)
+    with CaptureQueriesContext(connection) as large:
+        report = ingest_supply_records(io.StringIO(_csv(rows)), "csv", chunk_size=50)
+
+    assert report["created"] == 40
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+@pytest.mark.django_db
+def test_ndjson_endpoint_and_command(client, catalog, tmp_path):
+    farmer, product, _ = catalog
+    admin = User.objects.create_superuser(username="admin_ingest", password="p", email="admin_ingest@test.com")
+    client.force_login(admin)
+    lines = [
+        json.dumps({"farmer": str(farmer.id), "product": str(product.id), "quantity": "2", "received_by": "Ada"}),
+        "{broken",
+    ]
+    upload = SimpleUploadedFile("shift.ndjson", ("\n".join(lines) + "\n").encode(), content_type="application/x-ndjson")
+    r = client.post("/api/farmers/supply-records/ingest/", {"file": upload}, format="multipart")
+    assert r.status_code == status.HTTP_201_CREATED
+    data = r.json()["data"]
+    assert (data["created"], data["failed"]) == (1, 1)
+    assert data["errors"][0]["row"] == 2
+
+    r_bad = client.post("/api/farmers/supply-records/ingest/", {}, format="multipart")
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
+
+    path = tmp_path / "shift.csv"
+    path.write_text(_csv([(farmer.id, product.id, "4", "kg", "CMD-1")]))
+    call_command("ingest_supply_records", str(path))
+    assert SupplyRecord.objects.filter(reference_code="CMD-1").exists()
+
+
+@pytest.mark.django_db
+def test_unreadable_tail_is_reported_with_the_rows_already_created(client, catalog):
+    farmer, product, _ = catalog
+    admin = User.objects.create_superuser(username="admin_ingest_tail", password="p", email="admin_tail@test.com")
+    client.force_login(admin)
+    rows = [(farmer.id, product.id, "1", "kg", f"T{i}") for i in range(25)]
+    payload = _csv(rows).encode() + b"\xff\xfe broken\n"
+    upload = SimpleUploadedFile("tail.csv", payload, content_type="text/csv")
+    r = client.post("/api/farmers/supply-records/ingest/", {"file": upload}, format="multipart")
+    assert r.status_code == status.HTTP_201_CREATED
+    data = r.json()["data"]
+    assert (data["created"], data["failed"]) == (25, 1)
+    assert data["errors"][0]["row"] == 26
+    assert SupplyRecord.objects.count() == 25
+
+    # a malformed CSV record ends the read the same way instead of raising
+    oversized = _csv(rows[:2]) + f'{farmer.id},,"{"x" * 200000}",kg,BIG\n'
+    report = ingest_supply_records(io.StringIO(oversized), "csv", chunk_size=1)
+    assert (report["created"], report["failed"]) == (2, 1)
+    assert "Invalid CSV" in report["errors"][0]["errors"]["non_field_errors"][0]
@@ -0,0 +1,130 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from farmers.models import Farmer, FarmerProduct, SupplyRecord
+from farmers.services import SupplyTransitionError, bulk_update_supply_status
+
+User = get_user_model()
+
+
+@pytest.fixture
+def stock():
+    farmer = Farmer.objects.create(contact_name="Closeout Farmer")
+    maize = FarmerProduct.objects.create(farmer=farmer, title="Maize", unit="kg", price_per_unit=1, quantity_available="5")
+    rice = FarmerProduct.objects.create(farmer=farmer, title="Rice", unit="bag", price_per_unit=1, quantity_available="0")
+    return farmer, maize, rice
+
+
+def _supply(farmer, product, quantity, unit="kg", status_value="PENDING"):
+    return SupplyRecord.objects.create(farmer=farmer, product=product, quantity=quantity, unit=unit, status=status_value)
+
+
+@pytest.mark.django_db
+def test_bulk_approval_restocks_once_per_record(stock):
+    farmer, maize, rice = stock
+    supplies = [_supply(farmer, maize, "2.5"), _supply(farmer, maize, "1.5"), _supply(farmer, rice, "3", unit="bag")]
+    no_product = _supply(farmer, None, "9")
+
+    result = bulk_update_supply_status([s.id for s in supplies] + [no_product.id], "APPROVED", received_by="Gate 1")
+    assert result["updated"] == 4
+    maize.refresh_from_db()
+    rice.refresh_from_db()
+    assert maize.quantity_available == Decimal("9.000")
+    assert rice.quantity_available == Decimal("3.000")
+    assert set(SupplyRecord.objects.values_list("received_by", flat=True)) == {"Gate 1"}
+
+    # Completing approved records and retrying must not restock again
+    bulk_update_supply_status([s.id for s in supplies], "COMPLETED")
+    again = bulk_update_supply_status([s.id for s in supplies], "COMPLETED")
+    assert again == {"updated": 0, "unchanged": 3, "restocked": []}
+    maize.refresh_from_db()
+    assert maize.quantity_available == Decimal("9.000")
+
+
+@pytest.mark.django_db
+def test_bulk_approval_is_all_or_nothing(stock):
+    farmer, maize, _ = stock
+    good = _supply(farmer, maize, "1")
+    rejected = _supply(farmer, maize, "1", status_value="REJECTED")
+    wrong_unit = _supply(farmer, maize, "1", unit="bag")
+
+    with pytest.raises(SupplyTransitionError) as exc:
+        bulk_update_supply_status([good.id, rejected.id, wrong_unit.id], "APPROVED")
+    assert {p["id"] for p in exc.value.problems} == {str(rejected.id), str(wrong_unit.id)}
+    good.refresh_from_db()
+    maize.refresh_from_db()
+    assert good.status == "PENDING"
+    assert maize.quantity_available == Decimal("5.000")
+
+
+@pytest.mark.django_db
+def test_bulk_approval_query_count_is_constant(stock):
+    farmer, maize, rice = stock
+    few = [_supply(farmer, maize, "1")]
+    many = [_supply(farmer, maize if i % 2 else rice, "1", unit="kg" if i % 2 else "bag") for i in range(30)]
+
+    with CaptureQueriesContext(connection) as small:
+        bulk_update_supply_status([s.id for s in few], "APPROVED")
+    with CaptureQueriesContext(connection) as large:
+        bulk_update_supply_status([s.id for s in many], "APPROVED")
+    assert len(large.captured_queries) <= len(small.captured_queries) + 2
+
+
+@pytest.mark.django_db
+def test_bulk_status_and_single_update_endpoints(client, stock):
+    farmer, maize, _ = stock
+    admin = User.objects.create_superuser(username="admin_closeout", password="p", email="admin_closeout@test.com")
+    client.force_login(admin)
+    a, b = _supply(farmer, maize, "1"), _supply(farmer, maize, "2")
+
+    r = client.post(
+        "/api/farmers/supply-records/bulk_status/", {"ids": [str(a.id)], "status": "APPROVED"}, format="json"
+    )
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["data"]["updated"] == 1
+
+    r_single = client.post(f"/api/farmers/supply-records/{b.id}/update_status/", data={"status": "COMPLETED"})
+    assert r_single.status_code == status.HTTP_200_OK
+    maize.refresh_from_db()
+    assert maize.quantity_available == Decimal("8.000")
+
+    r_bad = client.post(
+        "/api/farmers/supply-records/bulk_status/", {"ids": [str(a.id)], "status": "REJECTED"}, format="json"
+    )
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_single_update_keeps_notes_transitions_and_reverses_stock(client, stock):
+    farmer, maize, _ = stock
+    admin = User.objects.create_superuser(username="admin_single", password="p", email="admin_single@test.com")
+    client.force_login(admin)
+    supply = _supply(farmer, maize, "2")
+    url = f"/api/farmers/supply-records/{supply.id}/update_status/"
+
+    assert client.post(url, data={"status": "APPROVED"}).status_code == status.HTTP_200_OK
+    # same status: the notes are still saved and stock is not added twice
+    r = client.post(url, data={"status": "APPROVED", "quality_notes": "Dry", "received_by": "Gate 2"})
+    assert r.status_code == status.HTTP_200_OK
+    supply.refresh_from_db()
+    maize.refresh_from_db()
+    assert (supply.quality_notes, supply.received_by) == ("Dry", "Gate 2")
+    assert maize.quantity_available == Decimal("7.000")
+
+    # rejecting an approved record takes the received quantity back out
+    assert client.post(url, data={"status": "REJECTED"}).status_code == status.HTTP_200_OK
+    maize.refresh_from_db()
+    assert maize.quantity_available == Decimal("5.000")
+
+    # and a rejected record may still be approved
+    assert client.post(url, data={"status": "APPROVED"}).status_code == status.HTTP_200_OK
+    maize.refresh_from_db()
+    assert maize.quantity_available == Decimal("7.000")
+
+    wrong_unit = _supply(farmer, maize, "1", unit="bag")
+    r_bad = client.post(f"/api/farmers/supply-records/{wrong_unit.id}/update_status/", data={"status": "APPROVED"})
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
@@ -1,16 +1,37 @@
 # farmers/views.py
+import os
+
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from accounts.permissions import IsEmailVerified
+from core.uploads import UploadError, confirm_upload, issue_upload_ticket
 
+from .filters import FarmerDirectorySearchFilter
 from .models import Farmer, FarmerDocument, FarmerProduct, SupplyRecord
+from .services import (
+    SupplyTransitionError,
+    bulk_review_documents,
+    bulk_update_supply_status,
+    claim_documents,
+    decode_lines,
+    document_review_queue,
+    ingest_supply_records,
+    release_documents,
+    update_supply_status,
+)
 from .serializers import (
     FarmerSerializer,
     FarmerDocumentSerializer,
     FarmerProductSerializer,
     SupplyRecordSerializer,
+    FARMER_EXPANDABLE_RELATIONS,
+    FARMER_EXPAND_DEFAULT_LIMIT,
+    FARMER_EXPAND_MAX_LIMIT,
 )
 
 
@@ -49,12 +70,44 @@ class FarmerViewSet(viewsets.ModelViewSet):
     queryset = Farmer.objects.all().select_related("user")
     serializer_class = FarmerSerializer
     permission_classes = [IsAdminOrOwner, IsEmailVerified]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ("contact_name", "business_name", "phone", "state", "lga")
+    filter_backends = [FarmerDirectorySearchFilter, filters.OrderingFilter]
     ordering_fields = ("created_at", "business_name", "contact_name")
 
+    def get_expand(self):
+        raw = self.request.query_params.get("expand", "") if self.request else ""
+        requested = {part.strip() for part in raw.split(",") if part.strip()}
+        return requested & set(FARMER_EXPANDABLE_RELATIONS)
+
+    def get_expand_limit(self):
+        try:
+            limit = int(self.request.query_params.get("expand_limit", FARMER_EXPAND_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            limit = FARMER_EXPAND_DEFAULT_LIMIT
+        return max(1, min(limit, FARMER_EXPAND_MAX_LIMIT))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        context["expand_limit"] = self.get_expand_limit()
+        return context
+
     def get_queryset(self):
         qs = super().get_queryset()
+        # Prefetch only the relations the client asked for, capped to the latest N rows per farmer
+        expand = self.get_expand()
+        limit = self.get_expand_limit()
+        if "products" in expand:
+            qs = qs.prefetch_related(Prefetch(
+                "products",
+                queryset=FarmerProduct.objects.order_by("-created_at")[:limit],
+                to_attr="expanded_products",
+            ))
+        if "documents" in expand:
+            qs = qs.prefetch_related(Prefetch(
+                "documents",
+                queryset=FarmerDocument.objects.order_by("-uploaded_at")[:limit],
+                to_attr="expanded_documents",
+            ))
         # Optionally limit non-staff users to their own profile
         if self.request.user.is_authenticated and not self.request.user.is_staff:
             # if user is linked to a farmer profile, show only that
@@ -78,6 +131,66 @@ class FarmerViewSet(viewsets.ModelViewSet):
         farmer.save(update_fields=["verified", "verification_note"])
         return Response(self.get_serializer(farmer).data)
 
+    @action(detail=True, methods=["get"])
+    def products(self, request, pk=None):
+        """
+        Paginated full product list for one farmer; the nested `?expand=products`
+        view only carries the latest few.
+        """
+        farmer = self.get_object()
+        qs = farmer.products.order_by("-created_at")
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            serializer = FarmerProductSerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        return Response(FarmerProductSerializer(qs, many=True, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=["get"])
+    def documents(self, request, pk=None):
+        farmer = self.get_object()
+        qs = farmer.documents.order_by("-uploaded_at")
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            serializer = FarmerDocumentSerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        return Response(FarmerDocumentSerializer(qs, many=True, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=["post"], url_path="documents/upload-ticket")
+    def document_upload_ticket(self, request, pk=None):
+        """
+        Short-lived signed ticket for uploading a KYC document straight to
+        storage; finish with documents/confirm-upload.
+        """
+        farmer = self.get_object()
+        try:
+            ticket = issue_upload_ticket("farmer_document", farmer.pk, request.user)
+        except UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(ticket, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"], url_path="documents/confirm-upload")
+    def confirm_document_upload(self, request, pk=None):
+        """
+        Record a directly uploaded document.
+        Payload: {"upload_ticket": "...", "upload": {<storage response>}, "name": "NIN", "notes": "..."}
+        """
+        farmer = self.get_object()
+        name = (request.data.get("name") or "").strip()
+        if not name:
+            return Response({"detail": "name is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_url = confirm_upload(
+                request.data.get("upload_ticket"), request.data.get("upload") or {}, "farmer_document", farmer.pk, request.user
+            )
+        except UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        document = FarmerDocument.objects.create(
+            farmer=farmer, name=name[:255], file_url=file_url, notes=request.data.get("notes", "")
+        )
+        return Response(
+            FarmerDocumentSerializer(document, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED
+        )
+
 
 class FarmerProductViewSet(viewsets.ModelViewSet):
     queryset = FarmerProduct.objects.select_related("farmer").all()
@@ -141,12 +254,62 @@ class SupplyRecordViewSet(viewsets.ModelViewSet):
         new_status = request.data.get("status")
         if new_status not in dict(SupplyRecord.STATUS_CHOICES):
             return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
-        supply.status = new_status
-        supply.quality_notes = request.data.get("quality_notes", supply.quality_notes)
-        supply.received_by = request.data.get("received_by", supply.received_by)
-        supply.save(update_fields=["status", "quality_notes", "received_by", "updated_at"])
+        try:
+            # keeps the linked product's stock in step with approvals and reversals
+            supply = update_supply_status(
+                supply.pk,
+                new_status,
+                quality_notes=request.data.get("quality_notes"),
+                received_by=request.data.get("received_by"),
+            )
+        except SupplyTransitionError as exc:
+            return Response({"detail": exc.problems[0]["error"]}, status=status.HTTP_400_BAD_REQUEST)
         return Response(self.get_serializer(supply).data)
 
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def bulk_status(self, request):
+        """
+        Admin action to move many supply records to APPROVED/COMPLETED in one
+        transaction, adding received quantities to the linked farmer products.
+        Body: {"ids": [...], "status": "APPROVED", "quality_notes"?, "received_by"?}
+        """
+        ids = request.data.get("ids")
+        if not isinstance(ids, list):
+            return Response({"detail": "ids must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = bulk_update_supply_status(
+                ids,
+                request.data.get("status"),
+                quality_notes=request.data.get("quality_notes"),
+                received_by=request.data.get("received_by"),
+            )
+        except SupplyTransitionError as exc:
+            return Response({"detail": "Some supply records cannot be updated.", "problems": exc.problems},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except DjangoValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def ingest(self, request):
+        """
+        Bulk-ingest warehouse intake rows from an uploaded CSV or NDJSON `file`.
+        The format comes from `data_format` or the file extension (.csv / .ndjson / .jsonl).
+        Valid rows are created; invalid ones are returned in a per-row error report.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "Upload a CSV or NDJSON file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        data_format = request.data.get("data_format")
+        if not data_format:
+            extension = os.path.splitext(upload.name)[1].lower()
+            data_format = "ndjson" if extension in (".ndjson", ".jsonl") else "csv"
+        try:
+            report = ingest_supply_records(decode_lines(upload), data_format=data_format)
+        except DjangoValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report["created"] else status.HTTP_200_OK)
+
 
 class FarmerDocumentViewSet(viewsets.ModelViewSet):
     queryset = FarmerDocument.objects.select_related("farmer").all()
@@ -172,5 +335,51 @@ class FarmerDocumentViewSet(viewsets.ModelViewSet):
         doc = self.get_object()
         doc.verified = bool(request.data.get("verified", True))
         doc.notes = request.data.get("notes", doc.notes)
-        doc.save(update_fields=["verified", "notes"])
+        doc.review_status = "VERIFIED" if doc.verified else "PENDING"
+        doc.save(update_fields=["verified", "notes", "review_status"])
         return Response(self.get_serializer(doc).data)
+
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def queue(self, request):
+        """
+        Pending documents not currently leased to a reviewer, oldest first.
+        """
+        qs = document_review_queue().select_related("farmer")
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(qs, many=True).data)
+
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def claim(self, request):
+        """
+        Lease a batch of pending documents to the calling reviewer. Concurrent
+        reviewers never receive the same document. Body: {"limit": 10}.
+        """
+        try:
+            limit = int(request.data.get("limit", 10))
+        except (TypeError, ValueError):
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        docs = claim_documents(request.user, limit=limit)
+        return Response(self.get_serializer(docs, many=True).data)
+
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def release(self, request):
+        return Response({"released": release_documents(request.user)})
+
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def bulk_review(self, request):
+        """
+        Verify or reject many documents at once and update their farmers.
+        Body: {"ids": [...], "decision": "verify" | "reject", "notes"?}
+        """
+        ids = request.data.get("ids")
+        if not isinstance(ids, list):
+            return Response({"detail": "ids must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = bulk_review_documents(
+                request.user, ids, request.data.get("decision"), notes=request.data.get("notes")
+            )
+        except DjangoValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
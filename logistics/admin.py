@@ -1,6 +1,9 @@
 # logistics/admin.py
 from django.contrib import admin
-from .models import LogisticsAgent, Vehicle, Dispatch, DispatchStatusUpdate
+from .models import (
+    LogisticsAgent, Vehicle, Dispatch, DispatchStatusUpdate, DeliveryRun, ZoneTariff, VehicleTariff, SurgeWindow,
+    AgentLocationPing, DeliveryDurationStat, DeliveryEtaRefresh,
+)
 
 
 @admin.register(LogisticsAgent)
@@ -12,7 +15,7 @@ class LogisticsAgentAdmin(admin.ModelAdmin):
 
 @admin.register(Vehicle)
 class VehicleAdmin(admin.ModelAdmin):
-    list_display = ("registration_number", "vehicle_type", "driver", "active", "created_at")
+    list_display = ("registration_number", "vehicle_type", "driver", "capacity_kg", "max_stops", "active", "created_at")
     search_fields = ("registration_number", "driver__full_name")
     list_filter = ("vehicle_type", "active")
 
@@ -30,3 +33,48 @@ class DispatchStatusUpdateAdmin(admin.ModelAdmin):
     list_display = ("dispatch", "status", "created_by", "created_at")
     list_filter = ("status", "created_at")
     search_fields = ("dispatch__reference_code",)
+
+
+@admin.register(DeliveryRun)
+class DeliveryRunAdmin(admin.ModelAdmin):
+    list_display = ("zone", "window_start", "vehicle", "agent", "stops_count", "total_load_kg", "status")
+    list_filter = ("status", "window_start")
+    search_fields = ("zone", "vehicle__registration_number", "agent__full_name")
+
+
+@admin.register(ZoneTariff)
+class ZoneTariffAdmin(admin.ModelAdmin):
+    list_display = ("origin_zone", "destination_zone", "base_fare", "updated_at")
+    search_fields = ("origin_zone", "destination_zone")
+
+
+@admin.register(VehicleTariff)
+class VehicleTariffAdmin(admin.ModelAdmin):
+    list_display = ("vehicle_type", "multiplier", "minimum_fare", "updated_at")
+
+
+@admin.register(SurgeWindow)
+class SurgeWindowAdmin(admin.ModelAdmin):
+    list_display = ("name", "zone", "weekdays", "start_time", "end_time", "multiplier", "active")
+    list_filter = ("active",)
+    search_fields = ("name", "zone")
+
+
+@admin.register(AgentLocationPing)
+class AgentLocationPingAdmin(admin.ModelAdmin):
+    list_display = ("agent", "latitude", "longitude", "accuracy_m", "recorded_at", "received_at")
+    list_select_related = ("agent",)
+    raw_id_fields = ("agent",)
+
+
+@admin.register(DeliveryDurationStat)
+class DeliveryDurationStatAdmin(admin.ModelAdmin):
+    list_display = ("zone", "vehicle_type", "hour_band", "sample_count", "pickup_count", "updated_at")
+    list_filter = ("vehicle_type", "hour_band")
+    search_fields = ("zone",)
+
+
+@admin.register(DeliveryEtaRefresh)
+class DeliveryEtaRefreshAdmin(admin.ModelAdmin):
+    list_display = ("processed_until", "dispatches_counted", "full_rebuild", "created_at")
+    list_filter = ("full_rebuild",)
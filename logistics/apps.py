@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LogisticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'logistics'
+
+    def ready(self):
+        # import signals to invalidate the cached tariff table
+        import logistics.signals  # noqa: F401
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from logistics.services import build_pending_dispatches
+
+
+class Command(BaseCommand):
+    help = "Create dispatches for PROCESSING orders and APPROVED supply records that have none."
+
+    def handle(self, *args, **options):
+        result = build_pending_dispatches()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['orders']} order dispatches and {result['supplies']} supply dispatches."
+        ))
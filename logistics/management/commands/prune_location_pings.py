@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from logistics.services import prune_location_pings
+
+
+class Command(BaseCommand):
+    help = "Delete agent location pings older than --days (default 30)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Keep pings received within this many days")
+
+    def handle(self, *args, **options):
+        deleted = prune_location_pings(older_than_days=options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} location pings."))
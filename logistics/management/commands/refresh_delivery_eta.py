@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from logistics.services import refresh_delivery_eta_model
+
+
+class Command(BaseCommand):
+    help = "Add deliveries recorded since the last run to the ETA duration stats (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild the stats from the whole status history")
+
+    def handle(self, *args, **options):
+        result = refresh_delivery_eta_model(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Counted {result['dispatches']} deliveries across {result['keys']} zone/vehicle/time keys "
+            f"(through {result['processed_until']:%Y-%m-%d %H:%M})."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from logistics.services import scan_dispatch_sla
+
+
+class Command(BaseCommand):
+    help = "Find overdue and at-risk open dispatches and alert staff about newly overdue ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--at-risk-minutes", type=int, default=None, help="Due within this many minutes counts as at risk")
+
+    def handle(self, *args, **options):
+        result = scan_dispatch_sla(at_risk_minutes=options["at_risk_minutes"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['overdue']} overdue ({result['newly_overdue']} new), {result['at_risk']} at risk."
+        ))
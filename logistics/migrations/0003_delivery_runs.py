@@ -0,0 +1,91 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:07
+
+import django.db.models.deletion
+import re
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of logistics.services.parse_capacity_kg as of this migration
+CAPACITY_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|kilo|kilograms?|t|tons?|tonnes?)\b", re.IGNORECASE)
+
+
+def parse_capacity_kg(text):
+    match = CAPACITY_RE.search(text or "")
+    if not match:
+        return None
+    value = Decimal(match.group(1))
+    return value * 1000 if match.group(2).lower().startswith("t") else value
+
+
+def backfill_capacity_kg(apps, schema_editor):
+    Vehicle = apps.get_model("logistics", "Vehicle")
+    vehicles = []
+    for vehicle in Vehicle.objects.exclude(capacity_description="").only("capacity_description"):
+        vehicle.capacity_kg = parse_capacity_kg(vehicle.capacity_description)
+        if vehicle.capacity_kg is not None:
+            vehicles.append(vehicle)
+    Vehicle.objects.bulk_update(vehicles, ["capacity_kg"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispatch',
+            name='load_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Payload weight; the run planner assumes a default when empty', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='dispatch',
+            name='run_sequence',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='capacity_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Payload limit used by the run planner; falls back to a per-type default when empty', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='max_stops',
+            field=models.PositiveSmallIntegerField(default=20, help_text='Maximum drops per delivery run'),
+        ),
+        migrations.CreateModel(
+            name='DeliveryRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('zone', models.CharField(blank=True, max_length=255)),
+                ('window_start', models.DateTimeField(blank=True, null=True)),
+                ('window_end', models.DateTimeField(blank=True, null=True)),
+                ('total_load_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('stops_count', models.PositiveSmallIntegerField(default=0)),
+                ('status', models.CharField(choices=[('PLANNED', 'Planned'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='PLANNED', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='runs', to='logistics.logisticsagent')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='runs', to='logistics.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Delivery Run',
+                'verbose_name_plural': 'Delivery Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dispatch',
+            name='delivery_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dispatches', to='logistics.deliveryrun'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrun',
+            index=models.Index(fields=['window_start', 'zone'], name='logistics_d_window__9d00da_idx'),
+        ),
+        migrations.RunPython(backfill_capacity_kg, migrations.RunPython.noop),
+    ]
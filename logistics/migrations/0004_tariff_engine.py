@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+
+def normalise_keke(apps, schema_editor):
+    Vehicle = apps.get_model('logistics', 'Vehicle')
+    Vehicle.objects.filter(vehicle_type__iexact='keke').update(vehicle_type='KEKE')
+
+
+def restore_keke(apps, schema_editor):
+    Vehicle = apps.get_model('logistics', 'Vehicle')
+    Vehicle.objects.filter(vehicle_type='KEKE').update(vehicle_type='Keke')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0003_delivery_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurgeWindow',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=120)),
+                ('zone', models.CharField(blank=True, max_length=255)),
+                ('weekdays', models.JSONField(blank=True, default=list)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('multiplier', models.DecimalField(decimal_places=3, default=1, max_digits=6)),
+                ('active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Surge Window',
+                'verbose_name_plural': 'Surge Windows',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleTariff',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vehicle_type', models.CharField(choices=[('MOTORCYCLE', 'Motorcycle'), ('VAN', 'Van'), ('TRUCK', 'Truck'), ('KEKE', 'Keke'), ('OTHER', 'Other')], max_length=20, unique=True)),
+                ('multiplier', models.DecimalField(decimal_places=3, default=1, max_digits=6)),
+                ('minimum_fare', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Vehicle Tariff',
+                'verbose_name_plural': 'Vehicle Tariffs',
+                'ordering': ['vehicle_type'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='vehicle_type',
+            field=models.CharField(choices=[('MOTORCYCLE', 'Motorcycle'), ('VAN', 'Van'), ('TRUCK', 'Truck'), ('KEKE', 'Keke'), ('OTHER', 'Other')], default='MOTORCYCLE', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ZoneTariff',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('origin_zone', models.CharField(max_length=255)),
+                ('destination_zone', models.CharField(max_length=255)),
+                ('base_fare', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Zone Tariff',
+                'verbose_name_plural': 'Zone Tariffs',
+                'ordering': ['origin_zone', 'destination_zone'],
+                'constraints': [models.UniqueConstraint(fields=('origin_zone', 'destination_zone'), name='uniq_zone_tariff_pair')],
+            },
+        ),
+        migrations.RunPython(normalise_keke, restore_keke),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0004_tariff_engine'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dispatchstatusupdate',
+            index=models.Index(fields=['dispatch', '-created_at'], name='logistics_dsu_timeline'),
+        ),
+    ]
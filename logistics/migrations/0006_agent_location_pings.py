@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_time_brin_index(apps, schema_editor):
+    # Pings arrive in time order, so a BRIN index keeps time-range scans and
+    # pruning cheap at a fraction of a btree's size. Postgres only.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS logistics_ping_received_brin "
+        "ON logistics_agentlocationping USING brin (received_at)"
+    )
+
+
+def drop_time_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS logistics_ping_received_brin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0005_dispatch_timeline_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentLocationPing',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('accuracy_m', models.FloatField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField(help_text='Device time of the fix')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('agent', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='location_pings', to='logistics.logisticsagent')),
+            ],
+            options={
+                'verbose_name': 'Agent Location Ping',
+                'verbose_name_plural': 'Agent Location Pings',
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['agent', '-recorded_at'], name='logistics_ping_agent_time')],
+            },
+        ),
+        migrations.RunPython(create_time_brin_index, drop_time_brin_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:27
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_occurred_at(apps, schema_editor):
+    DispatchStatusUpdate = apps.get_model('logistics', 'DispatchStatusUpdate')
+    DispatchStatusUpdate.objects.update(occurred_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0006_agent_location_pings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='dispatchstatusupdate',
+            options={'ordering': ['-occurred_at'], 'verbose_name': 'Dispatch Status Update', 'verbose_name_plural': 'Dispatch Status Updates'},
+        ),
+        migrations.RemoveIndex(
+            model_name='dispatchstatusupdate',
+            name='logistics_dsu_timeline',
+        ),
+        migrations.AddField(
+            model_name='dispatchstatusupdate',
+            name='client_event_id',
+            field=models.CharField(blank=True, help_text='Device-generated id used to deduplicate synced events', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='dispatchstatusupdate',
+            name='occurred_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the change happened (device time for offline-synced events)'),
+        ),
+        migrations.RunPython(backfill_occurred_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='dispatchstatusupdate',
+            index=models.Index(fields=['dispatch', '-occurred_at'], name='logistics_dsu_occurred'),
+        ),
+        migrations.AddConstraint(
+            model_name='dispatchstatusupdate',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_event_id__isnull', False)), fields=('dispatch', 'client_event_id'), name='uniq_dispatch_client_event'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0007_offline_status_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispatchReferenceSequence',
+            fields=[
+                ('prefix', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Dispatch Reference Sequence',
+                'verbose_name_plural': 'Dispatch Reference Sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0004_document_review_queue'),
+        ('logistics', '0008_dispatch_reference_sequence'),
+        ('orders', '0002_order_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispatch',
+            name='sla_alerted_at',
+            field=models.DateTimeField(blank=True, help_text='When staff were alerted that this dispatch is overdue', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dispatch',
+            index=models.Index(condition=models.Q(('status__in', ('PENDING', 'ASSIGNED', 'PICKED_UP', 'IN_TRANSIT'))), fields=['estimated_delivery_time'], name='logistics_dispatch_open_eta'),
+        ),
+        migrations.AddIndex(
+            model_name='dispatch',
+            index=models.Index(condition=models.Q(('status__in', ('PENDING', 'ASSIGNED', 'PICKED_UP', 'IN_TRANSIT'))), fields=['status', 'created_at'], name='logistics_dispatch_open_status'),
+        ),
+    ]
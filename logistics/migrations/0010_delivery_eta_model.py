@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0009_dispatch_sla_monitor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryEtaRefresh',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('processed_until', models.DateTimeField()),
+                ('dispatches_counted', models.PositiveIntegerField(default=0)),
+                ('full_rebuild', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Delivery ETA Refresh',
+                'verbose_name_plural': 'Delivery ETA Refreshes',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeliveryDurationStat',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('zone', models.CharField(blank=True, max_length=255)),
+                ('vehicle_type', models.CharField(blank=True, max_length=20)),
+                ('hour_band', models.PositiveSmallIntegerField(help_text='Local hour of assignment // LOGISTICS_ETA_HOUR_BAND_HOURS')),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('delivery_seconds_total', models.FloatField(default=0, help_text='Sum of assigned -> delivered durations')),
+                ('pickup_count', models.PositiveIntegerField(default=0)),
+                ('pickup_seconds_total', models.FloatField(default=0, help_text='Sum of assigned -> picked up durations')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Delivery Duration Stat',
+                'verbose_name_plural': 'Delivery Duration Stats',
+                'ordering': ['zone', 'vehicle_type', 'hour_band'],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'vehicle_type', 'hour_band'), name='uniq_delivery_duration_key')],
+            },
+        ),
+    ]
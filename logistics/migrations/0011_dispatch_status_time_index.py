@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0010_delivery_eta_model'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dispatchstatusupdate',
+            index=models.Index(fields=['status', 'occurred_at'], name='logistics_dsu_status_time'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0011_dispatch_status_time_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dispatchstatusupdate',
+            index=models.Index(fields=['status', 'created_at'], name='logistics_dsu_status_logged'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:29
+
+from django.db import migrations
+
+SLA_BREACH_EVENT = 'dispatch_sla_breach'
+
+SLA_BREACH_TEXT = (
+    '{{ newly_overdue_count }} dispatch(es) became overdue '
+    '({{ overdue_count }} overdue, {{ at_risk_count }} at risk).\n'
+    '{% for d in dispatches %}- {{ d.reference_code }} ({{ d.status }}): {{ d.minutes_late }} min late\n{% endfor %}'
+)
+
+SLA_BREACH_HTML = (
+    '<p>{{ newly_overdue_count }} dispatch(es) became overdue '
+    '({{ overdue_count }} overdue, {{ at_risk_count }} at risk).</p>'
+    '<ul>{% for d in dispatches %}<li>{{ d.reference_code }} ({{ d.status }}): '
+    '{{ d.minutes_late }} min late</li>{% endfor %}</ul>'
+)
+
+SLA_BREACH_TEMPLATES = {
+    'in_app': {'subject': 'Dispatches overdue', 'body_text': SLA_BREACH_TEXT, 'body_html': ''},
+    'email': {
+        'subject': '[SLA] {{ newly_overdue_count }} dispatch(es) overdue',
+        'body_text': SLA_BREACH_TEXT,
+        'body_html': SLA_BREACH_HTML,
+    },
+}
+
+
+def seed_sla_breach_templates(apps, schema_editor):
+    NotificationTemplate = apps.get_model('notifications', 'NotificationTemplate')
+    for channel, fields in SLA_BREACH_TEMPLATES.items():
+        NotificationTemplate.objects.get_or_create(event=SLA_BREACH_EVENT, channel=channel, defaults=fields)
+
+
+def remove_sla_breach_templates(apps, schema_editor):
+    NotificationTemplate = apps.get_model('notifications', 'NotificationTemplate')
+    NotificationTemplate.objects.filter(event=SLA_BREACH_EVENT, channel__in=list(SLA_BREACH_TEMPLATES)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0012_dispatch_status_logged_index'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='dispatch',
+            name='logistics_dispatch_open_status',
+        ),
+        migrations.RunPython(seed_sla_breach_templates, remove_sla_breach_templates),
+    ]
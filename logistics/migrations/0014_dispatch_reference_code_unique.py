@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def suffix_duplicate_reference_codes(apps, schema_editor):
+    # legacy random codes could repeat; keep the oldest and suffix the rest so the constraint applies
+    Dispatch = apps.get_model('logistics', 'Dispatch')
+    duplicated = (
+        Dispatch.objects.exclude(reference_code='')
+        .values('reference_code').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('reference_code', flat=True)
+    )
+    for code in list(duplicated):
+        extra = Dispatch.objects.filter(reference_code=code).order_by('created_at', 'id')[1:]
+        for index, dispatch in enumerate(extra, start=2):
+            Dispatch.objects.filter(pk=dispatch.pk).update(reference_code=f'{code}-{index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0004_document_review_queue'),
+        ('logistics', '0013_dispatch_sla_alert_template'),
+        ('orders', '0002_order_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(suffix_duplicate_reference_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dispatch',
+            constraint=models.UniqueConstraint(condition=models.Q(('reference_code', ''), _negated=True), fields=('reference_code',), name='logistics_dispatch_reference_code_unique'),
+        ),
+    ]
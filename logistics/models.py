@@ -8,7 +8,7 @@ VEHICLE_TYPE_CHOICES = [
     ("MOTORCYCLE", "Motorcycle"),
     ("VAN", "Van"),
     ("TRUCK", "Truck"),
-    ("Keke", "Keke"),
+    ("KEKE", "Keke"),
     ("OTHER", "Other"),
 ]
 
@@ -22,6 +22,9 @@ DISPATCH_STATUS_CHOICES = [
     ("RETURNED", "Returned"),
 ]
 
+# Dispatches still on their way; the SLA monitor's partial index covers only these
+OPEN_DISPATCH_STATUSES = ("PENDING", "ASSIGNED", "PICKED_UP", "IN_TRANSIT")
+
 
 class LogisticsAgent(models.Model):
     """
@@ -55,6 +58,11 @@ class Vehicle(models.Model):
     registration_number = models.CharField(max_length=100, unique=True)
     driver = models.ForeignKey(LogisticsAgent, on_delete=models.SET_NULL, null=True, blank=True, related_name="vehicles")
     capacity_description = models.CharField(max_length=255, blank=True, help_text="e.g. 100kg or 2 crates")
+    capacity_kg = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True,
+        help_text="Payload limit used by the run planner; falls back to a per-type default when empty",
+    )
+    max_stops = models.PositiveSmallIntegerField(default=20, help_text="Maximum drops per delivery run")
     active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -67,6 +75,58 @@ class Vehicle(models.Model):
         return f"{self.registration_number} ({self.vehicle_type})"
 
 
+class DeliveryRun(models.Model):
+    """
+    A consolidated trip: one vehicle and driver serving several dispatches in
+    the same dropoff zone and delivery window. Created by services.plan_delivery_runs.
+    """
+    RUN_STATUS_CHOICES = [
+        ("PLANNED", "Planned"),
+        ("IN_PROGRESS", "In Progress"),
+        ("COMPLETED", "Completed"),
+        ("CANCELLED", "Cancelled"),
+    ]
+
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.SET_NULL, null=True, blank=True, related_name="runs")
+    agent = models.ForeignKey(LogisticsAgent, on_delete=models.SET_NULL, null=True, blank=True, related_name="runs")
+    zone = models.CharField(max_length=255, blank=True)
+    window_start = models.DateTimeField(null=True, blank=True)
+    window_end = models.DateTimeField(null=True, blank=True)
+    total_load_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    stops_count = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=RUN_STATUS_CHOICES, default="PLANNED")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Delivery Run"
+        verbose_name_plural = "Delivery Runs"
+        indexes = [
+            models.Index(fields=["window_start", "zone"]),
+        ]
+
+    def __str__(self):
+        return f"Run {self.zone or '-'} {self.window_start or ''} ({self.stops_count} stops)"
+
+
+class DispatchReferenceSequence(models.Model):
+    """
+    Per-prefix counter behind dispatch reference codes (ORD-00000123). Blocks
+    of numbers are reserved under a row lock, so codes never collide.
+    """
+    prefix = models.CharField(max_length=10, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Dispatch Reference Sequence"
+        verbose_name_plural = "Dispatch Reference Sequences"
+
+    def __str__(self):
+        return f"{self.prefix}: {self.last_value}"
+
+
 class Dispatch(models.Model):
     """
     A dispatch record created for either an order or a supply record.
@@ -93,11 +153,34 @@ class Dispatch(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Optional delivery cost")
+    load_kg = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True,
+        help_text="Payload weight; the run planner assumes a default when empty",
+    )
+    delivery_run = models.ForeignKey(DeliveryRun, on_delete=models.SET_NULL, null=True, blank=True, related_name="dispatches")
+    run_sequence = models.PositiveSmallIntegerField(null=True, blank=True)
+    sla_alerted_at = models.DateTimeField(null=True, blank=True, help_text="When staff were alerted that this dispatch is overdue")
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Dispatch"
         verbose_name_plural = "Dispatches"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["reference_code"],
+                condition=~models.Q(reference_code=""),
+                name="logistics_dispatch_reference_code_unique",
+            ),
+        ]
+        indexes = [
+            # Only open dispatches are indexed, so SLA scans stay small however
+            # much delivered history accumulates.
+            models.Index(
+                fields=["estimated_delivery_time"],
+                condition=models.Q(status__in=OPEN_DISPATCH_STATUSES),
+                name="logistics_dispatch_open_eta",
+            ),
+        ]
 
     def __str__(self):
         return f"Dispatch {self.reference_code or self.id} - {self.status}"
@@ -114,11 +197,178 @@ class DispatchStatusUpdate(models.Model):
     location = models.CharField(max_length=255, blank=True, help_text="Optional geo/location text")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    occurred_at = models.DateTimeField(default=timezone.now, help_text="When the change happened (device time for offline-synced events)")
+    client_event_id = models.CharField(max_length=64, null=True, blank=True, help_text="Device-generated id used to deduplicate synced events")
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-occurred_at"]
         verbose_name = "Dispatch Status Update"
         verbose_name_plural = "Dispatch Status Updates"
+        indexes = [
+            # latest-update prefetch and the cursor-paginated timeline
+            models.Index(fields=["dispatch", "-occurred_at"], name="logistics_dsu_occurred"),
+            # finished-in-range lookups for the logistics KPI reports
+            models.Index(fields=["status", "occurred_at"], name="logistics_dsu_status_time"),
+            # deliveries logged since the last incremental ETA refresh
+            models.Index(fields=["status", "created_at"], name="logistics_dsu_status_logged"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dispatch", "client_event_id"],
+                condition=models.Q(client_event_id__isnull=False),
+                name="uniq_dispatch_client_event",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.dispatch} -> {self.status} @ {self.created_at}"
+
+
+class AgentLocationPing(models.Model):
+    """
+    One GPS fix from an agent's device. Append-only and written in bulk from
+    an in-process buffer; the latest fix per agent is also kept in the cache
+    (see services.record_location_pings). Old rows are removed with
+    `prune_location_pings`.
+    """
+    id = models.BigAutoField(primary_key=True)
+    agent = models.ForeignKey(LogisticsAgent, on_delete=models.CASCADE, related_name="location_pings", db_index=False)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    accuracy_m = models.FloatField(null=True, blank=True)
+    recorded_at = models.DateTimeField(help_text="Device time of the fix")
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-recorded_at"]
+        verbose_name = "Agent Location Ping"
+        verbose_name_plural = "Agent Location Pings"
+        indexes = [
+            models.Index(fields=["agent", "-recorded_at"], name="logistics_ping_agent_time"),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_id} @ {self.latitude},{self.longitude} ({self.recorded_at})"
+
+
+class ZoneTariff(models.Model):
+    """
+    Base fare for a trip between two delivery zones (zone keys as produced by
+    services.dispatch_area, i.e. lowercased area names). A missing pair falls
+    back to the reverse direction.
+    """
+    id = models.BigAutoField(primary_key=True)
+    origin_zone = models.CharField(max_length=255)
+    destination_zone = models.CharField(max_length=255)
+    base_fare = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["origin_zone", "destination_zone"]
+        verbose_name = "Zone Tariff"
+        verbose_name_plural = "Zone Tariffs"
+        constraints = [
+            models.UniqueConstraint(fields=["origin_zone", "destination_zone"], name="uniq_zone_tariff_pair"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.origin_zone = self.origin_zone.strip().lower()
+        self.destination_zone = self.destination_zone.strip().lower()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.origin_zone} -> {self.destination_zone}: {self.base_fare}"
+
+
+class VehicleTariff(models.Model):
+    """Per-vehicle-type multiplier on the zone base fare, with an optional floor."""
+    id = models.BigAutoField(primary_key=True)
+    vehicle_type = models.CharField(max_length=20, choices=VEHICLE_TYPE_CHOICES, unique=True)
+    multiplier = models.DecimalField(max_digits=6, decimal_places=3, default=1)
+    minimum_fare = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["vehicle_type"]
+        verbose_name = "Vehicle Tariff"
+        verbose_name_plural = "Vehicle Tariffs"
+
+    def __str__(self):
+        return f"{self.vehicle_type} x{self.multiplier}"
+
+
+class SurgeWindow(models.Model):
+    """
+    Time-of-day surcharge. Applies when a trip starts in `zone` (blank = every
+    zone) on one of `weekdays` (0 = Monday; empty = every day) between
+    start_time and end_time (local time; windows may wrap past midnight).
+    Overlapping windows use the highest multiplier.
+    """
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=120)
+    zone = models.CharField(max_length=255, blank=True)
+    weekdays = models.JSONField(default=list, blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    multiplier = models.DecimalField(max_digits=6, decimal_places=3, default=1)
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name = "Surge Window"
+        verbose_name_plural = "Surge Windows"
+
+    def save(self, *args, **kwargs):
+        self.zone = self.zone.strip().lower()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} x{self.multiplier}"
+
+
+class DeliveryDurationStat(models.Model):
+    """
+    Running totals of historical delivery durations for one (dropoff zone,
+    vehicle type, time-of-day band), measured from a dispatch's first
+    ASSIGNED update to its first PICKED_UP and DELIVERED updates. Totals
+    rather than averages are stored so the nightly refresh can add new
+    deliveries without re-reading old ones (see services.refresh_delivery_eta_model).
+    """
+    id = models.BigAutoField(primary_key=True)
+    zone = models.CharField(max_length=255, blank=True)
+    vehicle_type = models.CharField(max_length=20, blank=True)
+    hour_band = models.PositiveSmallIntegerField(help_text="Local hour of assignment // LOGISTICS_ETA_HOUR_BAND_HOURS")
+    sample_count = models.PositiveIntegerField(default=0)
+    delivery_seconds_total = models.FloatField(default=0, help_text="Sum of assigned -> delivered durations")
+    pickup_count = models.PositiveIntegerField(default=0)
+    pickup_seconds_total = models.FloatField(default=0, help_text="Sum of assigned -> picked up durations")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["zone", "vehicle_type", "hour_band"]
+        verbose_name = "Delivery Duration Stat"
+        verbose_name_plural = "Delivery Duration Stats"
+        constraints = [
+            models.UniqueConstraint(fields=["zone", "vehicle_type", "hour_band"], name="uniq_delivery_duration_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.zone or '*'} / {self.vehicle_type or '*'} / band {self.hour_band} ({self.sample_count})"
+
+
+class DeliveryEtaRefresh(models.Model):
+    """One run of the ETA model refresh; the latest run's `processed_until` is where the next one starts."""
+    id = models.BigAutoField(primary_key=True)
+    processed_until = models.DateTimeField()
+    dispatches_counted = models.PositiveIntegerField(default=0)
+    full_rebuild = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+        verbose_name = "Delivery ETA Refresh"
+        verbose_name_plural = "Delivery ETA Refreshes"
+
+    def __str__(self):
+        return f"ETA refresh through {self.processed_until} ({self.dispatches_counted})"
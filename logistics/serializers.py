@@ -1,6 +1,6 @@
 # logistics/serializers.py
 from rest_framework import serializers
-from .models import LogisticsAgent, Vehicle, Dispatch, DispatchStatusUpdate
+from .models import LogisticsAgent, Vehicle, Dispatch, DispatchStatusUpdate, DeliveryRun, VEHICLE_TYPE_CHOICES
 
 
 class LogisticsAgentSerializer(serializers.ModelSerializer):
@@ -18,7 +18,10 @@ class VehicleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Vehicle
-        fields = ("id", "vehicle_type", "registration_number", "driver", "driver_id", "capacity_description", "active", "created_at")
+        fields = (
+            "id", "vehicle_type", "registration_number", "driver", "driver_id", "capacity_description",
+            "capacity_kg", "max_stops", "active", "created_at",
+        )
         read_only_fields = ("id", "created_at")
 
 
@@ -26,8 +29,8 @@ class DispatchStatusUpdateSerializer(serializers.ModelSerializer):
     created_by = serializers.PrimaryKeyRelatedField(read_only=True)
     class Meta:
         model = DispatchStatusUpdate
-        fields = ("id", "dispatch", "status", "note", "location", "created_by", "created_at")
-        read_only_fields = ("id", "created_by", "created_at")
+        fields = ("id", "dispatch", "status", "note", "location", "created_by", "created_at", "occurred_at", "client_event_id")
+        read_only_fields = ("id", "created_by", "created_at", "client_event_id")
 
 
 class DispatchSerializer(serializers.ModelSerializer):
@@ -35,7 +38,7 @@ class DispatchSerializer(serializers.ModelSerializer):
     assigned_agent_id = serializers.PrimaryKeyRelatedField(queryset=LogisticsAgent.objects.all(), source="assigned_agent", write_only=True, required=False)
     assigned_vehicle = VehicleSerializer(read_only=True)
     assigned_vehicle_id = serializers.PrimaryKeyRelatedField(queryset=Vehicle.objects.all(), source="assigned_vehicle", write_only=True, required=False)
-    status_updates = DispatchStatusUpdateSerializer(many=True, read_only=True)
+    latest_status_update = serializers.SerializerMethodField()
 
     class Meta:
         model = Dispatch
@@ -43,13 +46,107 @@ class DispatchSerializer(serializers.ModelSerializer):
             "id", "order", "supply_record", "reference_code", "pickup_address", "dropoff_address",
             "assigned_agent", "assigned_agent_id", "assigned_vehicle", "assigned_vehicle_id",
             "status", "estimated_pickup_time", "estimated_delivery_time", "pickup_time", "delivery_time",
-            "proof_of_delivery_url", "receiver_name", "notes", "created_by", "cost",
-            "created_at", "updated_at", "status_updates",
+            "proof_of_delivery_url", "receiver_name", "notes", "created_by", "cost", "load_kg",
+            "delivery_run", "run_sequence", "created_at", "updated_at", "latest_status_update",
         )
-        read_only_fields = ("id", "created_by", "created_at", "updated_at", "status_updates")
+        read_only_fields = ("id", "created_by", "created_at", "updated_at", "latest_status_update", "delivery_run", "run_sequence")
+
+    def get_latest_status_update(self, obj):
+        """
+        Only the newest timeline entry is embedded; the full history lives at
+        /dispatches/{id}/timeline/. Uses the `latest_status_updates` prefetch
+        from DispatchViewSet when present.
+        """
+        if hasattr(obj, "latest_status_updates"):
+            latest = obj.latest_status_updates[0] if obj.latest_status_updates else None
+        else:
+            latest = obj.status_updates.order_by("-occurred_at").first()
+        return DispatchStatusUpdateSerializer(latest).data if latest else None
 
     def create(self, validated_data):
         # set created_by automatically from context user (if provided)
         user = self.context.get("request").user if self.context.get("request") else None
         validated_data.setdefault("created_by", user)
         return super().create(validated_data)
+
+
+class DeliveryRunSerializer(serializers.ModelSerializer):
+    dispatch_ids = serializers.PrimaryKeyRelatedField(source="dispatches", many=True, read_only=True)
+
+    class Meta:
+        model = DeliveryRun
+        fields = (
+            "id", "vehicle", "agent", "zone", "window_start", "window_end", "total_load_kg",
+            "stops_count", "status", "created_by", "created_at", "dispatch_ids",
+        )
+        read_only_fields = fields
+
+
+STATUS_SYNC_MAX_EVENTS = 5000
+
+
+class StatusSyncEventSerializer(serializers.Serializer):
+    client_event_id = serializers.CharField(max_length=64)
+    dispatch_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Dispatch._meta.get_field("status").choices)
+    occurred_at = serializers.DateTimeField()
+    note = serializers.CharField(required=False, allow_blank=True, default="")
+    location = serializers.CharField(max_length=255, required=False, allow_blank=True, default="")
+
+
+class StatusSyncSerializer(serializers.Serializer):
+    events = serializers.ListField(child=StatusSyncEventSerializer(), min_length=1, max_length=STATUS_SYNC_MAX_EVENTS)
+
+
+class LocationFixSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    accuracy_m = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    recorded_at = serializers.DateTimeField()
+
+
+class LocationPingBatchSerializer(serializers.Serializer):
+    """A device's queued GPS fixes; staff may post on behalf of `agent_id`."""
+    agent_id = serializers.PrimaryKeyRelatedField(queryset=LogisticsAgent.objects.all(), required=False)
+    fixes = serializers.ListField(child=LocationFixSerializer(), min_length=1, max_length=500)
+
+
+class AgentPositionSerializer(serializers.Serializer):
+    agent_id = serializers.CharField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    accuracy_m = serializers.FloatField(allow_null=True)
+    recorded_at = serializers.DateTimeField()
+
+
+MAX_QUOTE_COMBINATIONS = 500
+
+
+class TariffQuoteRequestSerializer(serializers.Serializer):
+    """Cartesian batch: every origin x destination x vehicle type is quoted."""
+    origins = serializers.ListField(child=serializers.CharField(max_length=255), min_length=1)
+    destinations = serializers.ListField(child=serializers.CharField(max_length=255), min_length=1)
+    vehicle_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=VEHICLE_TYPE_CHOICES), required=False, min_length=1
+    )
+    at = serializers.DateTimeField(required=False)
+
+    def validate_vehicle_types(self, value):
+        return list(dict.fromkeys(value))
+
+    def validate(self, attrs):
+        attrs.setdefault("vehicle_types", [key for key, _ in VEHICLE_TYPE_CHOICES])
+        combinations = len(attrs["origins"]) * len(attrs["destinations"]) * len(attrs["vehicle_types"])
+        if combinations > MAX_QUOTE_COMBINATIONS:
+            raise serializers.ValidationError(f"At most {MAX_QUOTE_COMBINATIONS} combinations per request.")
+        return attrs
+
+
+class TariffQuoteSerializer(serializers.Serializer):
+    origin_zone = serializers.CharField()
+    destination_zone = serializers.CharField()
+    vehicle_type = serializers.CharField()
+    base_fare = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    vehicle_multiplier = serializers.DecimalField(max_digits=6, decimal_places=3)
+    surge_multiplier = serializers.DecimalField(max_digits=6, decimal_places=3)
+    fare = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
@@ -6,25 +6,162 @@ status updates, and delivery confirmation so that other apps
 can call them cleanly without import conflicts.
 """
 
+import atexit
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
 import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q, Sum
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
+from core.pubsub import publish_on_commit
+
 from .models import (
+    AgentLocationPing,
+    DeliveryDurationStat,
+    DeliveryEtaRefresh,
+    DeliveryRun,
     Dispatch,
+    DispatchReferenceSequence,
     DispatchStatusUpdate,
     LogisticsAgent,
-    Vehicle
+    OPEN_DISPATCH_STATUSES,
+    SurgeWindow,
+    Vehicle,
+    VehicleTariff,
+    VEHICLE_TYPE_CHOICES,
+    ZoneTariff,
 )
 
+# Dispatch states that count towards an agent's current workload
+ACTIVE_DISPATCH_STATUSES = ("ASSIGNED", "PICKED_UP", "IN_TRANSIT")
+MAX_ACTIVE_DISPATCHES_PER_AGENT = getattr(settings, "LOGISTICS_MAX_ACTIVE_DISPATCHES_PER_AGENT", 25)
+# Vehicle types suited to each kind of dispatch; others can still be used at a cost
+PREFERRED_VEHICLE_TYPES = {
+    "supply": {"VAN", "TRUCK"},
+    "order": {"MOTORCYCLE", "KEKE", "VAN"},
+}
+# Assignment cost = current load + these penalties (in "dispatches" of extra load)
+VEHICLE_MISMATCH_PENALTY = 3
+AREA_MISMATCH_PENALTY = 2
+
+# Run planning: payload defaults when Vehicle.capacity_kg / Dispatch.load_kg are empty
+DEFAULT_CAPACITY_KG = {
+    "MOTORCYCLE": Decimal("30"),
+    "KEKE": Decimal("150"),
+    "VAN": Decimal("800"),
+    "TRUCK": Decimal("5000"),
+    "OTHER": Decimal("100"),
+}
+DEFAULT_DISPATCH_LOAD_KG = Decimal(str(getattr(settings, "LOGISTICS_DEFAULT_DISPATCH_LOAD_KG", "5")))
+RUN_WINDOW_HOURS = getattr(settings, "LOGISTICS_RUN_WINDOW_HOURS", 4)
+# Only unassigned work is planned; dispatches a dispatcher already assigned keep their agent and vehicle
+RUN_PLANNABLE_STATUSES = ("PENDING",)
+RUN_COMMITTED_STATUSES = ("PLANNED", "IN_PROGRESS")
+CAPACITY_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|kilo|kilograms?|t|tons?|tonnes?)\b", re.IGNORECASE)
+
+# Dispatch addresses not stored on the source models
+ORDER_PICKUP_ADDRESS = getattr(settings, "LOGISTICS_ORDER_PICKUP_ADDRESS", "")
+SUPPLY_DROPOFF_ADDRESS = getattr(settings, "LOGISTICS_SUPPLY_DROPOFF_ADDRESS", "")
+
+# SLA monitor: open dispatches due within this window count as at risk
+SLA_AT_RISK_MINUTES = getattr(settings, "LOGISTICS_SLA_AT_RISK_MINUTES", 30)
+SLA_ALERT_CHANNELS = getattr(settings, "LOGISTICS_SLA_ALERT_CHANNELS", ["in_app", "email"])
+SLA_ALERT_MAX_LISTED = 20
+sla_logger = logging.getLogger("logistics.sla")
+
+# Tariffs: the in-process table is shared until the cached version changes
+TARIFF_CACHE_VERSION_KEY = "logistics:tariffs:version"
+TARIFF_VERSION_CHECK_SECONDS = getattr(settings, "LOGISTICS_TARIFF_VERSION_CHECK_SECONDS", 5)
+TWO_PLACES = Decimal("0.01")
+_tariff_table = None
+_tariff_checked_at = 0.0
+
+# Delivery ETAs: duration stats per (dropoff zone, vehicle type, time-of-day band)
+ETA_HOUR_BAND_HOURS = getattr(settings, "LOGISTICS_ETA_HOUR_BAND_HOURS", 3)
+ETA_MIN_SAMPLES = getattr(settings, "LOGISTICS_ETA_MIN_SAMPLES", 5)
+ETA_MAX_DURATION_HOURS = getattr(settings, "LOGISTICS_ETA_MAX_DURATION_HOURS", 72)
+# Status updates younger than this may still be in uncommitted transactions
+ETA_REFRESH_SETTLE = timedelta(minutes=5)
+ETA_CACHE_VERSION_KEY = "logistics:eta:version"
+ETA_VERSION_CHECK_SECONDS = getattr(settings, "LOGISTICS_ETA_VERSION_CHECK_SECONDS", 60)
+_eta_table = None
+_eta_checked_at = 0.0
+
+# Location pings: buffered per process, flushed by size or age
+LOCATION_PING_FLUSH_SIZE = getattr(settings, "LOGISTICS_LOCATION_PING_FLUSH_SIZE", 2000)
+LOCATION_PING_FLUSH_SECONDS = getattr(settings, "LOGISTICS_LOCATION_PING_FLUSH_SECONDS", 5)
+LOCATION_PING_MAX_BATCH = 500
+LOCATION_PING_BACKGROUND_FLUSH = getattr(settings, "LOGISTICS_LOCATION_PING_BACKGROUND_FLUSH", True)
+AGENT_POSITION_CACHE_PREFIX = "logistics:agent-position:"
+AGENT_POSITION_CACHE_TIMEOUT = getattr(settings, "LOGISTICS_AGENT_POSITION_CACHE_TIMEOUT", 60 * 60)
+ping_logger = logging.getLogger("logistics.pings")
+
+# Sequential reference codes are zero-padded to this width; legacy random codes have six hex characters
+REFERENCE_CODE_DIGITS = 8
+
+
+def reserve_reference_codes(prefix, count):
+    """
+    Reserve `count` consecutive reference codes for `prefix` (e.g. ORD-00000124)
+    from DispatchReferenceSequence. The counter row is locked for the
+    increment, so concurrent callers always get disjoint blocks. Inside an
+    outer transaction the lock is held until that transaction ends, so call
+    this as late as possible, right before the dispatches are written.
+
+    The eight-digit suffix never matches the six-character hex codes issued
+    before the counter existed; the partial unique constraint on
+    Dispatch.reference_code backs this up.
+    """
+    if count <= 0:
+        return []
+    with transaction.atomic():
+        sequence, _ = DispatchReferenceSequence.objects.select_for_update().get_or_create(prefix=prefix)
+        start = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=["last_value"])
+    return [f"{prefix}-{number:0{REFERENCE_CODE_DIGITS}d}" for number in range(start, start + count)]
+
 
 def generate_reference_code(prefix="DSP"):
     """
     Generates a clean, unique tracking code.
-    Example: DSP-3F9A7C
+    Example: DSP-00000042
     """
-    unique = uuid.uuid4().hex[:6].upper()
-    return f"{prefix}-{unique}"
+    return reserve_reference_codes(prefix, 1)[0]
+
+
+def order_dispatch_addresses(order):
+    """(pickup, dropoff) for an order: the store's dispatch point to the order's address."""
+    return ORDER_PICKUP_ADDRESS, order.address or ""
+
+
+def supply_dispatch_addresses(supply_record):
+    """(pickup, dropoff) for a supply record: the farmer's address to the receiving warehouse."""
+    farmer = supply_record.farmer
+    pickup = ", ".join(part for part in (farmer.address.strip(), farmer.lga.strip()) if part)
+    return pickup, SUPPLY_DROPOFF_ADDRESS
+
+
+def supply_load_kg(supply_record):
+    if supply_record.unit == "kg":
+        return supply_record.quantity
+    if supply_record.unit == "ton":
+        return supply_record.quantity * 1000
+    return None
 
 
 def create_dispatch_from_order(order, created_by=None):
@@ -34,10 +171,11 @@ def create_dispatch_from_order(order, created_by=None):
     Returns:
         Dispatch instance
     """
+    pickup, dropoff = order_dispatch_addresses(order)
     return Dispatch.objects.create(
         order=order,
-        pickup_address=order.pickup_address if hasattr(order, "pickup_address") else "",
-        dropoff_address=order.delivery_address if hasattr(order, "delivery_address") else "",
+        pickup_address=pickup,
+        dropoff_address=dropoff,
         reference_code=generate_reference_code("ORD"),
         created_by=created_by,
     )
@@ -47,15 +185,93 @@ def create_dispatch_from_supply(supply_record, created_by=None):
     """
     Auto-create a dispatch for a supply record coming from farmers.
     """
+    pickup, dropoff = supply_dispatch_addresses(supply_record)
     return Dispatch.objects.create(
         supply_record=supply_record,
-        pickup_address=supply_record.pickup_location if hasattr(supply_record, "pickup_location") else "",
-        dropoff_address=supply_record.dropoff_location if hasattr(supply_record, "dropoff_location") else "",
+        load_kg=supply_load_kg(supply_record),
+        pickup_address=pickup,
+        dropoff_address=dropoff,
         reference_code=generate_reference_code("SUP"),
         created_by=created_by,
     )
 
 
+def build_pending_dispatches(created_by=None):
+    """
+    Create dispatches for every PROCESSING order and APPROVED supply record
+    that has none yet, with bulk_create and one block of reference codes per
+    prefix. The query count does not depend on how many are created.
+
+    Returns {"orders": <created>, "supplies": <created>}.
+    """
+    # Imported here: logistics models reference these apps lazily as well
+    from farmers.models import SupplyRecord
+    from orders.models import Order
+
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(status="PROCESSING")
+            .exclude(Exists(Dispatch.objects.filter(order=OuterRef("pk"))))
+            .only("id", "address")
+            .order_by("created_at")
+        )
+        supplies = list(
+            SupplyRecord.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status="APPROVED")
+            .exclude(Exists(Dispatch.objects.filter(supply_record=OuterRef("pk"))))
+            .select_related("farmer")
+            .only("id", "quantity", "unit", "farmer__address", "farmer__lga")
+            .order_by("supply_date")
+        )
+
+        order_dispatches = []
+        for order in orders:
+            pickup, dropoff = order_dispatch_addresses(order)
+            order_dispatches.append(Dispatch(
+                order=order, pickup_address=pickup, dropoff_address=dropoff, created_by=created_by,
+            ))
+        supply_dispatches = []
+        for record in supplies:
+            pickup, dropoff = supply_dispatch_addresses(record)
+            supply_dispatches.append(Dispatch(
+                supply_record=record, load_kg=supply_load_kg(record), pickup_address=pickup,
+                dropoff_address=dropoff, created_by=created_by,
+            ))
+
+        # codes last: the counter rows stay locked until this transaction commits
+        for dispatch, code in zip(order_dispatches, reserve_reference_codes("ORD", len(order_dispatches))):
+            dispatch.reference_code = code
+        for dispatch, code in zip(supply_dispatches, reserve_reference_codes("SUP", len(supply_dispatches))):
+            dispatch.reference_code = code
+        Dispatch.objects.bulk_create(order_dispatches + supply_dispatches, batch_size=1000)
+
+    return {"orders": len(orders), "supplies": len(supplies)}
+
+
+def dispatch_channel(dispatch_id):
+    return f"dispatch:{dispatch_id}"
+
+
+def publish_dispatch_status(dispatch, note="", location=""):
+    """
+    Push a dispatch status change to status-stream watchers of the dispatch
+    and, when it delivers an order, of that order. Sent after commit.
+    """
+    event = {
+        "event": "dispatch.status",
+        "dispatch_id": str(dispatch.id),
+        "reference_code": dispatch.reference_code,
+        "status": dispatch.status,
+        "note": note,
+        "location": location,
+        "at": timezone.now().isoformat(),
+    }
+    publish_on_commit(dispatch_channel(dispatch.id), event)
+    if dispatch.order_id:
+        publish_on_commit(f"order:{dispatch.order_id}", event)
+
+
 def assign_agent(dispatch_id, agent_id, vehicle_id=None, assigned_by=None):
     """
     Assign a logistics agent (and optionally a vehicle) to a dispatch.
@@ -70,6 +286,7 @@ def assign_agent(dispatch_id, agent_id, vehicle_id=None, assigned_by=None):
         dispatch.assigned_vehicle = vehicle
 
     dispatch.status = "ASSIGNED"
+    fill_dispatch_eta(dispatch)
     dispatch.save()
 
     DispatchStatusUpdate.objects.create(
@@ -78,6 +295,7 @@ def assign_agent(dispatch_id, agent_id, vehicle_id=None, assigned_by=None):
         note="Agent assigned via service",
         created_by=assigned_by,
     )
+    publish_dispatch_status(dispatch, note="Agent assigned")
     return dispatch
 
 
@@ -105,6 +323,7 @@ def update_dispatch_status(dispatch_id, new_status, note="", location="", update
         location=location,
         created_by=updated_by
     )
+    publish_dispatch_status(dispatch, note=note, location=location)
 
     return status_log
 
@@ -127,27 +346,1127 @@ def confirm_delivery(dispatch_id, receiver_name, proof_url="", updated_by=None):
         note="Delivery confirmed",
         created_by=updated_by,
     )
+    publish_dispatch_status(dispatch, note="Delivery confirmed")
 
     return dispatch
 
 
+def sync_status_events(events, user):
+    """
+    Apply a device's queue of offline status events
+    ({client_event_id, dispatch_id, status, occurred_at, note?, location?}).
+
+    Events already stored (same dispatch and client_event_id) or repeated in
+    the batch are skipped, so re-sending a queue is harmless. New events are
+    written to the timeline in one bulk insert, in occurred_at order. A
+    dispatch's status only moves to an event's status if that event is newer
+    than everything already on its timeline; older events are kept as
+    history only ("stale"). Non-staff users may only sync dispatches assigned
+    to their agent profile; other events are rejected.
+
+    Returns {"applied", "stale", "duplicates", "rejected", "dispatches"},
+    where "dispatches" is the resulting server state of every dispatch named
+    in the batch.
+    """
+    agent = getattr(user, "logistics_agent_profile", None)
+    rejected = []
+    unique, seen = [], set()
+    for event in events:
+        key = (event["dispatch_id"], event["client_event_id"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(event)
+    duplicates = len(events) - len(unique)
+
+    dispatch_ids = {event["dispatch_id"] for event in unique}
+    applied = stale = 0
+    queryset = Dispatch.objects.select_for_update().filter(pk__in=dispatch_ids)
+    if not user.is_staff:
+        queryset = queryset.filter(assigned_agent=agent) if agent is not None else queryset.none()
+    with transaction.atomic():
+        dispatches = {dispatch.id: dispatch for dispatch in queryset}
+        last_event_at = dict(
+            DispatchStatusUpdate.objects.filter(dispatch_id__in=dispatches)
+            .values("dispatch_id")
+            .annotate(latest=Max("occurred_at"))
+            .values_list("dispatch_id", "latest")
+        )
+        stored = set(
+            DispatchStatusUpdate.objects.filter(
+                dispatch_id__in=dispatches, client_event_id__in={event["client_event_id"] for event in unique}
+            ).values_list("dispatch_id", "client_event_id")
+        )
+
+        timeline, changed = [], {}
+        for event in sorted(unique, key=lambda event: event["occurred_at"]):
+            dispatch = dispatches.get(event["dispatch_id"])
+            if dispatch is None:
+                rejected.append({"client_event_id": event["client_event_id"], "error": "Dispatch not found or not assigned to you."})
+                continue
+            if (dispatch.id, event["client_event_id"]) in stored:
+                duplicates += 1
+                continue
+
+            occurred_at = event["occurred_at"]
+            timeline.append(DispatchStatusUpdate(
+                dispatch=dispatch,
+                status=event["status"],
+                note=event.get("note", ""),
+                location=event.get("location", ""),
+                occurred_at=occurred_at,
+                client_event_id=event["client_event_id"],
+                created_by=user,
+            ))
+            latest = last_event_at.get(dispatch.id)
+            if latest is not None and occurred_at < latest:
+                stale += 1
+                continue
+            last_event_at[dispatch.id] = occurred_at
+            dispatch.status = event["status"]
+            if event["status"] == "PICKED_UP":
+                dispatch.pickup_time = occurred_at
+            if event["status"] == "DELIVERED":
+                dispatch.delivery_time = occurred_at
+            changed[dispatch.id] = dispatch
+            applied += 1
+
+        DispatchStatusUpdate.objects.bulk_create(timeline, batch_size=1000)
+        if changed:
+            now = timezone.now()
+            for dispatch in changed.values():
+                dispatch.updated_at = now
+            Dispatch.objects.bulk_update(
+                list(changed.values()), ["status", "pickup_time", "delivery_time", "updated_at"], batch_size=500
+            )
+        for dispatch in changed.values():
+            publish_dispatch_status(dispatch, note="Synced from device")
+
+    return {
+        "applied": applied,
+        "stale": stale,
+        "duplicates": duplicates,
+        "rejected": rejected,
+        "dispatches": [
+            {
+                "id": str(dispatch.id),
+                "status": dispatch.status,
+                "pickup_time": dispatch.pickup_time,
+                "delivery_time": dispatch.delivery_time,
+                "last_event_at": last_event_at.get(dispatch.id),
+            }
+            for dispatch in dispatches.values()
+        ],
+    }
+
+
 def calculate_logistics_cost(distance_km: float, vehicle_type: str = "MOTORCYCLE"):
     """
-    Simple reusable cost calculator.
-    You can improve this anytime, but this is a clean baseline.
+    Simple per-km cost estimate, used where no zone tariff applies.
+    Zone-priced quotes come from quote_many().
 
     Rate examples:
         MOTORCYCLE – ₦120/km
         VAN – ₦200/km
         TRUCK – ₦350/km
         KEKE – ₦80/km
+        OTHER – ₦120/km
+
+    Raises ValueError for an unknown vehicle type (case-insensitive match).
     """
     BASE_RATES = {
         "MOTORCYCLE": 120,
         "VAN": 200,
         "TRUCK": 350,
-        "Keke": 80,
+        "KEKE": 80,
+        "OTHER": 120,
     }
 
-    rate = BASE_RATES.get(vehicle_type, 120)
-    return round(rate * distance_km, 2)
+    key = (vehicle_type or "").strip().upper()
+    if key not in BASE_RATES:
+        raise ValueError(f"Unknown vehicle type: {vehicle_type!r}")
+    return round(BASE_RATES[key] * distance_km, 2)
+
+
+def get_tariff_cache_version():
+    version = cache.get(TARIFF_CACHE_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(TARIFF_CACHE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_tariff_cache():
+    """Bump the shared tariff version so every process reloads its table."""
+    global _tariff_table
+    cache.set(TARIFF_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _tariff_table = None
+
+
+class TariffTable:
+    """
+    Immutable in-memory snapshot of ZoneTariff, VehicleTariff and SurgeWindow.
+    The zone matrix is filled in both directions up front, so a quote is a
+    handful of dict lookups and multiplications.
+    """
+
+    def __init__(self, version, fares, vehicles, surges):
+        self.version = version
+        self.fares = fares
+        self.vehicles = vehicles
+        self.surges = surges
+
+    @classmethod
+    def load(cls, version):
+        fares = {}
+        for origin, destination, base_fare in ZoneTariff.objects.values_list(
+            "origin_zone", "destination_zone", "base_fare"
+        ):
+            fares[(origin, destination)] = base_fare
+        for (origin, destination), base_fare in list(fares.items()):
+            fares.setdefault((destination, origin), base_fare)
+
+        vehicles = {key: (Decimal("1"), Decimal("0")) for key, _ in VEHICLE_TYPE_CHOICES}
+        for vehicle_type, multiplier, minimum_fare in VehicleTariff.objects.values_list(
+            "vehicle_type", "multiplier", "minimum_fare"
+        ):
+            vehicles[vehicle_type] = (multiplier, minimum_fare)
+
+        surges = [
+            (zone, frozenset(weekdays or ()), start_time, end_time, multiplier)
+            for zone, weekdays, start_time, end_time, multiplier in SurgeWindow.objects.filter(
+                active=True
+            ).values_list("zone", "weekdays", "start_time", "end_time", "multiplier")
+        ]
+        return cls(version, fares, vehicles, surges)
+
+    def surge_multiplier(self, zone, weekday, time_of_day):
+        best = Decimal("1")
+        for surge_zone, weekdays, start, end, multiplier in self.surges:
+            if surge_zone and surge_zone != zone:
+                continue
+            if weekdays and weekday not in weekdays:
+                continue
+            if start <= end:
+                inside = start <= time_of_day < end
+            else:
+                inside = time_of_day >= start or time_of_day < end
+            if inside and multiplier > best:
+                best = multiplier
+        return best
+
+    def quote_many(self, requests, at=None):
+        """
+        Price every (origin, destination, vehicle_type) request in one pass.
+        Surge is resolved once per origin zone. Routes with no tariff get
+        fare None; unknown vehicle types raise ValueError.
+        """
+        local = timezone.localtime(at or timezone.now())
+        weekday, time_of_day = local.weekday(), local.time()
+        surge_by_zone = {}
+        quotes = []
+        for origin, destination, vehicle_type in requests:
+            origin = (origin or "").strip().lower()
+            destination = (destination or "").strip().lower()
+            key = (vehicle_type or "").strip().upper()
+            if key not in self.vehicles:
+                raise ValueError(f"Unknown vehicle type: {vehicle_type!r}")
+            multiplier, minimum_fare = self.vehicles[key]
+
+            surge = surge_by_zone.get(origin)
+            if surge is None:
+                surge = surge_by_zone[origin] = self.surge_multiplier(origin, weekday, time_of_day)
+
+            base_fare = self.fares.get((origin, destination))
+            fare = None
+            if base_fare is not None:
+                fare = max(base_fare * multiplier * surge, minimum_fare).quantize(TWO_PLACES)
+            quotes.append({
+                "origin_zone": origin,
+                "destination_zone": destination,
+                "vehicle_type": key,
+                "base_fare": base_fare,
+                "vehicle_multiplier": multiplier,
+                "surge_multiplier": surge,
+                "fare": fare,
+            })
+        return quotes
+
+
+def get_tariff_table():
+    """
+    Process-wide TariffTable, rebuilt only when the shared cache version
+    changes. The version itself is re-read at most every
+    TARIFF_VERSION_CHECK_SECONDS.
+    """
+    global _tariff_table, _tariff_checked_at
+    now = time.monotonic()
+    table = _tariff_table
+    if table is not None and now - _tariff_checked_at < TARIFF_VERSION_CHECK_SECONDS:
+        return table
+    version = get_tariff_cache_version()
+    if table is None or table.version != version:
+        table = _tariff_table = TariffTable.load(version)
+    _tariff_checked_at = now
+    return table
+
+
+def quote_many(requests, at=None):
+    """Batch quote (origin, destination, vehicle_type) triples against the cached tariffs."""
+    return get_tariff_table().quote_many(requests, at=at)
+
+
+def dispatch_area(address):
+    """
+    Coarse area key from a free-text address: its last comma-separated part,
+    lowercased (e.g. "12 Allen Avenue, Ikeja" -> "ikeja"). Empty if unknown.
+    """
+    parts = [part.strip().lower() for part in (address or "").split(",") if part.strip()]
+    return parts[-1] if parts else ""
+
+
+def plan_dispatch_assignments(dispatches, agents, max_load=MAX_ACTIVE_DISPATCHES_PER_AGENT):
+    """
+    Greedy load-balanced plan, pure Python (no queries).
+
+    `dispatches`: iterable of dicts {"id", "kind" ("order"|"supply"), "area"} in priority order.
+    `agents`: dicts {"id", "vehicle_id", "vehicle_type", "load", "areas": set()}.
+
+    Each dispatch goes to the agent with the lowest cost, where cost is the
+    agent's running load plus VEHICLE_MISMATCH_PENALTY when the vehicle type
+    does not suit the dispatch and AREA_MISMATCH_PENALTY when the agent has no
+    work in that area yet. One heap of agents per vehicle type (keyed by load)
+    plus an area -> agents index keeps each pick close to O(log n), so the
+    plan for thousands of dispatches is computed in milliseconds.
+
+    Returns [(dispatch_id, agent)] for the dispatches that could be placed.
+    """
+    agents = {a["id"]: dict(a, areas=set(a.get("areas") or ())) for a in agents}
+    heaps = defaultdict(list)
+    by_area = defaultdict(set)
+    for order, (agent_id, agent) in enumerate(agents.items()):
+        if agent["load"] < max_load:
+            heapq.heappush(heaps[agent["vehicle_type"]], (agent["load"], order, agent_id))
+        for area in agent["areas"]:
+            by_area[area].add(agent_id)
+
+    def heap_top(vehicle_type):
+        heap = heaps[vehicle_type]
+        while heap:
+            load, _, agent_id = heap[0]
+            agent = agents[agent_id]
+            if load == agent["load"] and load < max_load:
+                return agent
+            heapq.heappop(heap)  # stale entry
+        return None
+
+    plan, sequence = [], len(agents)
+    for dispatch in dispatches:
+        preferred = PREFERRED_VEHICLE_TYPES.get(dispatch["kind"], set())
+        area = dispatch["area"]
+
+        def cost(agent, in_area):
+            penalty = 0 if agent["vehicle_type"] in preferred else VEHICLE_MISMATCH_PENALTY
+            return agent["load"] + penalty + (0 if in_area else AREA_MISMATCH_PENALTY)
+
+        best, best_cost = None, None
+        for vehicle_type in list(heaps):
+            agent = heap_top(vehicle_type)
+            if agent is not None:
+                c = cost(agent, bool(area) and area in agent["areas"])
+                if best is None or c < best_cost:
+                    best, best_cost = agent, c
+        if area:
+            for agent_id in by_area.get(area, ()):
+                agent = agents[agent_id]
+                if agent["load"] < max_load:
+                    c = cost(agent, True)
+                    if best is None or c < best_cost:
+                        best, best_cost = agent, c
+        if best is None:
+            break  # everyone is at capacity
+
+        best["load"] += 1
+        if area:
+            best["areas"].add(area)
+            by_area[area].add(best["id"])
+        if best["load"] < max_load:
+            sequence += 1
+            heapq.heappush(heaps[best["vehicle_type"]], (best["load"], sequence, best["id"]))
+        plan.append((dispatch["id"], best))
+    return plan
+
+
+def auto_assign_dispatches(assigned_by=None, limit=None):
+    """
+    Assign PENDING, unassigned dispatches to active agents with an active vehicle.
+
+    Reads are batched (pending dispatches, agent/vehicle pairs, current workload
+    and areas: one query each), the plan is computed in memory by
+    plan_dispatch_assignments, and it is applied with one UPDATE per agent plus
+    a bulk_create of the ASSIGNED timeline entries. Pending rows are locked with
+    SKIP LOCKED so a concurrent run or manual assignment is never overwritten.
+
+    Returns {"assigned", "unassigned", "agents_used"}.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        pending_qs = (
+            Dispatch.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", assigned_agent__isnull=True)
+            .order_by("created_at")
+        )
+        if limit:
+            pending_qs = pending_qs[:limit]
+        pending = [
+            {"id": row["id"], "kind": "supply" if row["supply_record_id"] else "order",
+             "area": dispatch_area(row["pickup_address"]), "dropoff_area": dispatch_area(row["dropoff_address"]),
+             "estimated_pickup_time": row["estimated_pickup_time"],
+             "estimated_delivery_time": row["estimated_delivery_time"]}
+            for row in pending_qs.values(
+                "id", "supply_record_id", "pickup_address", "dropoff_address",
+                "estimated_pickup_time", "estimated_delivery_time",
+            )
+        ]
+        if not pending:
+            return {"assigned": 0, "unassigned": 0, "agents_used": 0}
+
+        agents = {}
+        pairs = (
+            Vehicle.objects.filter(active=True, driver__active=True)
+            .order_by("created_at")
+            .values("id", "vehicle_type", "driver_id")
+        )
+        for pair in pairs:
+            agents.setdefault(pair["driver_id"], {
+                "id": pair["driver_id"], "vehicle_id": pair["id"], "vehicle_type": pair["vehicle_type"],
+                "load": 0, "areas": set(),
+            })
+        if not agents:
+            return {"assigned": 0, "unassigned": len(pending), "agents_used": 0}
+
+        active_work = (
+            Dispatch.objects.filter(assigned_agent_id__in=agents.keys(), status__in=ACTIVE_DISPATCH_STATUSES)
+            .values("assigned_agent_id", "pickup_address")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        for row in active_work:
+            agent = agents[row["assigned_agent_id"]]
+            agent["load"] += row["n"]
+            area = dispatch_area(row["pickup_address"])
+            if area:
+                agent["areas"].add(area)
+
+        plan = plan_dispatch_assignments(pending, agents.values())
+
+        # All ETAs share `now`, so dispatches to the same zone with the same
+        # agent get identical estimates and stay in one UPDATE
+        etas = get_eta_table()
+        by_id = {dispatch["id"]: dispatch for dispatch in pending}
+        by_agent = defaultdict(list)
+        for dispatch_id, agent in plan:
+            dispatch = by_id[dispatch_id]
+            updates = eta_updates(
+                dispatch["dropoff_area"], agent["vehicle_type"], now,
+                dispatch["estimated_pickup_time"], dispatch["estimated_delivery_time"], table=etas,
+            )
+            by_agent[(agent["id"], agent["vehicle_id"], tuple(sorted(updates.items())))].append(dispatch_id)
+        for (agent_id, vehicle_id, updates), dispatch_ids in by_agent.items():
+            Dispatch.objects.filter(pk__in=dispatch_ids).update(
+                assigned_agent_id=agent_id, assigned_vehicle_id=vehicle_id, status="ASSIGNED", updated_at=now,
+                **dict(updates),
+            )
+        DispatchStatusUpdate.objects.bulk_create(
+            [
+                DispatchStatusUpdate(
+                    dispatch_id=dispatch_id, status="ASSIGNED", note="Auto-assigned", created_by=assigned_by
+                )
+                for dispatch_id, _ in plan
+            ],
+            batch_size=1000,
+        )
+
+    agents_used = len({agent_id for agent_id, _, _ in by_agent})
+    return {"assigned": len(plan), "unassigned": len(pending) - len(plan), "agents_used": agents_used}
+
+
+def parse_capacity_kg(text):
+    """Best-effort kg figure from a free-text capacity ("100kg", "1.5 tonnes"); None if absent."""
+    match = CAPACITY_RE.search(text or "")
+    if not match:
+        return None
+    value = Decimal(match.group(1))
+    return value * 1000 if match.group(2).lower().startswith("t") else value
+
+
+def vehicle_capacity_kg(capacity_kg, vehicle_type):
+    if capacity_kg:
+        return Decimal(capacity_kg)
+    return DEFAULT_CAPACITY_KG.get(vehicle_type, DEFAULT_CAPACITY_KG["OTHER"])
+
+
+def run_window(moment, hours=None):
+    """(start, end) of the fixed-size delivery window containing `moment`, or (None, None)."""
+    if moment is None:
+        return None, None
+    hours = hours or RUN_WINDOW_HOURS
+    local = timezone.localtime(moment)
+    start = local.replace(hour=local.hour - local.hour % hours, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(hours=hours)
+
+
+def _free_vehicles(vehicles, committed):
+    free = []
+    for vehicle in vehicles:
+        if vehicle["id"] in committed:
+            load, stops = committed[vehicle["id"]]
+            vehicle = {**vehicle, "capacity": vehicle["capacity"] - load, "max_stops": vehicle["max_stops"] - stops}
+            if vehicle["capacity"] <= 0 or vehicle["max_stops"] <= 0:
+                continue
+        free.append(vehicle)
+    return free
+
+
+def pack_delivery_runs(dispatches, vehicles, committed=None):
+    """
+    Capacity-aware run packing, pure Python (no queries).
+
+    `dispatches`: dicts {"id", "zone", "window", "load"} (window is a hashable key).
+    `vehicles`: dicts {"id", "agent_id", "capacity", "max_stops"}; each vehicle
+    can serve at most one new run per window.
+    `committed`: optional {window: {vehicle_id: (load, stops)}} already planned
+    on existing runs; that load and those stops are taken off the vehicle's
+    capacity and max_stops for the window, and a vehicle with nothing left
+    is not used.
+
+    Dispatches are grouped by (window, zone). Within a window, zones are served
+    heaviest first; each group is packed best-fit-decreasing: the heaviest
+    remaining drop goes into the open run with the least spare capacity that
+    still fits it, and a new run opens on the largest free vehicle only when
+    none does. Once a zone is packed, each run is moved to the smallest free
+    vehicle that still fits it, so big vehicles stay free for heavy zones.
+    Drops heavier than any free vehicle, or left over once the window's
+    vehicles run out, are returned as unplanned.
+
+    Returns (runs, unplanned_ids), with runs as dicts
+    {"vehicle", "zone", "window", "load", "dispatch_ids"}.
+    """
+    groups = defaultdict(list)
+    for dispatch in dispatches:
+        groups[(dispatch["window"], dispatch["zone"])].append(dispatch)
+    windows = defaultdict(list)
+    for (window, zone), items in groups.items():
+        windows[window].append((zone, items))
+
+    committed = committed or {}
+    runs, unplanned = [], []
+    for window, zone_groups in windows.items():
+        # free vehicles for this window, sorted by capacity (ascending) for right-sizing
+        free = _free_vehicles(vehicles, committed.get(window, {}))
+        free.sort(key=lambda v: (v["capacity"], v["max_stops"], str(v["id"])))
+        free_caps = [v["capacity"] for v in free]
+        zone_groups.sort(key=lambda zg: sum(d["load"] for d in zg[1]), reverse=True)
+
+        for zone, items in zone_groups:
+            items.sort(key=lambda d: d["load"], reverse=True)
+            open_runs = []      # [{"vehicle", "spare", "dispatch_ids", "load"}]
+            spare_index = []    # sorted [(spare, run_no)] of runs that can take more stops
+            for dispatch in items:
+                load = dispatch["load"]
+                pos = bisect.bisect_left(spare_index, (load, -1))
+                if pos < len(spare_index):
+                    _, run_no = spare_index.pop(pos)
+                    run = open_runs[run_no]
+                elif free and free[-1]["capacity"] >= load:
+                    vehicle = free.pop()
+                    free_caps.pop()
+                    run = {"vehicle": vehicle, "spare": vehicle["capacity"], "dispatch_ids": [], "load": Decimal("0")}
+                    run_no = len(open_runs)
+                    open_runs.append(run)
+                else:
+                    unplanned.append(dispatch["id"])
+                    continue
+                run["spare"] -= load
+                run["load"] += load
+                run["dispatch_ids"].append(dispatch["id"])
+                if len(run["dispatch_ids"]) < run["vehicle"]["max_stops"]:
+                    bisect.insort(spare_index, (run["spare"], run_no))
+
+            # right-size: swap each run onto the smallest free vehicle that fits it
+            for run in sorted(open_runs, key=lambda r: r["load"]):
+                pos = bisect.bisect_left(free_caps, run["load"])
+                while pos < len(free) and free[pos]["max_stops"] < len(run["dispatch_ids"]):
+                    pos += 1
+                if pos < len(free) and free[pos]["capacity"] < run["vehicle"]["capacity"]:
+                    smaller = free.pop(pos)
+                    free_caps.pop(pos)
+                    released = run["vehicle"]
+                    run["vehicle"] = smaller
+                    at = bisect.bisect_left(free_caps, released["capacity"])
+                    free.insert(at, released)
+                    free_caps.insert(at, released["capacity"])
+                runs.append({
+                    "vehicle": run["vehicle"], "zone": zone, "window": window,
+                    "load": run["load"], "dispatch_ids": run["dispatch_ids"],
+                })
+    return runs, unplanned
+
+
+def committed_run_loads(window_starts):
+    """{window_start: {vehicle_id: (load_kg, stops)}} of planned/in-progress runs in those windows."""
+    starts = [start for start in window_starts if start is not None]
+    in_windows = Q(window_start__in=starts)
+    if None in window_starts:
+        in_windows |= Q(window_start__isnull=True)
+    committed = defaultdict(dict)
+    for row in (
+        DeliveryRun.objects.filter(in_windows, status__in=RUN_COMMITTED_STATUSES, vehicle__isnull=False)
+        .order_by()
+        .values("window_start", "vehicle_id")
+        .annotate(load=Sum("total_load_kg"), stops=Sum("stops_count"))
+    ):
+        committed[row["window_start"]][row["vehicle_id"]] = (row["load"], row["stops"])
+    return committed
+
+
+def plan_delivery_runs(created_by=None, window_hours=None):
+    """
+    Consolidate PENDING dispatches that are not on a run yet into
+    capacity-aware delivery runs (see pack_delivery_runs) and persist them:
+    one bulk_create for the runs, a bulk_update for the dispatches (run, sequence,
+    agent, vehicle, status) and a bulk_create for their ASSIGNED timeline entries.
+
+    Dispatches are zoned by dropoff area and windowed by estimated_delivery_time
+    (undated dispatches share one window). Load and stops already on planned or
+    in-progress runs in a window are subtracted from those vehicles first, so
+    planning again never books a vehicle past its capacity. Returns
+    {"runs_created", "dispatches_planned", "unplanned"}.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Dispatch.objects.select_for_update(skip_locked=True)
+            .filter(status__in=RUN_PLANNABLE_STATUSES, delivery_run__isnull=True)
+            .values("id", "status", "dropoff_address", "estimated_delivery_time", "load_kg")
+        )
+        if not rows:
+            return {"runs_created": 0, "dispatches_planned": 0, "unplanned": 0}
+        # locking the fleet serializes concurrent planners over the committed loads read below
+        vehicles = [
+            {
+                "id": v["id"], "agent_id": v["driver_id"], "max_stops": max(1, v["max_stops"]),
+                "capacity": vehicle_capacity_kg(v["capacity_kg"], v["vehicle_type"]),
+            }
+            for v in Vehicle.objects.select_for_update().filter(active=True, driver__active=True)
+            .values("id", "driver_id", "capacity_kg", "vehicle_type", "max_stops")
+        ]
+
+        windows = {}
+        items = []
+        for row in rows:
+            window = run_window(row["estimated_delivery_time"], window_hours)
+            windows[window[0]] = window
+            items.append({
+                "id": row["id"],
+                "zone": dispatch_area(row["dropoff_address"]),
+                "window": window[0],
+                "load": row["load_kg"] if row["load_kg"] is not None else DEFAULT_DISPATCH_LOAD_KG,
+            })
+        planned_runs, unplanned = pack_delivery_runs(items, vehicles, committed_run_loads(windows))
+
+        run_objects, dispatch_objects, timeline = [], [], []
+        for planned in planned_runs:
+            vehicle = planned["vehicle"]
+            start, end = windows[planned["window"]]
+            run = DeliveryRun(
+                vehicle_id=vehicle["id"], agent_id=vehicle["agent_id"], zone=planned["zone"],
+                window_start=start, window_end=end, total_load_kg=planned["load"],
+                stops_count=len(planned["dispatch_ids"]), created_by=created_by,
+            )
+            run_objects.append(run)
+            for sequence, dispatch_id in enumerate(planned["dispatch_ids"], start=1):
+                dispatch_objects.append(Dispatch(
+                    id=dispatch_id, delivery_run=run, run_sequence=sequence, status="ASSIGNED",
+                    assigned_agent_id=vehicle["agent_id"], assigned_vehicle_id=vehicle["id"], updated_at=now,
+                ))
+                timeline.append(DispatchStatusUpdate(
+                    dispatch_id=dispatch_id, status="ASSIGNED",
+                    note=f"Planned on delivery run {run.id} (stop {sequence})", created_by=created_by,
+                ))
+
+        DeliveryRun.objects.bulk_create(run_objects, batch_size=500)
+        Dispatch.objects.bulk_update(
+            dispatch_objects,
+            ["delivery_run", "run_sequence", "status", "assigned_agent", "assigned_vehicle", "updated_at"],
+            batch_size=500,
+        )
+        DispatchStatusUpdate.objects.bulk_create(timeline, batch_size=1000)
+
+    return {"runs_created": len(run_objects), "dispatches_planned": len(dispatch_objects), "unplanned": len(unplanned)}
+
+
+class LocationPingBuffer:
+    """
+    Thread-safe in-process queue of AgentLocationPing rows. Rows are written
+    with one bulk INSERT once `flush_size` rows are waiting or the oldest row
+    is `flush_seconds` old, instead of one INSERT per HTTP request.
+
+    With `background=True` a daemon thread (started on first use in each
+    process, so it survives forking servers) flushes aged rows even when no
+    more pings arrive; anything still queued is flushed at interpreter exit.
+    A killed worker therefore loses at most one flush interval of pings,
+    which is acceptable for telemetry. A failed INSERT is logged and its rows
+    are put back for the next flush (up to `max_rows`, oldest dropped first),
+    never raised into the request that queued them.
+    """
+
+    def __init__(self, flush_size=LOCATION_PING_FLUSH_SIZE, flush_seconds=LOCATION_PING_FLUSH_SECONDS,
+                 max_rows=None, background=False):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_rows = max_rows or flush_size * 10
+        self.background = background
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._flusher_pid = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, rows):
+        if self.background:
+            self._ensure_flusher()
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            self._pending.set()
+            due = (
+                len(self._rows) >= self.flush_size
+                or time.monotonic() - self._oldest >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows, self._oldest = self._rows, [], None
+        if not rows:
+            return 0
+        try:
+            AgentLocationPing.objects.bulk_create(rows, batch_size=1000)
+        except Exception:
+            ping_logger.exception("Failed to write %d location pings; keeping them for the next flush", len(rows))
+            self._requeue(rows)
+            return 0
+        return len(rows)
+
+    def _requeue(self, rows):
+        with self._lock:
+            rows = rows + self._rows
+            if len(rows) > self.max_rows:
+                ping_logger.warning("Location ping buffer full; dropping %d oldest pings", len(rows) - self.max_rows)
+                rows = rows[-self.max_rows:]
+            # retry after another interval rather than on the next request
+            self._rows, self._oldest = rows, time.monotonic()
+            self._pending.set()
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._run_flusher, name="location-ping-flusher", daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            self._pending.wait()
+            with self._lock:
+                if self._oldest is None:
+                    self._pending.clear()
+                    continue
+                delay = self._oldest + self.flush_seconds - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            self.flush()
+            # this thread's connection is not managed by the request cycle
+            connection.close()
+
+    def clear(self):
+        with self._lock:
+            self._rows, self._oldest = [], None
+
+
+location_ping_buffer = LocationPingBuffer(background=LOCATION_PING_BACKGROUND_FLUSH)
+atexit.register(location_ping_buffer.flush)
+
+
+def agent_position_cache_key(agent_id):
+    return f"{AGENT_POSITION_CACHE_PREFIX}{agent_id}"
+
+
+def record_location_pings(agent_id, fixes):
+    """
+    Queue a device's batch of GPS fixes ({"latitude", "longitude",
+    "recorded_at", optional "accuracy_m"}) for bulk insert and move the
+    agent's cached latest position forward if the batch has a newer fix.
+    The cached position is best effort: the check and the write are separate
+    cache calls, so two batches for the same agent racing each other can
+    leave the older fix cached until the agent's next ping.
+    Returns the number of fixes accepted.
+    """
+    if not fixes:
+        return 0
+    received_at = timezone.now()
+    rows = [
+        AgentLocationPing(
+            agent_id=agent_id,
+            latitude=fix["latitude"],
+            longitude=fix["longitude"],
+            accuracy_m=fix.get("accuracy_m"),
+            recorded_at=fix["recorded_at"],
+            received_at=received_at,
+        )
+        for fix in fixes
+    ]
+
+    newest = max(fixes, key=lambda fix: fix["recorded_at"])
+    key = agent_position_cache_key(agent_id)
+    current = cache.get(key)
+    if current is None or newest["recorded_at"] > current["recorded_at"]:
+        cache.set(key, {
+            "agent_id": str(agent_id),
+            "latitude": newest["latitude"],
+            "longitude": newest["longitude"],
+            "accuracy_m": newest.get("accuracy_m"),
+            "recorded_at": newest["recorded_at"],
+        }, timeout=AGENT_POSITION_CACHE_TIMEOUT)
+
+    location_ping_buffer.add(rows)
+    return len(rows)
+
+
+def get_agent_positions(agent_ids):
+    """Latest cached position per agent id (one cache round-trip); unknown agents are omitted."""
+    keys = {agent_position_cache_key(agent_id): agent_id for agent_id in agent_ids}
+    found = cache.get_many(list(keys))
+    return {str(keys[key]): position for key, position in found.items()}
+
+
+def flush_location_pings():
+    return location_ping_buffer.flush()
+
+
+def prune_location_pings(older_than_days=30):
+    """Delete pings received more than `older_than_days` ago; returns the number removed."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = AgentLocationPing.objects.filter(received_at__lt=cutoff).delete()
+    return deleted
+
+
+def due_open_dispatches(before, queryset=None):
+    """
+    Open dispatches whose estimated delivery is before `before`, earliest
+    first. The filter matches the partial index logistics_dispatch_open_eta,
+    so this is one range scan over open dispatches only.
+    """
+    return (
+        (Dispatch.objects.all() if queryset is None else queryset)
+        .filter(status__in=OPEN_DISPATCH_STATUSES, estimated_delivery_time__lt=before)
+        .order_by("estimated_delivery_time")
+    )
+
+
+def scan_dispatch_sla(now=None, at_risk_minutes=None):
+    """
+    Periodic SLA check. Finds overdue and at-risk open dispatches in one query
+    and sends staff a single aggregated alert listing dispatches that became
+    overdue since the last scan. sla_alerted_at is only stamped once the alert
+    reached at least one staff member on some channel, so an undelivered alert
+    (no staff, no active template, every send failed) is retried on the next
+    scan. Returns {"overdue", "at_risk", "newly_overdue", "alerted"}.
+    """
+    now = now or timezone.now()
+    at_risk_minutes = SLA_AT_RISK_MINUTES if at_risk_minutes is None else at_risk_minutes
+    rows = list(
+        due_open_dispatches(now + timedelta(minutes=at_risk_minutes))
+        .values("id", "reference_code", "status", "assigned_agent_id", "estimated_delivery_time", "sla_alerted_at")
+    )
+    overdue = [row for row in rows if row["estimated_delivery_time"] < now]
+    newly_overdue = [row for row in overdue if row["sla_alerted_at"] is None]
+    at_risk = len(rows) - len(overdue)
+
+    alerted = False
+    if newly_overdue:
+        payload = {
+            "overdue_count": len(overdue),
+            "newly_overdue_count": len(newly_overdue),
+            "at_risk_count": at_risk,
+            "dispatches": [
+                {
+                    "reference_code": row["reference_code"] or str(row["id"]),
+                    "status": row["status"],
+                    "minutes_late": int((now - row["estimated_delivery_time"]).total_seconds() // 60),
+                }
+                for row in newly_overdue[:SLA_ALERT_MAX_LISTED]
+            ],
+        }
+        sla_logger.warning(
+            "%s dispatches newly overdue (%s overdue, %s at risk)", len(newly_overdue), len(overdue), at_risk
+        )
+        from notifications.models import NotificationStatus
+        from notifications.services import build_and_send_notification
+
+        staff = list(get_user_model().objects.filter(is_staff=True, is_active=True))
+        with transaction.atomic():
+            if staff:
+                notification = build_and_send_notification("dispatch_sla_breach", staff, payload, SLA_ALERT_CHANNELS)
+                alerted = notification.user_notifications.filter(status=NotificationStatus.SENT).exists()
+            if alerted:
+                Dispatch.objects.filter(pk__in=[row["id"] for row in newly_overdue]).update(sla_alerted_at=now)
+            else:
+                sla_logger.error("SLA alert for %s dispatches was not delivered; retrying next scan", len(newly_overdue))
+
+    return {"overdue": len(overdue), "at_risk": at_risk, "newly_overdue": len(newly_overdue), "alerted": alerted}
+
+
+
+def eta_hour_band(moment):
+    """Time-of-day band (local hour // ETA_HOUR_BAND_HOURS) used to key ETA stats."""
+    return timezone.localtime(moment).hour // ETA_HOUR_BAND_HOURS
+
+
+def delivered_dispatch_durations(since=None, until=None):
+    """
+    Yield (zone, vehicle_type, hour_band, pickup_seconds, delivery_seconds)
+    for every dispatch whose first DELIVERED update was recorded in
+    (since, until]. Durations run from the first ASSIGNED update and come
+    from one grouped query over the status timeline. pickup_seconds is None
+    without a PICKED_UP update; implausible intervals are skipped.
+    """
+    def first(state, field="occurred_at"):
+        return Min(f"status_updates__{field}", filter=Q(status_updates__status=state))
+
+    rows = Dispatch.objects.all()
+    if since is not None or until is not None:
+        # narrow in WHERE first so only the window's deliveries are grouped,
+        # then keep those whose first DELIVERED update falls in the window
+        logged = DispatchStatusUpdate.objects.filter(dispatch=OuterRef("pk"), status="DELIVERED")
+        if since is not None:
+            logged = logged.filter(created_at__gt=since)
+        if until is not None:
+            logged = logged.filter(created_at__lte=until)
+        rows = rows.filter(Exists(logged))
+    rows = rows.annotate(
+        assigned_at=first("ASSIGNED"),
+        picked_up_at=first("PICKED_UP"),
+        delivered_at=first("DELIVERED"),
+        delivered_logged_at=first("DELIVERED", "created_at"),
+    ).filter(assigned_at__isnull=False, delivered_at__isnull=False)
+    if since is not None:
+        rows = rows.filter(delivered_logged_at__gt=since)
+    if until is not None:
+        rows = rows.filter(delivered_logged_at__lte=until)
+
+    max_seconds = ETA_MAX_DURATION_HOURS * 3600
+    for dropoff_address, vehicle_type, assigned_at, picked_up_at, delivered_at in (
+        rows.order_by()
+        .values_list("dropoff_address", "assigned_vehicle__vehicle_type", "assigned_at", "picked_up_at", "delivered_at")
+        .iterator(chunk_size=2000)
+    ):
+        delivery_seconds = (delivered_at - assigned_at).total_seconds()
+        if not 0 < delivery_seconds <= max_seconds:
+            continue
+        pickup_seconds = None
+        if picked_up_at is not None and assigned_at <= picked_up_at <= delivered_at:
+            pickup_seconds = (picked_up_at - assigned_at).total_seconds()
+        yield (
+            dispatch_area(dropoff_address), vehicle_type or "", eta_hour_band(assigned_at),
+            pickup_seconds, delivery_seconds,
+        )
+
+
+def refresh_delivery_eta_model(full=False, now=None):
+    """
+    Add deliveries recorded since the previous refresh to DeliveryDurationStat
+    (or rebuild it from the whole history with full=True). Intervals are
+    summed per key in memory and written with one bulk_create and one
+    bulk_update, so a nightly run only reads the day's deliveries.
+
+    Returns {"dispatches", "keys", "processed_until"}.
+    """
+    until = (now or timezone.now()) - ETA_REFRESH_SETTLE
+    with transaction.atomic():
+        last = None
+        if not full:
+            last = DeliveryEtaRefresh.objects.select_for_update().order_by("-id").first()
+        since = last.processed_until if last else None
+
+        totals = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        counted = 0
+        for zone, vehicle_type, hour_band, pickup_seconds, delivery_seconds in delivered_dispatch_durations(since, until):
+            entry = totals[(zone, vehicle_type, hour_band)]
+            entry[0] += 1
+            entry[1] += delivery_seconds
+            if pickup_seconds is not None:
+                entry[2] += 1
+                entry[3] += pickup_seconds
+            counted += 1
+
+        if last is None:
+            DeliveryDurationStat.objects.all().delete()
+        existing = {
+            (stat.zone, stat.vehicle_type, stat.hour_band): stat
+            for stat in DeliveryDurationStat.objects.select_for_update()
+        }
+        created, changed = [], []
+        stamp = timezone.now()
+        for (zone, vehicle_type, hour_band), (samples, delivery_total, pickups, pickup_total) in totals.items():
+            stat = existing.get((zone, vehicle_type, hour_band))
+            if stat is None:
+                stat = DeliveryDurationStat(zone=zone, vehicle_type=vehicle_type, hour_band=hour_band)
+                created.append(stat)
+            else:
+                changed.append(stat)
+            stat.sample_count += samples
+            stat.delivery_seconds_total += delivery_total
+            stat.pickup_count += pickups
+            stat.pickup_seconds_total += pickup_total
+            stat.updated_at = stamp
+        DeliveryDurationStat.objects.bulk_create(created, batch_size=500)
+        DeliveryDurationStat.objects.bulk_update(
+            changed,
+            ["sample_count", "delivery_seconds_total", "pickup_count", "pickup_seconds_total", "updated_at"],
+            batch_size=500,
+        )
+        DeliveryEtaRefresh.objects.create(processed_until=until, dispatches_counted=counted, full_rebuild=last is None)
+        transaction.on_commit(invalidate_eta_cache)
+
+    return {"dispatches": counted, "keys": len(totals), "processed_until": until}
+
+
+def get_eta_cache_version():
+    version = cache.get(ETA_CACHE_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(ETA_CACHE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_eta_cache():
+    """Bump the shared ETA model version so every process reloads its table."""
+    global _eta_table
+    cache.set(ETA_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _eta_table = None
+
+
+def _eta_keys(zone, vehicle_type, hour_band):
+    # Most to least specific; None is a wildcard
+    return (
+        (zone, vehicle_type, hour_band),
+        (zone, vehicle_type, None),
+        (None, vehicle_type, hour_band),
+        (None, vehicle_type, None),
+        (None, None, None),
+    )
+
+
+class EtaTable:
+    """
+    Immutable in-memory snapshot of DeliveryDurationStat as average
+    (pickup, delivery) durations. Coarser rollups (any band, any zone, any
+    vehicle type) are summed at load time, so an estimate is a dict lookup,
+    falling back to a rollup only when a key has too little history.
+    """
+
+    def __init__(self, version, durations):
+        self.version = version
+        self.durations = durations
+
+    @classmethod
+    def load(cls, version):
+        totals = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        for zone, vehicle_type, hour_band, samples, delivery_total, pickups, pickup_total in (
+            DeliveryDurationStat.objects.values_list(
+                "zone", "vehicle_type", "hour_band",
+                "sample_count", "delivery_seconds_total", "pickup_count", "pickup_seconds_total",
+            )
+        ):
+            for key in _eta_keys(zone, vehicle_type, hour_band):
+                entry = totals[key]
+                entry[0] += samples
+                entry[1] += delivery_total
+                entry[2] += pickups
+                entry[3] += pickup_total
+
+        durations = {}
+        for key, (samples, delivery_total, pickups, pickup_total) in totals.items():
+            if samples >= ETA_MIN_SAMPLES:
+                pickup = timedelta(seconds=pickup_total / pickups) if pickups else None
+                durations[key] = (pickup, timedelta(seconds=delivery_total / samples))
+        return cls(version, durations)
+
+    def estimate(self, zone, vehicle_type, hour_band):
+        """Average (pickup, delivery) durations from assignment, or None without enough history."""
+        for key in _eta_keys(zone, vehicle_type, hour_band):
+            found = self.durations.get(key)
+            if found is not None:
+                return found
+        return None
+
+
+def get_eta_table():
+    """
+    Process-wide EtaTable, rebuilt only when the shared cache version changes
+    (after each refresh). The version is re-read at most every
+    ETA_VERSION_CHECK_SECONDS.
+    """
+    global _eta_table, _eta_checked_at
+    now = time.monotonic()
+    table = _eta_table
+    if table is not None and now - _eta_checked_at < ETA_VERSION_CHECK_SECONDS:
+        return table
+    version = get_eta_cache_version()
+    if table is None or table.version != version:
+        table = _eta_table = EtaTable.load(version)
+    _eta_checked_at = now
+    return table
+
+
+def eta_updates(zone, vehicle_type, at, estimated_pickup_time=None, estimated_delivery_time=None, table=None):
+    """
+    Estimated pickup/delivery times for a dispatch to `zone` assigned at `at`,
+    as a dict of Dispatch field values. Estimates already set (e.g. by hand)
+    are left out, as is everything when there is not enough history.
+    """
+    found = (table or get_eta_table()).estimate(zone, (vehicle_type or "").upper(), eta_hour_band(at))
+    if found is None:
+        return {}
+    pickup, delivery = found
+    updates = {}
+    if pickup is not None and estimated_pickup_time is None:
+        updates["estimated_pickup_time"] = at + pickup
+    if estimated_delivery_time is None:
+        updates["estimated_delivery_time"] = at + delivery
+    return updates
+
+
+def fill_dispatch_eta(dispatch, at=None):
+    """Set empty ETA fields on an assigned (unsaved) dispatch; returns the names of the fields set."""
+    vehicle = dispatch.assigned_vehicle if dispatch.assigned_vehicle_id else None
+    updates = eta_updates(
+        dispatch_area(dispatch.dropoff_address),
+        vehicle.vehicle_type if vehicle else "",
+        at or timezone.now(),
+        dispatch.estimated_pickup_time,
+        dispatch.estimated_delivery_time,
+    )
+    for field, value in updates.items():
+        setattr(dispatch, field, value)
+    return list(updates)
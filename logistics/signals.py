@@ -0,0 +1,24 @@
+# logistics/signals.py
+"""
+Invalidate the in-memory tariff table whenever a ZoneTariff, VehicleTariff
+or SurgeWindow is saved or deleted. QuerySet.update() bypasses these
+handlers; call services.invalidate_tariff_cache() after bulk tariff edits.
+The version is bumped once the transaction commits, so no process can reload
+the old rows under the new version.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import SurgeWindow, VehicleTariff, ZoneTariff
+from .services import invalidate_tariff_cache
+
+
+@receiver(post_save, sender=ZoneTariff)
+@receiver(post_delete, sender=ZoneTariff)
+@receiver(post_save, sender=VehicleTariff)
+@receiver(post_delete, sender=VehicleTariff)
+@receiver(post_save, sender=SurgeWindow)
+@receiver(post_delete, sender=SurgeWindow)
+def tariff_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_tariff_cache)
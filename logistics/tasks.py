@@ -0,0 +1,24 @@
+try:
+    from celery import shared_task
+except ImportError:  # pragma: no cover - optional dependency for tests
+    def shared_task(func=None, **_kwargs):
+        if func is None:
+            def wrapper(f):
+                return f
+            return wrapper
+        return func
+
+from .services import refresh_delivery_eta_model, scan_dispatch_sla
+
+
+@shared_task
+def scan_dispatch_sla_task():
+    """Periodic (e.g. every 5 minutes) check for overdue and at-risk dispatches."""
+    return scan_dispatch_sla()
+
+
+@shared_task
+def refresh_delivery_eta_model_task():
+    """Nightly: fold the day's deliveries into the ETA duration stats."""
+    result = refresh_delivery_eta_model()
+    return {"dispatches": result["dispatches"], "keys": result["keys"]}
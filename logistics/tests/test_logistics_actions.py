@@ -68,3 +68,33 @@ def test_dispatch_update_status_by_assigned_agent(client):
         data={"status": "PICKED_UP", "note": "picked", "location": "lagos"},
     )
     assert r.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+def test_proof_of_delivery_direct_upload(client, settings, tmp_path):
+    settings.DIRECT_UPLOAD_BACKEND = "core.uploads.LocalDirectUpload"
+    settings.DIRECT_UPLOAD_LOCAL_ROOT = str(tmp_path)
+    settings.DIRECT_UPLOAD_LOCAL_URL = "http://storage.test/uploads/"
+    agent_user = User.objects.create_user(email="pod_agent@example.com", password="StrongPass123", full_name="POD Agent")
+    agent_user.is_verified = True
+    agent_user.save(update_fields=["is_verified"])
+    agent = LogisticsAgent.objects.create(full_name="POD Agent", user=agent_user)
+    dispatch = Dispatch.objects.create(assigned_agent=agent, status="IN_TRANSIT")
+
+    client.force_login(agent_user)
+    r_ticket = client.post(f"/api/logistics/dispatches/{dispatch.id}/proof-upload-ticket/")
+    assert r_ticket.status_code == status.HTTP_201_CREATED
+    ticket = r_ticket.json()["data"]
+
+    confirm_url = f"/api/logistics/dispatches/{dispatch.id}/confirm-delivery/"
+    payload = {"upload_ticket": ticket["ticket"], "upload": {}, "receiver_name": "Ada"}
+    assert client.post(confirm_url, payload, format="json").status_code == status.HTTP_400_BAD_REQUEST
+
+    # The device uploads straight to storage
+    (tmp_path / ticket["key"]).parent.mkdir(parents=True)
+    (tmp_path / ticket["key"]).write_bytes(b"\xff\xd8photo")
+    r = client.post(confirm_url, payload, format="json")
+    assert r.status_code == status.HTTP_200_OK
+    dispatch.refresh_from_db()
+    assert dispatch.status == "DELIVERED"
+    assert dispatch.proof_of_delivery_url == f"http://storage.test/uploads/{ticket['key']}"
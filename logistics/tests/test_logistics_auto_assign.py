@@ -0,0 +1,101 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from farmers.models import Farmer, SupplyRecord
+from logistics import services
+from logistics.models import Dispatch, DispatchStatusUpdate, LogisticsAgent, Vehicle
+
+User = get_user_model()
+
+
+def _pair(name, vehicle_type):
+    agent = LogisticsAgent.objects.create(full_name=name)
+    vehicle = Vehicle.objects.create(vehicle_type=vehicle_type, registration_number=f"REG-{name}", driver=agent)
+    return agent, vehicle
+
+
+def test_plan_balances_load_and_prefers_vehicle_and_area():
+    agents = [
+        {"id": "bike", "vehicle_id": "v1", "vehicle_type": "MOTORCYCLE", "load": 0, "areas": set()},
+        {"id": "van", "vehicle_id": "v2", "vehicle_type": "VAN", "load": 0, "areas": {"ikeja"}},
+        {"id": "truck", "vehicle_id": "v3", "vehicle_type": "TRUCK", "load": 4, "areas": set()},
+    ]
+    dispatches = [
+        {"id": 1, "kind": "supply", "area": "ikeja"},
+        {"id": 2, "kind": "order", "area": "yaba"},
+        {"id": 3, "kind": "order", "area": "yaba"},
+        {"id": 4, "kind": "supply", "area": "ikeja"},
+    ]
+    plan = dict((d, a["id"]) for d, a in services.plan_dispatch_assignments(dispatches, agents))
+    assert plan[1] == "van"          # right vehicle and already working in Ikeja
+    assert plan[2] == plan[3] == "bike"  # orders go to the bike, clustered by area
+    assert plan[4] == "van"
+
+    capped = services.plan_dispatch_assignments(dispatches, agents[:1], max_load=2)
+    assert len(capped) == 2
+
+
+@pytest.mark.django_db
+def test_auto_assign_respects_workload_and_records_timeline():
+    busy, busy_vehicle = _pair("busy", "MOTORCYCLE")
+    idle, _ = _pair("idle", "MOTORCYCLE")
+    inactive = LogisticsAgent.objects.create(full_name="off", active=False)
+    Vehicle.objects.create(vehicle_type="MOTORCYCLE", registration_number="REG-off", driver=inactive)
+    for _ in range(3):
+        Dispatch.objects.create(assigned_agent=busy, assigned_vehicle=busy_vehicle, status="IN_TRANSIT")
+    pending = [Dispatch.objects.create(pickup_address="Shop 1, Yaba") for _ in range(2)]
+
+    result = services.auto_assign_dispatches()
+    assert result == {"assigned": 2, "unassigned": 0, "agents_used": 1}
+    assert set(Dispatch.objects.filter(pk__in=[d.pk for d in pending]).values_list("assigned_agent", flat=True)) == {idle.id}
+    assert DispatchStatusUpdate.objects.filter(status="ASSIGNED", note="Auto-assigned").count() == 2
+
+
+@pytest.mark.django_db
+def test_auto_assign_benchmark_5000_dispatches():
+    # 200 agents x the default cap of 25 active dispatches covers the whole backlog
+    for i in range(200):
+        _pair(f"agent{i}", ("MOTORCYCLE", "VAN", "TRUCK", "KEKE")[i % 4])
+    farmer = Farmer.objects.create(contact_name="Bench Farmer")
+    supply = SupplyRecord.objects.create(farmer=farmer, quantity=1)
+    areas = ["Ikeja", "Yaba", "Lekki", "Surulere", "Ajah"]
+    Dispatch.objects.bulk_create(
+        [
+            Dispatch(pickup_address=f"{i} Road, {areas[i % 5]}", supply_record=supply if i % 3 == 0 else None)
+            for i in range(5000)
+        ],
+        batch_size=1000,
+    )
+
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        result = services.auto_assign_dispatches()
+    elapsed = time.perf_counter() - started
+
+    assert result["assigned"] == 5000
+    # one grouped UPDATE per agent, a handful of reads and batched timeline inserts:
+    # a small fraction of the 10,000 statements the one-at-a-time path would issue
+    assert len(ctx.captured_queries) <= 200 + 60
+    assert elapsed < 10
+    counts = list(Dispatch.objects.values("assigned_agent").order_by().annotate(n=Count("id")).values_list("n", flat=True))
+    assert max(counts) - min(counts) <= services.VEHICLE_MISMATCH_PENALTY + services.AREA_MISMATCH_PENALTY + 1
+
+
+@pytest.mark.django_db
+def test_auto_assign_endpoint(client):
+    admin = User.objects.create_superuser(username="admin_auto", password="p", email="admin_auto@test.com")
+    client.force_login(admin)
+    _pair("solo", "VAN")
+    Dispatch.objects.create()
+    r = client.post("/api/logistics/dispatches/auto-assign/", {}, format="json")
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["data"]["assigned"] == 1
+    assert client.post("/api/logistics/dispatches/auto-assign/", {"limit": "x"}, format="json").status_code == 400
+    assert client.post("/api/logistics/dispatches/auto-assign/", {"limit": -1}, format="json").status_code == 400
+    assert client.post("/api/logistics/dispatches/auto-assign/", {"limit": 0}, format="json").status_code == 400
@@ -0,0 +1,128 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+
+from logistics import services
+from logistics.models import DeliveryRun, Dispatch, LogisticsAgent, Vehicle
+
+User = get_user_model()
+
+
+def _vehicle(name, vehicle_type, capacity_kg=None, max_stops=20):
+    agent = LogisticsAgent.objects.create(full_name=name)
+    return Vehicle.objects.create(
+        vehicle_type=vehicle_type, registration_number=f"REG-{name}", driver=agent,
+        capacity_kg=capacity_kg, max_stops=max_stops,
+    )
+
+
+def test_parse_capacity_and_defaults():
+    assert services.parse_capacity_kg("up to 100kg or 2 crates") == Decimal("100")
+    assert services.parse_capacity_kg("1.5 tonnes") == Decimal("1500.0")
+    assert services.parse_capacity_kg("2 crates") is None
+    assert services.vehicle_capacity_kg(None, "VAN") == Decimal("800")
+
+
+def test_packing_respects_capacity_stops_and_right_sizes():
+    vehicles = [
+        {"id": "truck", "agent_id": 1, "capacity": Decimal("1000"), "max_stops": 10},
+        {"id": "bike", "agent_id": 2, "capacity": Decimal("30"), "max_stops": 2},
+        {"id": "van", "agent_id": 3, "capacity": Decimal("300"), "max_stops": 10},
+    ]
+    dispatches = [{"id": f"y{i}", "zone": "yaba", "window": "am", "load": Decimal("100")} for i in range(5)]
+    dispatches += [{"id": f"i{i}", "zone": "ikeja", "window": "am", "load": Decimal("10")} for i in range(3)]
+    dispatches += [{"id": "huge", "zone": "ikeja", "window": "pm", "load": Decimal("2000")}]
+
+    runs, unplanned = services.pack_delivery_runs(dispatches, vehicles)
+    assert unplanned == ["huge"]
+    by_zone = {}
+    for run in runs:
+        assert run["load"] <= run["vehicle"]["capacity"]
+        assert len(run["dispatch_ids"]) <= run["vehicle"]["max_stops"]
+        by_zone.setdefault(run["zone"], []).append(run)
+    # all of Yaba fits on one truck; Ikeja's 30kg needs the van because the bike only takes 2 stops
+    assert [r["vehicle"]["id"] for r in by_zone["yaba"]] == ["truck"]
+    assert [r["vehicle"]["id"] for r in by_zone["ikeja"]] == ["van"]
+
+
+def test_packing_tens_of_thousands_is_fast():
+    rng = random.Random(7)
+    vehicles = [
+        {"id": i, "agent_id": i, "capacity": Decimal(rng.choice([30, 150, 800, 5000])), "max_stops": rng.choice([10, 20, 40])}
+        for i in range(400)
+    ]
+    dispatches = [
+        {"id": i, "zone": f"zone{rng.randrange(60)}", "window": rng.randrange(6), "load": Decimal(rng.randrange(1, 60))}
+        for i in range(30000)
+    ]
+    started = time.perf_counter()
+    runs, unplanned = services.pack_delivery_runs(dispatches, vehicles)
+    assert time.perf_counter() - started < 20
+    assert sum(len(r["dispatch_ids"]) for r in runs) + len(unplanned) == 30000
+    assert len(runs) < 30000 / 5  # consolidation, not one trip per drop
+
+
+@pytest.mark.django_db
+def test_plan_delivery_runs_persists_runs_in_bulk():
+    truck = _vehicle("truck", "TRUCK")
+    bike = _vehicle("bike", "MOTORCYCLE", capacity_kg=Decimal("30"), max_stops=4)
+    eta = timezone.now().replace(hour=9, minute=30) + timedelta(days=1)
+    for i in range(4):
+        Dispatch.objects.create(dropoff_address=f"{i} Herbert Macaulay Way, Yaba", estimated_delivery_time=eta, load_kg=5)
+    heavy = Dispatch.objects.create(dropoff_address="Allen Avenue, Ikeja", estimated_delivery_time=eta, load_kg=900)
+
+    result = services.plan_delivery_runs()
+    assert result == {"runs_created": 2, "dispatches_planned": 5, "unplanned": 0}
+    heavy.refresh_from_db()
+    assert heavy.assigned_vehicle_id == truck.id and heavy.status == "ASSIGNED" and heavy.run_sequence == 1
+    yaba = DeliveryRun.objects.get(zone="yaba")
+    assert yaba.stops_count == 4 and yaba.total_load_kg == Decimal("20")
+    assert yaba.vehicle_id == bike.id
+    assert yaba.window_start.hour == 8 and yaba.window_end - yaba.window_start == timedelta(hours=4)
+    # already planned dispatches are not planned again
+    assert services.plan_delivery_runs()["dispatches_planned"] == 0
+
+
+@pytest.mark.django_db
+def test_planning_twice_respects_committed_capacity_and_manual_assignments():
+    van = _vehicle("van2", "VAN", capacity_kg=Decimal("800"))
+    dispatcher_agent = LogisticsAgent.objects.create(full_name="Chosen")
+    eta = timezone.now().replace(hour=9, minute=30) + timedelta(days=1)
+    manual = Dispatch.objects.create(
+        dropoff_address="Yaba", estimated_delivery_time=eta, load_kg=10,
+        status="ASSIGNED", assigned_agent=dispatcher_agent,
+    )
+    for i in range(3):
+        Dispatch.objects.create(dropoff_address=f"{i} Main Street, Yaba", estimated_delivery_time=eta, load_kg=300)
+
+    assert services.plan_delivery_runs() == {"runs_created": 1, "dispatches_planned": 2, "unplanned": 1}
+    Dispatch.objects.create(dropoff_address="Ikeja", estimated_delivery_time=eta, load_kg=300)
+    # 200kg left on the van in this window: neither 300kg drop fits
+    assert services.plan_delivery_runs() == {"runs_created": 0, "dispatches_planned": 0, "unplanned": 2}
+    Dispatch.objects.create(dropoff_address="Ikeja", estimated_delivery_time=eta, load_kg=150)
+    assert services.plan_delivery_runs()["dispatches_planned"] == 1
+
+    loads = DeliveryRun.objects.filter(vehicle=van).values_list("total_load_kg", flat=True)
+    assert sum(loads) <= Decimal("800")
+    manual.refresh_from_db()
+    assert manual.assigned_agent_id == dispatcher_agent.id and manual.delivery_run_id is None
+    assert manual.status_updates.filter(status="ASSIGNED").count() == 0
+
+
+@pytest.mark.django_db
+def test_plan_endpoint(client):
+    admin = User.objects.create_superuser(username="admin_runs", password="p", email="admin_runs@test.com")
+    client.force_login(admin)
+    _vehicle("van", "VAN")
+    Dispatch.objects.create(dropoff_address="Lekki")
+    r = client.post("/api/logistics/runs/plan/", {}, format="json")
+    assert r.status_code == status.HTTP_201_CREATED
+    r_list = client.get("/api/logistics/runs/")
+    assert r_list.json()["data"]["results"][0]["stops_count"] == 1
+    assert client.post("/api/logistics/runs/plan/", {"window_hours": 99}, format="json").status_code == 400
@@ -0,0 +1,107 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from farmers.models import Farmer, SupplyRecord
+from logistics import services
+from logistics.models import Dispatch
+from orders.models import Order
+
+User = get_user_model()
+
+
+def _sources(count, customer, farmer):
+    for i in range(count):
+        Order.objects.create(user=customer, total_price=10, status="PROCESSING", address=f"{i} Allen Avenue, Ikeja")
+        SupplyRecord.objects.create(farmer=farmer, quantity=Decimal("2.5"), unit="ton", status="APPROVED")
+
+
+@pytest.fixture
+def customer():
+    return User.objects.create_user(email="builder@example.com", password="p", full_name="Builder")
+
+
+@pytest.fixture
+def farmer():
+    return Farmer.objects.create(contact_name="Supplier", address="Km 4 Farm Road", lga="Epe", state="Lagos")
+
+
+@pytest.mark.django_db
+def test_builder_creates_one_dispatch_per_eligible_source(customer, farmer):
+    _sources(3, customer, farmer)
+    Order.objects.create(user=customer, total_price=10, status="PENDING", address="Not yet")
+    SupplyRecord.objects.create(farmer=farmer, quantity=1, unit="kg", status="PENDING")
+    already = Order.objects.create(user=customer, total_price=10, status="PROCESSING", address="Done")
+    services.create_dispatch_from_order(already)
+
+    assert services.build_pending_dispatches() == {"orders": 3, "supplies": 3}
+    assert services.build_pending_dispatches() == {"orders": 0, "supplies": 0}
+
+    order_dispatch = Dispatch.objects.filter(order__address="0 Allen Avenue, Ikeja").get()
+    assert order_dispatch.dropoff_address == "0 Allen Avenue, Ikeja"
+    supply_dispatch = Dispatch.objects.filter(supply_record__isnull=False).first()
+    assert supply_dispatch.pickup_address == "Km 4 Farm Road, Epe"
+    assert supply_dispatch.load_kg == Decimal("2500")
+
+    codes = list(Dispatch.objects.values_list("reference_code", flat=True))
+    assert len(codes) == len(set(codes)) == 7
+    assert sorted(c for c in codes if c.startswith("ORD-")) == [f"ORD-{n:08d}" for n in range(1, 5)]
+
+
+@pytest.mark.django_db
+def test_builder_uses_constant_queries(customer, farmer):
+    # the first code for a prefix also creates its counter row
+    services.reserve_reference_codes("ORD", 1)
+    services.reserve_reference_codes("SUP", 1)
+    _sources(2, customer, farmer)
+    with CaptureQueriesContext(connection) as small:
+        services.build_pending_dispatches()
+
+    # stays within one SQLite insert batch; Postgres batches by batch_size only
+    _sources(20, customer, farmer)
+    with CaptureQueriesContext(connection) as large:
+        result = services.build_pending_dispatches()
+
+    assert result == {"orders": 20, "supplies": 20}
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+@pytest.mark.django_db
+def test_reference_codes_are_sequential_per_prefix():
+    first = services.reserve_reference_codes("ORD", 3)
+    assert first == ["ORD-00000001", "ORD-00000002", "ORD-00000003"]
+    assert services.generate_reference_code("ORD") == "ORD-00000004"
+    assert services.generate_reference_code("SUP") == "SUP-00000001"
+    assert services.reserve_reference_codes("ORD", 0) == []
+
+
+@pytest.mark.django_db
+def test_reference_codes_are_unique_when_set():
+    Dispatch.objects.create(reference_code="ORD-3F9A7C")
+    Dispatch.objects.create()
+    Dispatch.objects.create()
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Dispatch.objects.create(reference_code="ORD-3F9A7C")
+    # a sequential code can never take the shape of a legacy six-character one
+    assert len(services.generate_reference_code("ORD").split("-")[1]) == 8
+
+
+@pytest.mark.django_db
+def test_build_endpoint_and_command(client, customer, farmer):
+    _sources(1, customer, farmer)
+    admin = User.objects.create_superuser(username="build_admin", password="p", email="build_admin@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+
+    r = client.post("/api/logistics/dispatches/build/")
+    assert r.status_code == status.HTTP_201_CREATED
+    assert r.json()["data"] == {"orders": 1, "supplies": 1}
+
+    _sources(1, customer, farmer)
+    call_command("build_dispatches")
+    assert Dispatch.objects.count() == 4
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from logistics import services
+from logistics.models import DeliveryDurationStat, DeliveryEtaRefresh, Dispatch, DispatchStatusUpdate, LogisticsAgent, Vehicle
+
+User = get_user_model()
+
+# A Monday morning, inside the 06:00-09:00 band
+MORNING = timezone.make_aware(datetime(2026, 10, 12, 8, 10))
+
+
+@pytest.fixture(autouse=True)
+def fresh_eta_table():
+    services.invalidate_eta_cache()
+    yield
+    services.invalidate_eta_cache()
+
+
+@pytest.fixture
+def van():
+    agent = LogisticsAgent.objects.create(full_name="Van Driver")
+    return Vehicle.objects.create(vehicle_type="VAN", registration_number="ETA-VAN", driver=agent)
+
+
+def _delivered(vehicle, dropoff, minutes, assigned_at=MORNING, pickup_after=20):
+    dispatch = Dispatch.objects.create(
+        dropoff_address=dropoff, assigned_vehicle=vehicle, assigned_agent=vehicle.driver, status="DELIVERED"
+    )
+    for state, offset in (("ASSIGNED", 0), ("PICKED_UP", pickup_after), ("DELIVERED", minutes)):
+        DispatchStatusUpdate.objects.create(
+            dispatch=dispatch, status=state, occurred_at=assigned_at + timedelta(minutes=offset)
+        )
+    DispatchStatusUpdate.objects.filter(dispatch=dispatch).update(created_at=F("occurred_at"))
+    return dispatch
+
+
+def _refresh(django_capture_on_commit_callbacks, **kwargs):
+    with django_capture_on_commit_callbacks(execute=True):
+        return services.refresh_delivery_eta_model(**kwargs)
+
+
+@pytest.mark.django_db
+def test_refresh_builds_stats_and_estimates_with_fallbacks(van, django_capture_on_commit_callbacks):
+    for _ in range(5):
+        _delivered(van, "1 Herbert Macaulay Way, Yaba", 60)
+        _delivered(van, "2 Allen Avenue, Ikeja", 120)
+    # Implausibly long and never-assigned deliveries are ignored
+    _delivered(van, "3 Road, Yaba", 60 * 24 * 10)
+    Dispatch.objects.create(dropoff_address="4 Road, Yaba", status="DELIVERED")
+
+    result = _refresh(django_capture_on_commit_callbacks)
+    assert (result["dispatches"], result["keys"]) == (10, 2)
+    stat = DeliveryDurationStat.objects.get(zone="yaba")
+    assert (stat.vehicle_type, stat.hour_band, stat.sample_count) == ("VAN", 2, 5)
+
+    at = MORNING + timedelta(days=7)
+    assert services.eta_updates("yaba", "van", at) == {
+        "estimated_pickup_time": at + timedelta(minutes=20),
+        "estimated_delivery_time": at + timedelta(minutes=60),
+    }
+    # Unknown zone and another time of day fall back to the VAN average
+    evening = at + timedelta(hours=10)
+    assert services.eta_updates("lekki", "VAN", evening)["estimated_delivery_time"] == evening + timedelta(minutes=90)
+    # Estimates already set are kept
+    assert services.eta_updates("yaba", "VAN", at, estimated_pickup_time=at, estimated_delivery_time=at) == {}
+
+
+@pytest.mark.django_db
+def test_refresh_is_incremental(van, django_capture_on_commit_callbacks):
+    for _ in range(5):
+        _delivered(van, "Shop, Yaba", 60)
+    assert _refresh(django_capture_on_commit_callbacks)["dispatches"] == 5
+    assert _refresh(django_capture_on_commit_callbacks)["dispatches"] == 0
+
+    # The window narrows the dispatches in WHERE before the timeline is grouped
+    with CaptureQueriesContext(connection) as ctx:
+        assert list(services.delivered_dispatch_durations(since=timezone.now(), until=timezone.now())) == []
+    sql = ctx.captured_queries[-1]["sql"]
+    assert "EXISTS" in sql and sql.index("EXISTS") < sql.index("GROUP BY")
+
+    # Deliveries logged after the last run are added to the existing totals
+    late = [_delivered(van, "Shop, Yaba", 120, assigned_at=MORNING - timedelta(days=1)) for _ in range(5)]
+    DispatchStatusUpdate.objects.filter(dispatch__in=late).update(created_at=timezone.now() + timedelta(hours=2))
+    result = services.refresh_delivery_eta_model(now=timezone.now() + timedelta(hours=3))
+    assert result["dispatches"] == 5
+    stat = DeliveryDurationStat.objects.get(zone="yaba")
+    assert stat.sample_count == 10
+    assert stat.delivery_seconds_total == 5 * 3600 + 5 * 7200
+
+    # A full rebuild only counts what is already settled; `late` was logged "in two hours"
+    call_command("refresh_delivery_eta", "--full")
+    assert DeliveryDurationStat.objects.get(zone="yaba").sample_count == 5
+    assert DeliveryEtaRefresh.objects.first().full_rebuild
+
+
+@pytest.mark.django_db
+def test_assignment_fills_eta(client, van, django_capture_on_commit_callbacks):
+    for _ in range(5):
+        _delivered(van, "Shop, Yaba", 60)
+    _refresh(django_capture_on_commit_callbacks)
+
+    admin = User.objects.create_superuser(username="eta_admin", password="p", email="eta_admin@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+
+    manual = Dispatch.objects.create(dropoff_address="Block 4, Yaba")
+    before = timezone.now()
+    r = client.post(
+        f"/api/logistics/dispatches/{manual.id}/assign/",
+        {"assigned_agent_id": str(van.driver_id), "assigned_vehicle_id": str(van.id)},
+        format="json",
+    )
+    assert r.status_code == status.HTTP_200_OK
+    manual.refresh_from_db()
+    assert before + timedelta(minutes=60) <= manual.estimated_delivery_time <= timezone.now() + timedelta(minutes=60)
+
+    promised = timezone.now() + timedelta(days=1)
+    auto = Dispatch.objects.create(dropoff_address="Block 5, Yaba")
+    preset = Dispatch.objects.create(dropoff_address="Block 6, Yaba", estimated_delivery_time=promised)
+    assert services.auto_assign_dispatches()["assigned"] == 2
+    auto.refresh_from_db()
+    preset.refresh_from_db()
+    assert auto.estimated_pickup_time - auto.updated_at == timedelta(minutes=20)
+    assert auto.estimated_delivery_time - auto.updated_at == timedelta(minutes=60)
+    assert preset.estimated_delivery_time == promised
+    assert preset.estimated_pickup_time == preset.updated_at + timedelta(minutes=20)
@@ -0,0 +1,158 @@
+import time
+
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from logistics import services
+from logistics.models import AgentLocationPing, LogisticsAgent
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def ping_buffer(settings, monkeypatch):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "agent-pings"}}
+    # flush explicitly in these tests rather than from the background thread
+    monkeypatch.setattr(services.location_ping_buffer, "background", False)
+    services.location_ping_buffer.clear()
+    yield services.location_ping_buffer
+    services.location_ping_buffer.clear()
+
+
+def _verified(user):
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    return user
+
+
+def _agent_client(client, name="Pinger"):
+    user = _verified(User.objects.create_user(email=f"{name.lower()}@example.com", password="p", full_name=name))
+    agent = LogisticsAgent.objects.create(user=user, full_name=name)
+    client.force_login(user)
+    return agent
+
+
+def _fixes(count, start, lat=6.5):
+    return [
+        {"latitude": lat + i * 0.001, "longitude": 3.3, "accuracy_m": 5, "recorded_at": (start + timedelta(seconds=5 * i)).isoformat()}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_ping_batches_are_buffered_and_bulk_inserted(client, ping_buffer):
+    agent = _agent_client(client)
+    start = timezone.now() - timedelta(minutes=5)
+
+    with CaptureQueriesContext(connection) as ctx:
+        for batch in range(10):
+            r = client.post(
+                "/api/logistics/agents/pings/", {"fixes": _fixes(6, start + timedelta(seconds=30 * batch))}, format="json"
+            )
+            assert r.status_code == status.HTTP_202_ACCEPTED
+    assert not any("logistics_agentlocationping" in q["sql"] for q in ctx.captured_queries)
+    assert AgentLocationPing.objects.count() == 0
+    assert len(ping_buffer) == 60
+
+    with CaptureQueriesContext(connection) as flush_ctx:
+        assert services.flush_location_pings() == 60
+    assert len(flush_ctx.captured_queries) == 1
+    assert AgentLocationPing.objects.filter(agent=agent).count() == 60
+
+
+@pytest.mark.django_db
+def test_buffer_flushes_on_size():
+    agent = LogisticsAgent.objects.create(full_name="Busy")
+    buffer = services.LocationPingBuffer(flush_size=10, flush_seconds=3600)
+    rows = [
+        AgentLocationPing(agent=agent, latitude=1, longitude=1, recorded_at=timezone.now()) for _ in range(12)
+    ]
+    buffer.add(rows[:6])
+    assert AgentLocationPing.objects.count() == 0
+    buffer.add(rows[6:])
+    assert AgentLocationPing.objects.count() == 12
+    assert len(buffer) == 0
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_rows_for_the_next_one(monkeypatch):
+    agent = LogisticsAgent.objects.create(full_name="Flaky")
+    buffer = services.LocationPingBuffer(flush_size=100, flush_seconds=3600)
+    buffer.add([AgentLocationPing(agent=agent, latitude=1, longitude=1, recorded_at=timezone.now()) for _ in range(3)])
+
+    def broken(*args, **kwargs):
+        raise DatabaseError("database is down")
+
+    monkeypatch.setattr(AgentLocationPing.objects, "bulk_create", broken)
+    assert buffer.flush() == 0
+    assert len(buffer) == 3
+    monkeypatch.undo()
+    assert buffer.flush() == 3
+    assert AgentLocationPing.objects.count() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_idle_buffer_is_flushed_in_the_background():
+    agent = LogisticsAgent.objects.create(full_name="Idle")
+    buffer = services.LocationPingBuffer(flush_size=100, flush_seconds=0.2, background=True)
+    buffer.add([AgentLocationPing(agent=agent, latitude=1, longitude=1, recorded_at=timezone.now()) for _ in range(3)])
+    assert len(buffer) == 3
+
+    deadline = time.monotonic() + 10
+    while not AgentLocationPing.objects.filter(agent=agent).exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert AgentLocationPing.objects.filter(agent=agent).count() == 3
+    assert len(buffer) == 0
+
+
+@pytest.mark.django_db
+def test_latest_position_is_cached_and_never_moves_backwards(client):
+    agent = _agent_client(client)
+    now = timezone.now()
+    client.post("/api/logistics/agents/pings/", {"fixes": _fixes(3, now - timedelta(seconds=30), lat=7.0)}, format="json")
+    # a late-arriving older batch must not overwrite the newer fix
+    client.post("/api/logistics/agents/pings/", {"fixes": _fixes(3, now - timedelta(hours=1), lat=9.0)}, format="json")
+
+    admin = _verified(User.objects.create_superuser(username="board", password="p", email="board@test.com"))
+    client.force_login(admin)
+    other = LogisticsAgent.objects.create(full_name="Silent")
+    with CaptureQueriesContext(connection) as ctx:
+        r = client.get("/api/logistics/agents/positions/", {"ids": f"{agent.id},{other.id}"})
+    assert r.status_code == status.HTTP_200_OK
+    data = r.json()["data"]
+    assert len(data) == 1
+    assert data[0]["agent_id"] == str(agent.id)
+    assert data[0]["latitude"] == pytest.approx(7.002)
+    assert not any("logistics_agentlocationping" in q["sql"] for q in ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_pings_require_an_agent_and_valid_fixes(client):
+    user = _verified(User.objects.create_user(email="customer@example.com", password="p", full_name="Customer"))
+    client.force_login(user)
+    r = client.post("/api/logistics/agents/pings/", {"fixes": _fixes(1, timezone.now())}, format="json")
+    assert r.status_code == status.HTTP_403_FORBIDDEN
+
+    _agent_client(client, name="Bad")
+    r_bad = client.post(
+        "/api/logistics/agents/pings/",
+        {"fixes": [{"latitude": 120, "longitude": 3.3, "recorded_at": timezone.now().isoformat()}]},
+        format="json",
+    )
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_prune_command_removes_old_pings():
+    agent = LogisticsAgent.objects.create(full_name="Old")
+    now = timezone.now()
+    AgentLocationPing.objects.create(agent=agent, latitude=1, longitude=1, recorded_at=now, received_at=now - timedelta(days=40))
+    AgentLocationPing.objects.create(agent=agent, latitude=1, longitude=1, recorded_at=now, received_at=now)
+    call_command("prune_location_pings", days=30)
+    assert AgentLocationPing.objects.count() == 1
@@ -0,0 +1,96 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+
+from logistics import services
+from logistics.models import Dispatch
+from notifications.models import Notification, NotificationStatus, NotificationTemplate, UserNotification
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin():
+    user = User.objects.create_superuser(username="sla_admin", password="p", email="sla_admin@test.com")
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    return user
+
+
+@pytest.fixture
+def dispatches():
+    now = timezone.now()
+    make = lambda code, state, minutes: Dispatch.objects.create(
+        reference_code=code, status=state, estimated_delivery_time=now + timedelta(minutes=minutes)
+    )
+    return {
+        "late": make("LATE", "IN_TRANSIT", -90),
+        "later": make("LATER", "ASSIGNED", -10),
+        "soon": make("SOON", "PICKED_UP", 15),
+        "fine": make("FINE", "PENDING", 240),
+        "done": make("DONE", "DELIVERED", -300),
+    }
+
+
+@pytest.mark.django_db
+def test_scan_alerts_once_per_newly_overdue_dispatch(admin, dispatches):
+    result = services.scan_dispatch_sla(at_risk_minutes=30)
+    assert result == {"overdue": 2, "at_risk": 1, "newly_overdue": 2, "alerted": True}
+    alert = Notification.objects.get(event="dispatch_sla_breach")
+    assert [d["reference_code"] for d in alert.payload["dispatches"]] == ["LATE", "LATER"]
+    assert alert.payload["dispatches"][0]["minutes_late"] >= 89
+
+    again = services.scan_dispatch_sla(at_risk_minutes=30)
+    assert (again["overdue"], again["newly_overdue"], again["alerted"]) == (2, 0, False)
+    assert Notification.objects.filter(event="dispatch_sla_breach").count() == 1
+
+    Dispatch.objects.filter(pk=dispatches["soon"].pk).update(estimated_delivery_time=timezone.now() - timedelta(minutes=1))
+    call_command("scan_dispatch_sla")
+    alerts = Notification.objects.filter(event="dispatch_sla_breach")
+    assert alerts.count() == 2
+    assert alerts.latest("created_at").payload["newly_overdue_count"] == 1
+
+
+@pytest.mark.django_db
+def test_seeded_template_renders_the_alert(admin, dispatches):
+    assert NotificationTemplate.objects.filter(event="dispatch_sla_breach", is_active=True).count() == 2
+    services.scan_dispatch_sla(at_risk_minutes=30)
+    sent = UserNotification.objects.get(user=admin, channel="in_app", notification__event="dispatch_sla_breach")
+    assert sent.status == NotificationStatus.SENT
+    assert Dispatch.objects.filter(sla_alerted_at__isnull=False).count() == 2
+
+
+@pytest.mark.django_db
+def test_undelivered_alert_is_retried_on_the_next_scan(dispatches, django_capture_on_commit_callbacks):
+    # no staff to alert: nothing is stamped
+    assert services.scan_dispatch_sla(at_risk_minutes=30)["alerted"] is False
+    assert not Dispatch.objects.filter(sla_alerted_at__isnull=False).exists()
+
+    # staff but no template for the event: every channel fails, nothing is stamped
+    User.objects.create_user(email="sla_staff@test.com", password="p", full_name="Staff", is_staff=True)
+    with django_capture_on_commit_callbacks(execute=True):
+        NotificationTemplate.objects.filter(event="dispatch_sla_breach").delete()
+    assert services.scan_dispatch_sla(at_risk_minutes=30)["alerted"] is False
+    assert not Dispatch.objects.filter(sla_alerted_at__isnull=False).exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        NotificationTemplate.objects.create(event="dispatch_sla_breach", channel="in_app", body_text="{{ overdue_count }} late")
+    result = services.scan_dispatch_sla(at_risk_minutes=30)
+    assert (result["newly_overdue"], result["alerted"]) == (2, True)
+    assert Dispatch.objects.filter(sla_alerted_at__isnull=False).count() == 2
+
+
+@pytest.mark.django_db
+def test_overdue_endpoint_lists_open_late_dispatches(client, admin, dispatches):
+    client.force_login(admin)
+    r = client.get("/api/logistics/dispatches/overdue/")
+    assert r.status_code == status.HTTP_200_OK
+    assert [row["reference_code"] for row in r.json()["data"]["results"]] == ["LATE", "LATER"]
+
+    r_soon = client.get("/api/logistics/dispatches/overdue/", {"within": "30"})
+    assert [row["reference_code"] for row in r_soon.json()["data"]["results"]] == ["LATE", "LATER", "SOON"]
+
+    assert client.get("/api/logistics/dispatches/overdue/", {"within": "x"}).status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,147 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+
+from core import pubsub
+from logistics import services
+from logistics.models import Dispatch, LogisticsAgent
+from orders.models import Order
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def in_process_broker(settings):
+    settings.STATUS_STREAM_BROKER_URL = ""
+    pubsub.reset_broker()
+    yield
+    pubsub.reset_broker()
+
+
+def _user(email, **kwargs):
+    user = User.objects.create_user(email=email, password="p", full_name=email.split("@")[0], **kwargs)
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    return user
+
+
+@pytest.fixture
+def delivery():
+    customer = _user("stream_customer@example.com")
+    order = Order.objects.create(user=customer, total_price=100, address="Yaba")
+    agent_user = _user("stream_agent@example.com")
+    agent = LogisticsAgent.objects.create(user=agent_user, full_name="Stream Agent")
+    dispatch = Dispatch.objects.create(order=order, reference_code="STREAM-1", assigned_agent=agent, status="ASSIGNED")
+    return customer, agent_user, order, dispatch
+
+
+def _parse(chunk):
+    text = chunk.decode() if isinstance(chunk, bytes) else chunk
+    fields = dict(line.split(": ", 1) for line in text.strip().splitlines() if ": " in line and not line.startswith(":"))
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sse_stream_pushes_dispatch_status_changes(delivery):
+    customer, agent_user, order, dispatch = delivery
+
+    async def watch():
+        client = AsyncClient()
+        await client.aforce_login(customer)
+        response = await client.get(f"/api/logistics/dispatches/{dispatch.id}/stream/")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/event-stream"
+        chunks = response.streaming_content.__aiter__()
+        assert (await chunks.__anext__()).startswith(b"retry:")
+        snapshot = _parse(await chunks.__anext__())
+        assert snapshot["event"] == "snapshot"
+        assert snapshot["data"]["status"] == "ASSIGNED"
+
+        await sync_to_async(services.update_dispatch_status)(dispatch.id, "PICKED_UP", note="collected", updated_by=agent_user)
+        event = _parse(await chunks.__anext__())
+        await chunks.aclose()
+        return event
+
+    event = async_to_sync(watch)()
+    assert event["event"] == "dispatch.status"
+    assert event["id"] == "1"
+    assert event["data"]["status"] == "PICKED_UP"
+    assert event["data"]["note"] == "collected"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sse_resumes_from_last_event_id(delivery):
+    customer, agent_user, order, dispatch = delivery
+    services.update_dispatch_status(dispatch.id, "PICKED_UP", updated_by=agent_user)
+    services.update_dispatch_status(dispatch.id, "IN_TRANSIT", updated_by=agent_user)
+
+    async def reconnect():
+        client = AsyncClient()
+        await client.aforce_login(customer)
+        response = await client.get(f"/api/logistics/dispatches/{dispatch.id}/stream/", headers={"Last-Event-ID": "1"})
+        chunks = response.streaming_content.__aiter__()
+        await chunks.__anext__()
+        await chunks.__anext__()
+        replayed = _parse(await chunks.__anext__())
+        await chunks.aclose()
+        return replayed
+
+    replayed = async_to_sync(reconnect)()
+    assert replayed["id"] == "2"
+    assert replayed["data"]["status"] == "IN_TRANSIT"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_long_poll_returns_history_and_times_out_empty(client, delivery):
+    customer, agent_user, order, dispatch = delivery
+    client.force_login(customer)
+    url = f"/api/logistics/dispatches/{dispatch.id}/stream/"
+
+    empty = client.get(url, {"mode": "poll", "timeout": "0.05"})
+    assert empty.status_code == 200
+    assert empty.json()["data"]["events"] == []
+    assert empty.json()["data"]["last_event_id"] == 0
+
+    services.confirm_delivery(dispatch.id, receiver_name="Ada", updated_by=agent_user)
+    r = client.get(url, {"mode": "poll", "after": "0", "timeout": "0.05"})
+    data = r.json()["data"]
+    assert [e["status"] for e in data["events"]] == ["DELIVERED"]
+    assert data["last_event_id"] == 1
+
+    # the order channel sees its dispatch too
+    order_poll = client.get(f"/api/orders/{order.id}/stream/", {"mode": "poll", "after": "0", "timeout": "0.05"})
+    assert order_poll.json()["data"]["events"][0]["event"] == "dispatch.status"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_order_status_transition_is_published(client, delivery):
+    customer, agent_user, order, dispatch = delivery
+    admin = User.objects.create_superuser(username="stream_admin", password="p", email="stream_admin@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+    client.patch(f"/api/orders/{order.id}/update_status/", {"status": "OUT_FOR_DELIVERY"}, format="json")
+
+    client.force_login(customer)
+    r = client.get(f"/api/orders/{order.id}/stream/", {"mode": "poll", "after": "0", "timeout": "0.05"})
+    event = r.json()["data"]["events"][0]
+    assert (event["event"], event["old_status"], event["status"]) == ("order.status", "PENDING", "OUT_FOR_DELIVERY")
+
+
+@pytest.mark.django_db
+def test_stream_access_is_limited_to_participants(client, delivery):
+    customer, agent_user, order, dispatch = delivery
+    url = f"/api/logistics/dispatches/{dispatch.id}/stream/"
+    assert client.get(url, {"mode": "poll", "timeout": "0"}).status_code == 401
+
+    client.force_login(_user("stranger@example.com"))
+    assert client.get(url, {"mode": "poll", "timeout": "0"}).status_code == 403
+    assert client.get(f"/api/orders/{order.id}/stream/", {"mode": "poll", "timeout": "0"}).status_code == 403
+
+    client.force_login(agent_user)
+    assert client.get(url, {"mode": "poll", "timeout": "0"}).status_code == 200
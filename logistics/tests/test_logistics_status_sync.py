@@ -0,0 +1,109 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from logistics import services
+from logistics.models import Dispatch, DispatchStatusUpdate, LogisticsAgent
+
+User = get_user_model()
+
+
+@pytest.fixture
+def agent_client(client):
+    user = User.objects.create_user(email="offline@example.com", password="p", full_name="Offline Agent")
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    agent = LogisticsAgent.objects.create(user=user, full_name="Offline Agent")
+    client.force_login(user)
+    return client, agent
+
+
+def _events(dispatch, start, statuses, prefix):
+    return [
+        {
+            "client_event_id": f"{prefix}-{i}",
+            "dispatch_id": str(dispatch.id),
+            "status": value,
+            "occurred_at": (start + timedelta(minutes=10 * i)).isoformat(),
+            "location": f"stop {i}",
+        }
+        for i, value in enumerate(statuses)
+    ]
+
+
+@pytest.mark.django_db
+def test_sync_applies_events_in_time_order_and_is_idempotent(agent_client):
+    client, agent = agent_client
+    start = timezone.now() - timedelta(hours=6)
+    first = Dispatch.objects.create(reference_code="OFF-1", assigned_agent=agent, status="ASSIGNED")
+    second = Dispatch.objects.create(reference_code="OFF-2", assigned_agent=agent, status="ASSIGNED")
+    events = _events(first, start, ["PICKED_UP", "IN_TRANSIT", "DELIVERED"], "a") + _events(
+        second, start, ["PICKED_UP", "IN_TRANSIT"], "b"
+    )
+    # queued out of order, with a retried duplicate
+    payload = {"events": list(reversed(events)) + [events[0]]}
+
+    r = client.post("/api/logistics/dispatches/sync/", payload, format="json")
+    assert r.status_code == status.HTTP_200_OK
+    data = r.json()["data"]
+    assert (data["applied"], data["stale"], data["duplicates"]) == (5, 0, 1)
+    states = {row["id"]: row["status"] for row in data["dispatches"]}
+    assert states == {str(first.id): "DELIVERED", str(second.id): "IN_TRANSIT"}
+
+    first.refresh_from_db()
+    assert first.delivery_time is not None
+    assert first.pickup_time < first.delivery_time
+    timeline = list(first.status_updates.values_list("status", flat=True))
+    assert timeline == ["DELIVERED", "IN_TRANSIT", "PICKED_UP"]
+
+    again = client.post("/api/logistics/dispatches/sync/", payload, format="json").json()["data"]
+    assert (again["applied"], again["duplicates"]) == (0, 6)
+    assert DispatchStatusUpdate.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_older_events_do_not_override_newer_server_state(agent_client):
+    client, agent = agent_client
+    dispatch = Dispatch.objects.create(reference_code="OFF-3", assigned_agent=agent, status="ASSIGNED")
+    services.update_dispatch_status(dispatch.id, "FAILED", note="customer absent")
+
+    old = _events(dispatch, timezone.now() - timedelta(hours=2), ["PICKED_UP"], "late")
+    data = client.post("/api/logistics/dispatches/sync/", {"events": old}, format="json").json()["data"]
+    assert (data["applied"], data["stale"]) == (0, 1)
+    assert data["dispatches"][0]["status"] == "FAILED"
+    assert dispatch.status_updates.filter(client_event_id="late-0").exists()
+
+
+@pytest.mark.django_db
+def test_sync_rejects_dispatches_of_other_agents(agent_client):
+    client, agent = agent_client
+    other = LogisticsAgent.objects.create(full_name="Someone Else")
+    theirs = Dispatch.objects.create(reference_code="OFF-4", assigned_agent=other, status="ASSIGNED")
+    events = _events(theirs, timezone.now(), ["PICKED_UP"], "x")
+
+    data = client.post("/api/logistics/dispatches/sync/", {"events": events}, format="json").json()["data"]
+    assert data["applied"] == 0
+    assert data["rejected"][0]["client_event_id"] == "x-0"
+    assert data["dispatches"] == []
+    theirs.refresh_from_db()
+    assert theirs.status == "ASSIGNED"
+
+
+@pytest.mark.django_db
+def test_a_days_queue_syncs_with_constant_queries(agent_client):
+    client, agent = agent_client
+    start = timezone.now() - timedelta(hours=12)
+    dispatches = [Dispatch.objects.create(reference_code=f"DAY-{i}", assigned_agent=agent) for i in range(40)]
+    events = []
+    for i, dispatch in enumerate(dispatches):
+        events += _events(dispatch, start + timedelta(minutes=i), ["PICKED_UP", "IN_TRANSIT", "DELIVERED"], f"d{i}")
+
+    with CaptureQueriesContext(connection) as ctx:
+        r = client.post("/api/logistics/dispatches/sync/", {"events": events}, format="json")
+    assert r.json()["data"]["applied"] == 120
+    assert len(ctx.captured_queries) < 20
+    assert Dispatch.objects.filter(status="DELIVERED").count() == 40
@@ -0,0 +1,139 @@
+import time
+from datetime import datetime, time as dtime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from logistics import services
+from logistics.models import SurgeWindow, VehicleTariff, ZoneTariff
+
+User = get_user_model()
+
+# A Monday at 08:30 local time
+RUSH_HOUR = timezone.make_aware(datetime(2026, 10, 19, 8, 30))
+NIGHT = timezone.make_aware(datetime(2026, 10, 19, 23, 30))
+
+
+@pytest.fixture(autouse=True)
+def fresh_tariffs():
+    services.invalidate_tariff_cache()
+    yield
+    services.invalidate_tariff_cache()
+
+
+@pytest.fixture
+def tariffs():
+    ZoneTariff.objects.create(origin_zone="Ikeja", destination_zone="Yaba", base_fare="1000.00")
+    ZoneTariff.objects.create(origin_zone="yaba", destination_zone="ikeja", base_fare="1200.00")
+    ZoneTariff.objects.create(origin_zone="ikeja", destination_zone="lekki", base_fare="2000.00")
+    VehicleTariff.objects.create(vehicle_type="VAN", multiplier="2.5", minimum_fare="0")
+    VehicleTariff.objects.create(vehicle_type="KEKE", multiplier="0.5", minimum_fare="800.00")
+    SurgeWindow.objects.create(
+        name="Morning rush", zone="Ikeja", weekdays=[0, 1, 2, 3, 4],
+        start_time=dtime(7, 0), end_time=dtime(10, 0), multiplier="1.5",
+    )
+    SurgeWindow.objects.create(
+        name="Late night", zone="", start_time=dtime(22, 0), end_time=dtime(5, 0), multiplier="1.2",
+    )
+
+
+def test_calculate_logistics_cost_is_case_insensitive_and_rejects_unknown_types():
+    assert services.calculate_logistics_cost(2, "keke") == 160
+    assert services.calculate_logistics_cost(2, "Keke") == 160
+    # every VEHICLE_TYPE_CHOICES value has a rate
+    assert services.calculate_logistics_cost(2, "OTHER") == 240
+    with pytest.raises(ValueError):
+        services.calculate_logistics_cost(2, "HELICOPTER")
+
+
+@pytest.mark.django_db
+def test_quote_many_applies_matrix_multipliers_minimums_and_surge(tariffs):
+    quotes = services.quote_many(
+        [
+            ("Ikeja", "Yaba", "VAN"),
+            ("ikeja", "yaba", "keke"),
+            ("Yaba", "Ikeja", "MOTORCYCLE"),
+            ("Lekki", "Ikeja", "MOTORCYCLE"),
+            ("Ikeja", "Ajah", "VAN"),
+        ],
+        at=RUSH_HOUR,
+    )
+    fares = [q["fare"] for q in quotes]
+    # 1000 x 2.5 x 1.5 surge
+    assert fares[0] == Decimal("3750.00")
+    # 1000 x 0.5 x 1.5 = 750, floored at the Keke minimum
+    assert fares[1] == Decimal("800.00")
+    assert quotes[1]["vehicle_type"] == "KEKE"
+    # explicit reverse tariff, no surge outside Ikeja
+    assert fares[2] == Decimal("1200.00")
+    # missing direction falls back to the reverse pair
+    assert fares[3] == Decimal("2000.00")
+    # unknown route
+    assert fares[4] is None
+
+    night = services.quote_many([("Yaba", "Ikeja", "MOTORCYCLE")], at=NIGHT)
+    assert night[0]["fare"] == Decimal("1440.00")
+
+    with pytest.raises(ValueError):
+        services.quote_many([("ikeja", "yaba", "HELICOPTER")])
+
+
+@pytest.mark.django_db
+def test_table_is_cached_and_invalidated_on_tariff_changes(tariffs, django_capture_on_commit_callbacks):
+    services.quote_many([("ikeja", "yaba", "VAN")], at=NIGHT)
+    with CaptureQueriesContext(connection) as ctx:
+        services.quote_many([("ikeja", "yaba", "VAN")], at=NIGHT)
+    assert len(ctx.captured_queries) == 0
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        ZoneTariff.objects.filter(origin_zone="ikeja", destination_zone="yaba").get().delete()
+        ZoneTariff.objects.create(origin_zone="ikeja", destination_zone="yaba", base_fare="500.00")
+        # nothing is invalidated before the edit commits
+        assert services.quote_many([("ikeja", "yaba", "VAN")], at=NIGHT)[0]["fare"] == Decimal("3000.00")
+    assert len(callbacks) == 2
+    assert services.quote_many([("ikeja", "yaba", "VAN")], at=NIGHT)[0]["fare"] == Decimal("1500.00")
+
+
+@pytest.mark.django_db
+def test_warm_batch_quote_is_fast(tariffs):
+    zones = ["ikeja", "yaba", "lekki"]
+    combos = [(o, d, v) for o in zones for d in zones for v in ("MOTORCYCLE", "VAN", "TRUCK", "KEKE")]
+    services.quote_many(combos, at=RUSH_HOUR)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        services.quote_many(combos, at=RUSH_HOUR)
+    per_call = (time.perf_counter() - start) / 100
+    # 36 options per call; generous bound so slow CI boxes do not flake
+    assert per_call < 0.005
+
+
+@pytest.mark.django_db
+def test_quote_endpoint_returns_every_option(client, tariffs):
+    user = User.objects.create_user(email="quote@example.com", password="p", full_name="Quote")
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    client.force_login(user)
+
+    r = client.post(
+        "/api/logistics/quotes/",
+        {"origins": ["Ikeja"], "destinations": ["Yaba", "Lekki"], "at": RUSH_HOUR.isoformat()},
+        format="json",
+    )
+    assert r.status_code == status.HTTP_200_OK
+    data = r.json()["data"]
+    assert len(data) == 2 * 5
+    van = next(q for q in data if q["destination_zone"] == "yaba" and q["vehicle_type"] == "VAN")
+    assert van["fare"] == "3750.00"
+
+    r_bad = client.post(
+        "/api/logistics/quotes/",
+        {"origins": ["Ikeja"], "destinations": ["Yaba"], "vehicle_types": ["HELICOPTER"]},
+        format="json",
+    )
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,79 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from logistics.models import Dispatch, DispatchStatusUpdate, LogisticsAgent, Vehicle
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_client(client):
+    admin = User.objects.create_superuser(username="admin_timeline", password="p", email="admin_timeline@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+    return client
+
+
+def _dispatch_with_history(index, updates):
+    agent = LogisticsAgent.objects.create(full_name=f"Agent {index}")
+    vehicle = Vehicle.objects.create(vehicle_type="VAN", registration_number=f"TL-{index}", driver=agent)
+    dispatch = Dispatch.objects.create(
+        reference_code=f"TL-{index}", dropoff_address="Yaba", assigned_agent=agent, assigned_vehicle=vehicle
+    )
+    start = timezone.now() - timedelta(hours=updates)
+    for step in range(updates):
+        entry = DispatchStatusUpdate.objects.create(dispatch=dispatch, status="IN_TRANSIT", note=f"step {step}")
+        DispatchStatusUpdate.objects.filter(pk=entry.pk).update(occurred_at=start + timedelta(hours=step))
+    return dispatch
+
+
+@pytest.mark.django_db
+def test_list_embeds_only_latest_update_with_constant_queries(admin_client):
+    _dispatch_with_history(0, 2)
+    admin_client.get("/api/logistics/dispatches/")
+    with CaptureQueriesContext(connection) as small:
+        admin_client.get("/api/logistics/dispatches/")
+
+    for i in range(1, 8):
+        _dispatch_with_history(i, 30)
+    with CaptureQueriesContext(connection) as large:
+        r = admin_client.get("/api/logistics/dispatches/")
+
+    assert r.status_code == status.HTTP_200_OK
+    assert len(large.captured_queries) == len(small.captured_queries)
+    results = r.json()["data"]["results"]
+    assert "status_updates" not in results[0]
+    latest = {row["reference_code"]: row["latest_status_update"] for row in results}
+    assert latest["TL-3"]["note"] == "step 29"
+    assert latest["TL-0"]["note"] == "step 1"
+
+
+@pytest.mark.django_db
+def test_timeline_is_cursor_paginated_newest_first(admin_client):
+    dispatch = _dispatch_with_history(0, 45)
+    empty = Dispatch.objects.create(reference_code="TL-empty")
+
+    r = admin_client.get(f"/api/logistics/dispatches/{dispatch.id}/timeline/")
+    assert r.status_code == status.HTTP_200_OK
+    page = r.json()["data"]
+    assert [row["note"] for row in page["results"][:2]] == ["step 44", "step 43"]
+    assert len(page["results"]) == 20
+
+    notes = [row["note"] for row in page["results"]]
+    next_url = page["next"]
+    while next_url:
+        page = admin_client.get(next_url).json()["data"]
+        notes.extend(row["note"] for row in page["results"])
+        next_url = page["next"]
+    assert notes == [f"step {step}" for step in range(44, -1, -1)]
+
+    r_empty = admin_client.get(f"/api/logistics/dispatches/{empty.id}/timeline/")
+    assert r_empty.json()["data"]["results"] == []
+    detail = admin_client.get(f"/api/logistics/dispatches/{empty.id}/").json()["data"]
+    assert detail["latest_status_update"] is None
@@ -1,7 +1,9 @@
 # logistics/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import (
-    LogisticsAgentViewSet, VehicleViewSet, DispatchViewSet, DispatchStatusUpdateViewSet
+    LogisticsAgentViewSet, VehicleViewSet, DispatchViewSet, DispatchStatusUpdateViewSet, DeliveryRunViewSet,
+    TariffQuoteViewSet, dispatch_status_stream,
 )
 
 router = DefaultRouter()
@@ -9,5 +11,9 @@ router.register(r'agents', LogisticsAgentViewSet, basename='logisticsagent')
 router.register(r'vehicles', VehicleViewSet, basename='vehicle')
 router.register(r'dispatches', DispatchViewSet, basename='dispatch')
 router.register(r'dispatch-status-updates', DispatchStatusUpdateViewSet, basename='dispatchstatusupdate')
+router.register(r'runs', DeliveryRunViewSet, basename='deliveryrun')
+router.register(r'quotes', TariffQuoteViewSet, basename='tariffquote')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('dispatches/<uuid:pk>/stream/', dispatch_status_stream, name='dispatch-stream'),
+] + router.urls
@@ -1,17 +1,31 @@
 # logistics/views.py
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from datetime import timedelta
 from accounts.permissions import IsEmailVerified
+from core.streams import status_stream_response
+from core.uploads import UploadError, confirm_upload, issue_upload_ticket
 
-from .models import LogisticsAgent, Vehicle, Dispatch, DispatchStatusUpdate
+from django.db.models import Prefetch
+
+from .models import LogisticsAgent, Vehicle, Dispatch, DispatchStatusUpdate, DeliveryRun
+from . import services
 from .serializers import (
     LogisticsAgentSerializer,
     VehicleSerializer,
     DispatchSerializer,
     DispatchStatusUpdateSerializer,
+    DeliveryRunSerializer,
+    AgentPositionSerializer,
+    LocationPingBatchSerializer,
+    StatusSyncSerializer,
+    TariffQuoteRequestSerializer,
+    TariffQuoteSerializer,
 )
 
 
@@ -52,6 +66,34 @@ class LogisticsAgentViewSet(viewsets.ModelViewSet):
         user = self.request.user if self.request.user.is_authenticated else None
         serializer.save()
 
+    @action(detail=False, methods=["post"], url_path="pings", permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
+    def pings(self, request):
+        """
+        Device GPS upload. Payload: {"fixes": [{"latitude", "longitude", "recorded_at", "accuracy_m"?}, ...]}
+        Fixes are queued for a buffered bulk insert; the latest one updates the cached position.
+        """
+        serializer = LocationPingBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        agent = serializer.validated_data.get("agent_id")
+        if agent is None or not request.user.is_staff:
+            agent = getattr(request.user, "logistics_agent_profile", None)
+        if agent is None:
+            return Response({"detail": "Only logistics agents can post location pings."}, status=status.HTTP_403_FORBIDDEN)
+        accepted = services.record_location_pings(agent.id, serializer.validated_data["fixes"])
+        return Response({"accepted": accepted}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], url_path="positions", permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def positions(self, request):
+        """
+        Latest known position per agent from the cache. `?ids=<uuid>,<uuid>`
+        limits the lookup; by default every active agent is included.
+        """
+        ids = [value for value in request.query_params.get("ids", "").split(",") if value.strip()]
+        if not ids:
+            ids = LogisticsAgent.objects.filter(active=True).values_list("id", flat=True)
+        positions = services.get_agent_positions(ids)
+        return Response(AgentPositionSerializer(positions.values(), many=True).data)
+
 
 class VehicleViewSet(viewsets.ModelViewSet):
     queryset = Vehicle.objects.select_related("driver").all()
@@ -59,11 +101,28 @@ class VehicleViewSet(viewsets.ModelViewSet):
     permission_classes = [IsStaffOrAgent, IsEmailVerified]
 
 
+class DispatchTimelinePagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "-occurred_at"
+
+
 class DispatchViewSet(viewsets.ModelViewSet):
     queryset = Dispatch.objects.select_related("assigned_agent", "assigned_vehicle").all()
     serializer_class = DispatchSerializer
     permission_classes = [IsStaffOrAgent, IsEmailVerified]
 
+    def get_queryset(self):
+        # Embed only the newest status update: one windowed prefetch query per
+        # page, independent of how long each dispatch's timeline is.
+        latest = DispatchStatusUpdate.objects.order_by("-occurred_at")[:1]
+        return (
+            Dispatch.objects
+            .select_related("assigned_agent", "assigned_vehicle", "assigned_vehicle__driver")
+            .prefetch_related(Prefetch("status_updates", queryset=latest, to_attr="latest_status_updates"))
+        )
+
     def perform_create(self, serializer):
         # set created_by automatically
         user = self.request.user if self.request.user.is_authenticated else None
@@ -85,11 +144,52 @@ class DispatchViewSet(viewsets.ModelViewSet):
             vehicle = get_object_or_404(Vehicle, pk=vehicle_id)
             dispatch.assigned_vehicle = vehicle
         dispatch.status = "ASSIGNED"
-        dispatch.save(update_fields=["assigned_agent", "assigned_vehicle", "status", "updated_at"])
+        eta_fields = services.fill_dispatch_eta(dispatch)
+        dispatch.save(update_fields=["assigned_agent", "assigned_vehicle", "status", "updated_at", *eta_fields])
         # create status update entry
         DispatchStatusUpdate.objects.create(dispatch=dispatch, status="ASSIGNED", note="Assigned by admin", created_by=request.user)
+        services.publish_dispatch_status(dispatch, note="Assigned by admin")
         return Response(self.get_serializer(dispatch).data)
 
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def overdue(self, request):
+        """
+        Admin-only: open dispatches past their estimated delivery time, most
+        overdue first. `?within=<minutes>` also includes those due soon.
+        """
+        try:
+            within = int(request.query_params.get("within", 0))
+        except (TypeError, ValueError):
+            return Response({"detail": "within must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        before = timezone.now() + timedelta(minutes=max(within, 0))
+        page = self.paginate_queryset(services.due_open_dispatches(before, self.get_queryset()))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=["post"], url_path="build", permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def build(self, request):
+        """
+        Admin-only: create dispatches for every PROCESSING order and APPROVED
+        supply record that does not have one yet.
+        """
+        result = services.build_pending_dispatches(created_by=request.user)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="auto-assign", permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def auto_assign(self, request):
+        """
+        Admin-only: assign every PENDING dispatch to an active agent/vehicle pair,
+        balancing current workload, vehicle type and area. Payload: {"limit": 500} (optional)
+        """
+        limit = request.data.get("limit")
+        try:
+            limit = int(limit) if limit not in (None, "") else None
+        except (TypeError, ValueError):
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit is not None and limit < 1:
+            return Response({"detail": "limit must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+        result = services.auto_assign_dispatches(assigned_by=request.user, limit=limit)
+        return Response(result)
+
     @action(detail=True, methods=["post"], url_path="update-status", permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
     def update_status(self, request, pk=None):
         """
@@ -114,19 +214,68 @@ class DispatchViewSet(viewsets.ModelViewSet):
         dispatch.save(update_fields=["status", "pickup_time", "delivery_time", "updated_at"])
         # create status log
         su = DispatchStatusUpdate.objects.create(dispatch=dispatch, status=status_value, note=note, location=location, created_by=user)
+        services.publish_dispatch_status(dispatch, note=note, location=location)
         return Response(DispatchStatusUpdateSerializer(su).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="sync", permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
+    def sync(self, request):
+        """
+        Offline batch sync for agents. Payload: {"events": [{"client_event_id", "dispatch_id",
+        "status", "occurred_at", "note"?, "location"?}, ...]}. Safe to retry: known events are skipped.
+        """
+        if not (request.user.is_staff or getattr(request.user, "logistics_agent_profile", None)):
+            return Response({"detail": "Not permitted."}, status=status.HTTP_403_FORBIDDEN)
+        serializer = StatusSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = services.sync_status_events(serializer.validated_data["events"], request.user)
+        return Response(result)
+
+    @action(detail=True, methods=["get"], pagination_class=DispatchTimelinePagination)
+    def timeline(self, request, pk=None):
+        """
+        Cursor-paginated status history for one dispatch, newest first.
+        """
+        dispatch = self.get_object()
+        qs = DispatchStatusUpdate.objects.filter(dispatch=dispatch)
+        page = self.paginate_queryset(qs)
+        return self.get_paginated_response(DispatchStatusUpdateSerializer(page, many=True).data)
+
+    @action(detail=True, methods=["post"], url_path="proof-upload-ticket", permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
+    def proof_upload_ticket(self, request, pk=None):
+        """
+        Agent gets a short-lived signed ticket to upload the proof-of-delivery
+        photo straight to storage, then sends the ticket and the storage
+        response to confirm-delivery.
+        """
+        dispatch = self.get_object()
+        user = request.user
+        if not (user.is_staff or (dispatch.assigned_agent and dispatch.assigned_agent.user == user)):
+            return Response({"detail": "Not permitted."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            ticket = issue_upload_ticket("proof_of_delivery", dispatch.pk, user)
+        except UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(ticket, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=["post"], url_path="confirm-delivery", permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
     def confirm_delivery(self, request, pk=None):
         """
         Agent posts proof of delivery (photo/signature URL) and receiver name.
-        Payload: {"proof_of_delivery_url":"...", "receiver_name":"..."}
+        Payload: {"proof_of_delivery_url":"...", "receiver_name":"..."}, or for a
+        direct upload {"upload_ticket":"...", "upload":{<storage response>}, "receiver_name":"..."}
         """
         dispatch = self.get_object()
         user = request.user
         if not (user.is_staff or (dispatch.assigned_agent and dispatch.assigned_agent.user == user)):
             return Response({"detail": "Not permitted."}, status=status.HTTP_403_FORBIDDEN)
         proof = request.data.get("proof_of_delivery_url", "")
+        if request.data.get("upload_ticket"):
+            try:
+                proof = confirm_upload(
+                    request.data["upload_ticket"], request.data.get("upload") or {}, "proof_of_delivery", dispatch.pk, user
+                )
+            except UploadError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         receiver_name = request.data.get("receiver_name", "")
         dispatch.proof_of_delivery_url = proof
         dispatch.receiver_name = receiver_name
@@ -134,6 +283,7 @@ class DispatchViewSet(viewsets.ModelViewSet):
         dispatch.delivery_time = timezone.now()
         dispatch.save(update_fields=["proof_of_delivery_url", "receiver_name", "status", "delivery_time", "updated_at"])
         DispatchStatusUpdate.objects.create(dispatch=dispatch, status="DELIVERED", note="Proof uploaded", created_by=user)
+        services.publish_dispatch_status(dispatch, note="Proof uploaded")
         return Response(self.get_serializer(dispatch).data)
 
     @action(detail=True, methods=["post"], url_path="set-cost", permission_classes=[permissions.IsAdminUser, IsEmailVerified])
@@ -156,3 +306,76 @@ class DispatchStatusUpdateViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else None
         serializer.save(created_by=user)
+
+
+class DeliveryRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Admin view of consolidated delivery runs; POST /runs/plan/ packs pending work into new runs.
+    """
+    queryset = DeliveryRun.objects.select_related("vehicle", "agent").prefetch_related(
+        Prefetch("dispatches", queryset=Dispatch.objects.only("id", "delivery_run_id").order_by("run_sequence"))
+    )
+    serializer_class = DeliveryRunSerializer
+    permission_classes = [permissions.IsAdminUser, IsEmailVerified]
+
+    @action(detail=False, methods=["post"])
+    def plan(self, request):
+        """
+        Payload: {"window_hours": 4} (optional)
+        """
+        window_hours = request.data.get("window_hours")
+        try:
+            window_hours = int(window_hours) if window_hours not in (None, "") else None
+        except (TypeError, ValueError):
+            return Response({"detail": "window_hours must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if window_hours is not None and not 1 <= window_hours <= 24:
+            return Response({"detail": "window_hours must be between 1 and 24."}, status=status.HTTP_400_BAD_REQUEST)
+        result = services.plan_delivery_runs(created_by=request.user, window_hours=window_hours)
+        return Response(result, status=status.HTTP_201_CREATED if result["runs_created"] else status.HTTP_200_OK)
+
+
+class TariffQuoteViewSet(viewsets.ViewSet):
+    """
+    POST /quotes/ prices every origin x destination x vehicle combination
+    from the cached tariff table in one call (no per-option round-trips).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmailVerified]
+
+    def create(self, request):
+        serializer = TariffQuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        combinations = [
+            (origin, destination, vehicle_type)
+            for origin in data["origins"]
+            for destination in data["destinations"]
+            for vehicle_type in data["vehicle_types"]
+        ]
+        quotes = services.quote_many(combinations, at=data.get("at"))
+        return Response(TariffQuoteSerializer(quotes, many=True).data)
+
+
+async def dispatch_status_stream(request, pk):
+    """
+    GET /dispatches/{id}/stream/: SSE (or `?mode=poll` long-poll) feed of
+    status changes, for staff, the assigned agent and the ordering customer.
+    """
+    def resolve(user):
+        dispatch = get_object_or_404(Dispatch.objects.select_related("assigned_agent", "order"), pk=pk)
+        allowed = (
+            user.is_staff
+            or (dispatch.assigned_agent is not None and dispatch.assigned_agent.user_id == user.pk)
+            or (dispatch.order is not None and dispatch.order.user_id == user.pk)
+        )
+        if not allowed:
+            raise PermissionDenied
+        snapshot = {
+            "dispatch_id": str(dispatch.id),
+            "reference_code": dispatch.reference_code,
+            "status": dispatch.status,
+            "updated_at": dispatch.updated_at,
+        }
+        return services.dispatch_channel(dispatch.id), snapshot
+
+    return await status_stream_response(request, resolve)
+
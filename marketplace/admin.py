@@ -1,6 +1,6 @@
 # marketplace/admin.py
 from django.contrib import admin
-from .models import Category, Product, ProductImage, InventoryRecord
+from .models import Category, Product, ProductImage, InventoryRecord, InventoryCheckpoint, PriceHistory, CommodityPrice
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -27,3 +27,24 @@ class InventoryRecordAdmin(admin.ModelAdmin):
     list_display = ('product', 'change_type', 'quantity', 'performed_by', 'created_at')
     list_filter = ('change_type',)
     search_fields = ('product__title',)
+
+
+@admin.register(InventoryCheckpoint)
+class InventoryCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('product', 'as_of', 'balance', 'created_at')
+    search_fields = ('product__title',)
+    readonly_fields = ('created_at',)
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('product', 'old_price', 'new_price', 'changed_by', 'changed_at')
+    search_fields = ('product__title',)
+    readonly_fields = ('changed_at',)
+
+
+@admin.register(CommodityPrice)
+class CommodityPriceAdmin(admin.ModelAdmin):
+    list_display = ('display_title', 'unit', 'min_price', 'median_price', 'max_price', 'offers_count', 'updated_at')
+    search_fields = ('title',)
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.services import rebuild_commodity_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cross-farmer commodity price index from all products."
+
+    def handle(self, *args, **options):
+        refreshed = rebuild_commodity_index()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt commodity index for {refreshed} commodities."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.services import recount_category_products
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalised product counters on marketplace categories."
+
+    def handle(self, *args, **options):
+        fixed = recount_category_products()
+        self.stdout.write(self.style.SUCCESS(f"Recounted categories; {fixed} had stale counters."))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:33
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField()),
+                ('balance', models.DecimalField(decimal_places=3, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Inventory Checkpoint',
+                'verbose_name_plural': 'Inventory Checkpoints',
+                'ordering': ['-as_of'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventoryrecord',
+            index=models.Index(fields=['product', 'created_at'], name='marketplace_product_9b4bf7_idx'),
+        ),
+        migrations.AddField(
+            model_name='inventorycheckpoint',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_checkpoints', to='marketplace.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventorycheckpoint',
+            constraint=models.UniqueConstraint(fields=('product', 'as_of'), name='uniq_inventory_checkpoint_product_as_of'),
+        ),
+    ]
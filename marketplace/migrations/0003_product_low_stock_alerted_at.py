@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0001_initial'),
+        ('marketplace', '0002_inventory_checkpoints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_alerted_at',
+            field=models.DateTimeField(blank=True, help_text='When the farmer was last sent a low-stock digest for this product', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='marketplace_updated_f7a7e6_idx'),
+        ),
+    ]
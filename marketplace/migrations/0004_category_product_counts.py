@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:35
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counts(apps, schema_editor):
+    Category = apps.get_model("marketplace", "Category")
+    categories = list(
+        Category.objects.annotate(
+            total=Count("products"),
+            active=Count("products", filter=Q(products__is_active=True)),
+        )
+    )
+    for category in categories:
+        category.products_count = category.total
+        category.active_products_count = category.active
+    Category.objects.bulk_update(categories, ["products_count", "active_products_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_product_low_stock_alerted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:40
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0002_farmerproduct_commodity_index'),
+        ('marketplace', '0005_price_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommodityPrice',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('title', models.CharField(help_text='Normalised (lowercased, trimmed) product title', max_length=255)),
+                ('unit', models.CharField(max_length=30)),
+                ('display_title', models.CharField(max_length=255)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('offers_count', models.PositiveIntegerField(default=0)),
+                ('top_offers', models.JSONField(blank=True, default=list, help_text='Cheapest active offers, cheapest first')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Commodity Price',
+                'verbose_name_plural': 'Commodity Prices',
+                'ordering': ['title', 'unit'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('title')), django.db.models.functions.text.Lower('unit'), name='marketplace_product_commodity'),
+        ),
+        migrations.AddConstraint(
+            model_name='commodityprice',
+            constraint=models.UniqueConstraint(fields=('title', 'unit'), name='uniq_commodity_price_title_unit'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0006_commodity_price_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCheckpointRun',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('processed_until', models.DateTimeField()),
+                ('checkpoints_written', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Inventory Checkpoint Run',
+                'verbose_name_plural': 'Inventory Checkpoint Runs',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -4,12 +4,16 @@ from decimal import Decimal
 from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Lower, Trim
 
 class Category(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=120, unique=True)
     slug = models.SlugField(max_length=140, unique=True, blank=True)
     description = models.TextField(blank=True)
+    # Denormalised counters, maintained by marketplace.signals (repair: recount_category_products)
+    products_count = models.PositiveIntegerField(default=0, editable=False)
+    active_products_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -39,6 +43,7 @@ class Product(models.Model):
     featured = models.BooleanField(default=False)
     metadata = models.JSONField(blank=True, null=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_products')
+    low_stock_alerted_at = models.DateTimeField(null=True, blank=True, help_text="When the farmer was last sent a low-stock digest for this product")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -47,6 +52,8 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['farmer', 'title']),
             models.Index(fields=['slug']),
+            models.Index(fields=['updated_at']),
+            models.Index(Lower(Trim('title')), Lower('unit'), name='marketplace_product_commodity'),
         ]
         verbose_name = "Product"
         verbose_name_plural = "Products"
@@ -100,8 +107,102 @@ class InventoryRecord(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
         verbose_name = "Inventory Record"
         verbose_name_plural = "Inventory Records"
 
     def __str__(self):
         return f"{self.product} {self.change_type} {self.quantity}"
+
+
+class InventoryCheckpoint(models.Model):
+    """
+    Ledger balance of a product at a point in time, written periodically from
+    InventoryRecord so history queries only sum records after the latest checkpoint.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_checkpoints')
+    as_of = models.DateTimeField()
+    balance = models.DecimalField(max_digits=14, decimal_places=3)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-as_of']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'as_of'], name='uniq_inventory_checkpoint_product_as_of'),
+        ]
+        verbose_name = "Inventory Checkpoint"
+        verbose_name_plural = "Inventory Checkpoints"
+
+    def __str__(self):
+        return f"{self.product} {self.balance} @ {self.as_of}"
+
+
+class InventoryCheckpointRun(models.Model):
+    """One write_inventory_checkpoints run; the latest run's `processed_until` is where the next one starts."""
+    id = models.BigAutoField(primary_key=True)
+    processed_until = models.DateTimeField()
+    checkpoints_written = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Inventory Checkpoint Run"
+        verbose_name_plural = "Inventory Checkpoint Runs"
+
+    def __str__(self):
+        return f"Checkpoints through {self.processed_until} ({self.checkpoints_written})"
+
+
+class PriceHistory(models.Model):
+    """
+    Price changes of a marketplace product. A row is only written when the price actually changes.
+    """
+    id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    old_price = models.DecimalField(max_digits=12, decimal_places=2)
+    new_price = models.DecimalField(max_digits=12, decimal_places=2)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['product', 'changed_at']),
+        ]
+        verbose_name = "Price History"
+        verbose_name_plural = "Price History"
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} -> {self.new_price} @ {self.changed_at}"
+
+
+class CommodityPrice(models.Model):
+    """
+    Materialised cross-farmer price summary for one commodity (normalised title + unit),
+    built from active marketplace Products and FarmerProducts. Maintained by
+    marketplace.signals; rebuild with `rebuild_commodity_index`.
+    """
+    id = models.BigAutoField(primary_key=True)
+    title = models.CharField(max_length=255, help_text="Normalised (lowercased, trimmed) product title")
+    unit = models.CharField(max_length=30)
+    display_title = models.CharField(max_length=255)
+    min_price = models.DecimalField(max_digits=12, decimal_places=2)
+    median_price = models.DecimalField(max_digits=12, decimal_places=2)
+    max_price = models.DecimalField(max_digits=12, decimal_places=2)
+    offers_count = models.PositiveIntegerField(default=0)
+    top_offers = models.JSONField(default=list, blank=True, help_text="Cheapest active offers, cheapest first")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['title', 'unit']
+        constraints = [
+            models.UniqueConstraint(fields=['title', 'unit'], name='uniq_commodity_price_title_unit'),
+        ]
+        verbose_name = "Commodity Price"
+        verbose_name_plural = "Commodity Prices"
+
+    def __str__(self):
+        return f"{self.display_title} ({self.unit}): {self.min_price} - {self.max_price}"
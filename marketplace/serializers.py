@@ -1,16 +1,14 @@
 # marketplace/serializers.py
 from rest_framework import serializers
-from .models import Category, Product, ProductImage, InventoryRecord
+from .models import Category, Product, ProductImage, InventoryRecord, CommodityPrice
 from farmers.serializers import FarmerSerializer  # nested display (safe if farmers is installed)
 
 
 class CategorySerializer(serializers.ModelSerializer):
-    products_count = serializers.IntegerField(read_only=True)
-
     class Meta:
         model = Category
-        fields = ("id", "name", "slug", "description", "created_at", "products_count")
-        read_only_fields = ("id", "created_at", "products_count")
+        fields = ("id", "name", "slug", "description", "created_at", "products_count", "active_products_count")
+        read_only_fields = ("id", "created_at", "products_count", "active_products_count")
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -88,3 +86,13 @@ class InventoryRecordSerializer(serializers.ModelSerializer):
         model = InventoryRecord
         fields = ("id", "product", "change_type", "quantity", "note", "performed_by", "created_at")
         read_only_fields = ("id", "performed_by", "created_at")
+
+
+class CommodityPriceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CommodityPrice
+        fields = (
+            "id", "title", "display_title", "unit", "min_price", "median_price", "max_price",
+            "offers_count", "top_offers", "updated_at",
+        )
+        read_only_fields = fields
@@ -1,9 +1,28 @@
 # marketplace/services.py
-from django.db import transaction
+import statistics
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, When, F, Q, Sum, Max, Count, Value, Subquery, OuterRef, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce, Greatest, Round, Lower, Trim
 from django.shortcuts import get_object_or_404
-from .models import Product, InventoryRecord
+from django.utils import timezone
+from .models import (
+    Category, Product, InventoryRecord, InventoryCheckpoint, InventoryCheckpointRun, PriceHistory, CommodityPrice,
+)
 from decimal import Decimal
 
+LEDGER_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+CATEGORY_LIST_CACHE_VERSION_KEY = "marketplace_category_list_version_v1"
+REPRICE_MODES = ("absolute", "percent")
+COMMODITY_TOP_OFFERS = getattr(settings, "MARKETPLACE_COMMODITY_TOP_OFFERS", 5)
+COMMODITY_REFRESH_CHUNK = 200
+# Inventory records younger than this may still be in uncommitted transactions
+INVENTORY_CHECKPOINT_SETTLE = timedelta(minutes=5)
+
 def adjust_product_stock(product_id, change_qty, change_type="ADJUST", performed_by=None, note=""):
     """
     Atomically adjust a product's stock and create an InventoryRecord.
@@ -33,3 +52,439 @@ def adjust_product_stock(product_id, change_qty, change_type="ADJUST", performed
             performed_by=performed_by
         )
     return p
+
+
+def signed_inventory_quantity():
+    """
+    Expression for an InventoryRecord's effect on stock: OUT subtracts,
+    IN / ADJUST / RETURN add (same semantics as adjust_product_stock).
+    """
+    return Case(
+        When(change_type="OUT", then=-F("quantity")),
+        default=F("quantity"),
+        output_field=DecimalField(max_digits=14, decimal_places=3),
+    )
+
+
+def _ledger_sum(records):
+    total = records.order_by().aggregate(total=Sum(signed_inventory_quantity()))["total"]
+    return total or Decimal("0")
+
+
+def write_inventory_checkpoints(as_of=None):
+    """
+    Write a balance checkpoint for every product whose ledger moved since the
+    last checkpoint run. Only records created after that run are aggregated,
+    so the job cost tracks recent activity rather than total history.
+
+    `as_of` is capped at now - INVENTORY_CHECKPOINT_SETTLE so records still in
+    uncommitted transactions are left for the next run, and runs are
+    serialised on the latest InventoryCheckpointRun row so two overlapping
+    runs never count the same records. Returns the number of checkpoints written.
+    """
+    settled = timezone.now() - INVENTORY_CHECKPOINT_SETTLE
+    as_of = min(as_of, settled) if as_of else settled
+
+    with transaction.atomic():
+        last = InventoryCheckpointRun.objects.select_for_update().order_by("-id").first()
+        if last is not None:
+            since = last.processed_until
+        else:
+            # checkpoints written before runs were recorded
+            since = InventoryCheckpoint.objects.aggregate(last=Max("as_of"))["last"]
+        if since is not None and as_of <= since:
+            return 0
+        written = _write_checkpoints_between(since, as_of)
+        InventoryCheckpointRun.objects.create(processed_until=as_of, checkpoints_written=written)
+    return written
+
+
+def _write_checkpoints_between(since, as_of):
+    recent = InventoryRecord.objects.filter(created_at__lte=as_of)
+    if since:
+        recent = recent.filter(created_at__gt=since)
+    deltas = dict(
+        recent.order_by()
+        .values("product")
+        .annotate(delta=Sum(signed_inventory_quantity()))
+        .values_list("product", "delta")
+    )
+    if not deltas:
+        return 0
+
+    previous = dict(
+        Product.objects.filter(pk__in=deltas.keys())
+        .annotate(previous_balance=Subquery(
+            InventoryCheckpoint.objects.filter(product=OuterRef("pk"), as_of__lt=as_of)
+            .order_by("-as_of")
+            .values("balance")[:1]
+        ))
+        .values_list("pk", "previous_balance")
+    )
+    checkpoints = [
+        InventoryCheckpoint(
+            product_id=product_id,
+            as_of=as_of,
+            balance=(previous.get(product_id) or Decimal("0")) + delta,
+        )
+        for product_id, delta in deltas.items()
+    ]
+    InventoryCheckpoint.objects.bulk_create(checkpoints, ignore_conflicts=True)
+    return len(checkpoints)
+
+
+def get_stock_at(product_id, at):
+    """
+    Ledger stock of a product at time `at`: the nearest checkpoint at or before
+    `at` plus the records created between that checkpoint and `at`.
+    """
+    checkpoint = (
+        InventoryCheckpoint.objects.filter(product_id=product_id, as_of__lte=at)
+        .order_by("-as_of")
+        .first()
+    )
+    records = InventoryRecord.objects.filter(product_id=product_id, created_at__lte=at)
+    if checkpoint is None:
+        return _ledger_sum(records)
+    return checkpoint.balance + _ledger_sum(records.filter(created_at__gt=checkpoint.as_of))
+
+
+def detect_inventory_drift():
+    """
+    Compare Product.quantity with the ledger balance for every product in one
+    query (latest checkpoint + records after it). Returns the products that
+    disagree as dicts with product_id, title, quantity, ledger and drift.
+    """
+    latest = InventoryCheckpoint.objects.filter(product=OuterRef("pk")).order_by("-as_of")
+    since_checkpoint = (
+        InventoryRecord.objects.filter(
+            product=OuterRef("pk"),
+            created_at__gt=Coalesce(OuterRef("checkpoint_at"), Value(LEDGER_EPOCH)),
+        )
+        .order_by()
+        .values("product")
+        .annotate(total=Sum(signed_inventory_quantity()))
+        .values("total")
+    )
+    rows = (
+        Product.objects
+        .annotate(
+            checkpoint_at=Subquery(latest.values("as_of")[:1]),
+            checkpoint_balance=Coalesce(Subquery(latest.values("balance")[:1]), Value(Decimal("0"))),
+        )
+        .annotate(
+            ledger=ExpressionWrapper(
+                F("checkpoint_balance") + Coalesce(Subquery(since_checkpoint), Value(Decimal("0"))),
+                output_field=DecimalField(max_digits=14, decimal_places=3),
+            )
+        )
+        .exclude(quantity=F("ledger"))
+        .order_by("pk")
+        .values("pk", "title", "quantity", "ledger")
+    )
+    return [
+        {
+            "product_id": row["pk"],
+            "title": row["title"],
+            "quantity": row["quantity"],
+            "ledger": row["ledger"],
+            "drift": row["quantity"] - row["ledger"],
+        }
+        for row in rows
+    ]
+
+
+def get_category_list_cache_version():
+    version = cache.get(CATEGORY_LIST_CACHE_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(CATEGORY_LIST_CACHE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_category_list_cache():
+    """
+    Bump the category list version once the current transaction commits
+    (immediately outside one), so a concurrent reader cannot cache the
+    pre-commit counts under the new version.
+    """
+    transaction.on_commit(
+        lambda: cache.set(CATEGORY_LIST_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    )
+
+
+def apply_category_count_deltas(deltas):
+    """
+    Apply {category_id: (products_delta, active_delta)} with one F-expression
+    UPDATE per touched category and invalidate the cached category list.
+    """
+    touched = False
+    for category_id, (total_delta, active_delta) in deltas.items():
+        if category_id is None or (total_delta == 0 and active_delta == 0):
+            continue
+        Category.objects.filter(pk=category_id).update(
+            products_count=F("products_count") + total_delta,
+            active_products_count=F("active_products_count") + active_delta,
+        )
+        touched = True
+    if touched:
+        invalidate_category_list_cache()
+
+
+def recount_category_products():
+    """
+    Recompute products_count / active_products_count for every category in bulk.
+    Returns the number of categories whose counters were wrong.
+    """
+    categories = list(
+        Category.objects.annotate(
+            total=Count("products"),
+            active=Count("products", filter=Q(products__is_active=True)),
+        )
+    )
+    stale = []
+    for category in categories:
+        if (category.products_count, category.active_products_count) != (category.total, category.active):
+            category.products_count = category.total
+            category.active_products_count = category.active
+            stale.append(category)
+    if stale:
+        Category.objects.bulk_update(stale, ["products_count", "active_products_count"], batch_size=500)
+        invalidate_category_list_cache()
+    return len(stale)
+
+
+def bulk_reprice_products(queryset, mode, value, changed_by=None):
+    """
+    Reprice every product in `queryset` with one UPDATE and bulk-insert the
+    matching PriceHistory rows.
+
+    mode "absolute": add `value` (may be negative) to the price.
+    mode "percent": change the price by `value` percent (e.g. -10 for a 10% cut).
+    Prices never go below zero. Returns the number of products whose price changed.
+    """
+    if mode not in REPRICE_MODES:
+        raise ValueError(f"Invalid mode. Use one of: {', '.join(REPRICE_MODES)}")
+    value = Decimal(str(value))
+    price_field = DecimalField(max_digits=12, decimal_places=2)
+    if mode == "absolute":
+        expression = F("price") + Value(value, output_field=price_field)
+    else:
+        factor = Decimal("1") + value / Decimal("100")
+        expression = F("price") * Value(factor, output_field=DecimalField(max_digits=12, decimal_places=6))
+    expression = Greatest(Round(expression, 2), Value(Decimal("0.00")), output_field=price_field)
+
+    with transaction.atomic():
+        old_prices = dict(queryset.select_for_update().order_by("pk").values_list("pk", "price"))
+        if not old_prices:
+            return 0
+        Product.objects.filter(pk__in=old_prices.keys()).update(price=expression, updated_at=timezone.now())
+        new_prices = Product.objects.filter(pk__in=old_prices.keys()).values_list("pk", "price")
+        history = [
+            PriceHistory(product_id=pk, old_price=old_prices[pk], new_price=price, changed_by=changed_by)
+            for pk, price in new_prices
+            if price != old_prices[pk]
+        ]
+        PriceHistory.objects.bulk_create(history, batch_size=1000)
+        schedule_commodity_refresh(
+            set(Product.objects.filter(pk__in=old_prices.keys()).values_list("title", "unit").distinct())
+        )
+    return len(history)
+
+
+def get_price_series(product, start=None, end=None, points=100):
+    """
+    Chart-friendly step series of a product's price between start and end,
+    downsampled to at most `points` entries (last price within each time bucket).
+    """
+    end = end or timezone.now()
+    history = PriceHistory.objects.filter(product=product)
+    changes = history.filter(changed_at__lte=end).order_by("changed_at")
+    if start is None:
+        start = changes.values_list("changed_at", flat=True).first() or product.created_at
+    before = history.filter(changed_at__lte=start).order_by("-changed_at").values_list("new_price", flat=True).first()
+    if before is None:
+        # nothing at or before start: the price then is what the first later change
+        # replaced, even if that change is after `end`; product.price only without history
+        before = history.filter(changed_at__gt=start).order_by("changed_at").values_list("old_price", flat=True).first()
+        if before is None:
+            before = product.price
+    rows = list(changes.filter(changed_at__gt=start).values_list("changed_at", "new_price"))
+
+    if len(rows) > points - 1 > 0:
+        # keep the opening price, then the last price within each of points - 1 buckets
+        span = (end - start) / (points - 1)
+        buckets = {}
+        for at, price in rows:
+            index = min(int((at - start) / span), points - 2) if span else 0
+            buckets[index] = (at, price)
+        rows = [buckets[i] for i in sorted(buckets)]
+    series = [(start, before)] + rows
+    return [{"at": at.isoformat(), "price": price} for at, price in series]
+
+
+def commodity_keys(pairs):
+    """
+    Normalised (title, unit) keys used to group identical produce across farmers.
+    The database does the normalising, with the same LOWER(TRIM(title)),
+    LOWER(unit) expressions as the commodity index and _commodity_offers, so
+    keys built from Python values always match the indexed rows (Python's
+    strip()/lower() differ on tabs, newlines and non-ASCII case).
+    One query per COMMODITY_REFRESH_CHUNK pairs.
+    """
+    pairs = list({(title or "", unit or "") for title, unit in pairs})
+    keys = set()
+    for start in range(0, len(pairs), COMMODITY_REFRESH_CHUNK):
+        chunk = pairs[start:start + COMMODITY_REFRESH_CHUNK]
+        sql = " UNION ALL ".join(["SELECT LOWER(TRIM(%s)), LOWER(%s)"] * len(chunk))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [value for pair in chunk for value in pair])
+            keys.update(tuple(row) for row in cursor.fetchall())
+    return keys
+
+
+def commodity_key(title, unit):
+    """Normalised key of a single (title, unit) pair; see commodity_keys."""
+    return commodity_keys([(title, unit)]).pop()
+
+
+def _commodity_offers(keys):
+    """
+    Active offers for the given commodity keys from both marketplace Products and
+    farmers' FarmerProducts, grouped by key. One query per source and chunk.
+    """
+    from farmers.models import FarmerProduct
+
+    sources = (
+        ("marketplace", Product.objects.filter(is_active=True, quantity__gt=0), "quantity", "price"),
+        ("farmer", FarmerProduct.objects.filter(is_active=True, quantity_available__gt=0), "quantity_available", "price_per_unit"),
+    )
+    offers = {key: [] for key in keys}
+    for source, queryset, quantity_field, price_field in sources:
+        match = Q()
+        for title, unit in keys:
+            match |= Q(commodity_title=title, commodity_unit=unit)
+        rows = (
+            queryset.annotate(commodity_title=Lower(Trim("title")), commodity_unit=Lower("unit"))
+            .filter(match)
+            .values(
+                "id", "title", "commodity_title", "commodity_unit", "farmer_id",
+                "farmer__contact_name", "farmer__business_name", quantity_field, price_field,
+            )
+        )
+        for row in rows:
+            offers[(row["commodity_title"], row["commodity_unit"])].append({
+                "source": source,
+                "product_id": str(row["id"]),
+                "title": row["title"],
+                "farmer_id": str(row["farmer_id"]),
+                "farmer_name": row["farmer__business_name"] or row["farmer__contact_name"],
+                "price": row[price_field],
+                "quantity": row[quantity_field],
+            })
+    return offers
+
+
+def refresh_commodity_prices(keys):
+    """
+    Recompute the CommodityPrice rows for the given (title, unit) keys (raw
+    values are fine, they are normalised by commodity_keys). Commodities without
+    active offers are removed.
+
+    Refreshes of the same key are serialised: each chunk first makes sure a row
+    exists for every key (a conflicting insert waits for the other transaction)
+    and locks the rows, and only then reads the offers, so every refresh reads
+    offers committed before it and the last writer is never working from a
+    stale snapshot. Call it outside the transaction that changed the offers,
+    which is what schedule_commodity_refresh does.
+    Returns the number of keys refreshed.
+    """
+    keys = sorted(key for key in commodity_keys(key for key in keys if key and key[0]) if key[0])
+    fields = ["display_title", "min_price", "median_price", "max_price", "offers_count", "top_offers", "updated_at"]
+    for start in range(0, len(keys), COMMODITY_REFRESH_CHUNK):
+        chunk = keys[start:start + COMMODITY_REFRESH_CHUNK]
+        with transaction.atomic():
+            CommodityPrice.objects.bulk_create(
+                [
+                    CommodityPrice(title=title, unit=unit, display_title=title, min_price=0, median_price=0, max_price=0)
+                    for title, unit in chunk
+                ],
+                ignore_conflicts=True,
+            )
+            rows = {
+                (row.title, row.unit): row
+                for row in CommodityPrice.objects.select_for_update()
+                .filter(title__in={title for title, _ in chunk}, unit__in={unit for _, unit in chunk})
+                .order_by("title", "unit")
+            }
+            offers = _commodity_offers(chunk)
+            to_update, to_delete = [], []
+            for key in chunk:
+                row = rows[key]
+                key_offers = sorted(offers[key], key=lambda offer: offer["price"])
+                if not key_offers:
+                    to_delete.append(row.pk)
+                    continue
+                prices = [offer["price"] for offer in key_offers]
+                row.display_title = key_offers[0]["title"].strip()
+                row.min_price = prices[0]
+                row.max_price = prices[-1]
+                row.median_price = Decimal(statistics.median(prices)).quantize(Decimal("0.01"))
+                row.offers_count = len(prices)
+                row.top_offers = [
+                    {**offer, "price": str(offer["price"]), "quantity": str(offer["quantity"])}
+                    for offer in key_offers[:COMMODITY_TOP_OFFERS]
+                ]
+                row.updated_at = timezone.now()
+                to_update.append(row)
+            if to_delete:
+                CommodityPrice.objects.filter(pk__in=to_delete).delete()
+            if to_update:
+                CommodityPrice.objects.bulk_update(to_update, fields)
+    return len(keys)
+
+
+_scheduled_commodity_refresh = threading.local()
+
+
+def schedule_commodity_refresh(keys):
+    """
+    Refresh the given commodity keys once the current transaction commits
+    (right away outside one), so the recompute reads committed offers and does
+    not run inside checkout/stock transactions. Keys scheduled before the same
+    commit are refreshed together in one pass.
+    """
+    pending = getattr(_scheduled_commodity_refresh, "keys", None)
+    if pending is None:
+        pending = _scheduled_commodity_refresh.keys = set()
+    pending.update(keys)
+    transaction.on_commit(_run_scheduled_commodity_refresh)
+
+
+def _run_scheduled_commodity_refresh():
+    keys = getattr(_scheduled_commodity_refresh, "keys", None)
+    if keys:
+        _scheduled_commodity_refresh.keys = set()
+        refresh_commodity_prices(keys)
+
+
+def rebuild_commodity_index():
+    """
+    Rebuild the whole commodity index from scratch (repair / initial load).
+    """
+    from farmers.models import FarmerProduct
+
+    keys = set()
+    for queryset in (Product.objects.all(), FarmerProduct.objects.all()):
+        keys.update(
+            queryset.annotate(commodity_title=Lower(Trim("title")), commodity_unit=Lower("unit"))
+            .order_by()
+            .values_list("commodity_title", "commodity_unit")
+            .distinct()
+        )
+    stale = [
+        pk for pk, title, unit in CommodityPrice.objects.values_list("pk", "title", "unit")
+        if (title, unit) not in keys
+    ]
+    CommodityPrice.objects.filter(pk__in=stale).delete()
+    return refresh_commodity_prices(keys)
@@ -0,0 +1,117 @@
+# marketplace/signals.py
+"""
+Keep Category.products_count / active_products_count in step with Product
+create, delete, category reassignment and is_active toggles, record
+PriceHistory when a saved product's price changes, and refresh the
+CommodityPrice index when a Product's or FarmerProduct's title, unit,
+price, quantity or active flag changes.
+QuerySet.update() bypasses these handlers; run `recount_category_products` after
+bulk edits that change category or is_active (bulk repricing writes its own history).
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Category, Product, PriceHistory
+from farmers.models import FarmerProduct
+from .services import (
+    apply_category_count_deltas, invalidate_category_list_cache, schedule_commodity_refresh,
+)
+
+COMMODITY_FIELDS = {
+    Product: ("title", "unit", "price", "quantity", "is_active"),
+    FarmerProduct: ("title", "unit", "price_per_unit", "quantity_available", "is_active"),
+}
+
+
+def _add(deltas, category_id, total, active):
+    current = deltas.get(category_id, (0, 0))
+    deltas[category_id] = (current[0] + total, current[1] + active)
+
+
+@receiver(pre_save, sender=Product, dispatch_uid="marketplace_product_remember_category")
+def remember_previous_category(sender, instance, raw=False, **kwargs):
+    instance._previous_category_state = None
+    instance._previous_price = None
+    if raw or instance._state.adding:
+        return
+    previous = Product.objects.filter(pk=instance.pk).values_list("category_id", "is_active", "price").first()
+    if previous is not None:
+        instance._previous_category_state = previous[:2]
+        instance._previous_price = previous[2]
+
+
+@receiver(post_save, sender=Product, dispatch_uid="marketplace_product_update_category_counts")
+def update_category_counts_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, "_previous_category_state", None)
+    deltas = {}
+    if previous is not None:
+        old_category_id, old_active = previous
+        _add(deltas, old_category_id, -1, -1 if old_active else 0)
+    _add(deltas, instance.category_id, 1, 1 if instance.is_active else 0)
+    apply_category_count_deltas(deltas)
+
+
+@receiver(post_save, sender=Product, dispatch_uid="marketplace_product_record_price_change")
+def record_price_change(sender, instance, created, raw=False, **kwargs):
+    previous_price = getattr(instance, "_previous_price", None)
+    if raw or created or previous_price is None:
+        return
+    new_price = Product._meta.get_field("price").to_python(instance.price)
+    if new_price != previous_price:
+        PriceHistory.objects.create(
+            product=instance,
+            old_price=previous_price,
+            new_price=new_price,
+            changed_by=getattr(instance, "_price_changed_by", None),
+        )
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="marketplace_product_delete_category_counts")
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    apply_category_count_deltas({instance.category_id: (-1, -1 if instance.is_active else 0)})
+
+
+@receiver(post_save, sender=Category, dispatch_uid="marketplace_category_saved")
+@receiver(post_delete, sender=Category, dispatch_uid="marketplace_category_deleted")
+def invalidate_category_cache(sender, **kwargs):
+    invalidate_category_list_cache()
+
+
+@receiver(pre_save, sender=Product, dispatch_uid="marketplace_product_remember_commodity")
+@receiver(pre_save, sender=FarmerProduct, dispatch_uid="marketplace_farmerproduct_remember_commodity")
+def remember_previous_commodity(sender, instance, raw=False, **kwargs):
+    instance._previous_commodity_state = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_commodity_state = (
+        sender.objects.filter(pk=instance.pk).values_list(*COMMODITY_FIELDS[sender]).first()
+    )
+
+
+@receiver(post_save, sender=Product, dispatch_uid="marketplace_product_refresh_commodity")
+@receiver(post_save, sender=FarmerProduct, dispatch_uid="marketplace_farmerproduct_refresh_commodity")
+def refresh_commodity_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, "_previous_commodity_state", None)
+    values = [getattr(instance, name) for name in COMMODITY_FIELDS[sender]]
+    # F() assignments (e.g. FarmerProduct.reserve) cannot be compared in Python; treat as changed
+    if previous is not None and not any(hasattr(value, "resolve_expression") for value in values):
+        current = tuple(
+            sender._meta.get_field(name).to_python(value)
+            for name, value in zip(COMMODITY_FIELDS[sender], values)
+        )
+        if tuple(previous) == current:
+            return
+    keys = {(instance.title, instance.unit)}
+    if previous is not None:
+        keys.add((previous[0], previous[1]))
+    schedule_commodity_refresh(keys)
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="marketplace_product_delete_commodity")
+@receiver(post_delete, sender=FarmerProduct, dispatch_uid="marketplace_farmerproduct_delete_commodity")
+def refresh_commodity_on_delete(sender, instance, **kwargs):
+    schedule_commodity_refresh({(instance.title, instance.unit)})
@@ -12,30 +12,108 @@ except ImportError:  # pragma: no cover - optional dependency
                 return f
             return wrapper
         return func
+from datetime import timedelta
+
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
 from django.utils import timezone
 from .models import Product
+from .services import write_inventory_checkpoints
 
 DEFAULT_THRESHOLD = getattr(settings, "MARKETPLACE_LOW_STOCK_THRESHOLD", 10)  # default units
+LOW_STOCK_SCAN_CURSOR_KEY = "marketplace_low_stock_scan_cursor_v1"
+
+
+def _build_low_stock_digest(email, products):
+    lines = [f"- {p['title']}: {p['quantity']} {p['unit']}" for p in products]
+    subject = (
+        f"Low stock alert: {products[0]['title']}"
+        if len(products) == 1
+        else f"Low stock alert: {len(products)} products"
+    )
+    message = "The following products are running low. Please replenish.\n\n" + "\n".join(lines)
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+
 
 @shared_task
-def send_low_stock_alerts(threshold=None):
+def send_low_stock_alerts(threshold=None, full_scan=False):
     """
-    Find products with quantity <= threshold and send alerts to farmer email (if present).
+    Send one low-stock digest per farmer for active products with quantity <= threshold.
+
+    Products are read in a single joined query and grouped per farmer email; all
+    digests go out over one mail connection. A product is only alerted again
+    once it has changed since its last alert, and unless full_scan is set only
+    products updated since the previous run are scanned.
+
+    Only products whose own digest was sent are stamped. The scan cursor moves
+    to this run's start when every digest went out, otherwise to just before
+    the oldest product that is still unsent, so failed farmers are retried.
     """
     thr = threshold or DEFAULT_THRESHOLD
-    products = Product.objects.filter(quantity__lte=thr, is_active=True)
-    alerts_sent = 0
-    for p in products:
-        farmer_email = p.farmer.email
-        if farmer_email:
-            subject = f"Low stock alert: {p.title}"
-            message = f"Your product '{p.title}' has low stock ({p.quantity} {p.unit}). Please replenish."
+    started_at = timezone.now()
+
+    products = (
+        Product.objects.filter(quantity__lte=thr, is_active=True)
+        .exclude(farmer__email__isnull=True)
+        .exclude(farmer__email="")
+        .filter(Q(low_stock_alerted_at__isnull=True) | Q(updated_at__gt=F("low_stock_alerted_at")))
+    )
+    cursor = None if full_scan else cache.get(LOW_STOCK_SCAN_CURSOR_KEY)
+    if cursor:
+        products = products.filter(updated_at__gt=cursor)
+
+    digests = {}
+    rows = list(
+        products.order_by("farmer_id", "title").values("id", "title", "quantity", "unit", "updated_at", "farmer__email")
+    )
+    for row in rows:
+        digests.setdefault(row["farmer__email"], []).append(row)
+
+    sent_rows, unsent_rows = [], []
+    if digests:
+        try:
+            # opened once up front so each per-farmer send reuses it
+            connection = get_connection()
+            connection.open()
+        except Exception:
+            # avoid task failing due to email config; products stay pending for the next run
+            connection = None
+        for email, items in digests.items():
+            sent = 0
+            if connection is not None:
+                try:
+                    sent = connection.send_messages([_build_low_stock_digest(email, items)]) or 0
+                except Exception:
+                    sent = 0
+            (sent_rows if sent else unsent_rows).extend(items)
+        if connection is not None:
             try:
-                send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [farmer_email])
-                alerts_sent += 1
+                connection.close()
             except Exception:
-                # avoid task failing due to email config
-                continue
-    return {"checked": products.count(), "alerts_sent": alerts_sent, "checked_at": timezone.now().isoformat()}
+                pass
+        if sent_rows:
+            Product.objects.filter(pk__in=[row["id"] for row in sent_rows]).update(low_stock_alerted_at=started_at)
+
+    if not unsent_rows:
+        cache.set(LOW_STOCK_SCAN_CURSOR_KEY, started_at, timeout=None)
+    else:
+        oldest_unsent = min(row["updated_at"] for row in unsent_rows)
+        cache.set(LOW_STOCK_SCAN_CURSOR_KEY, oldest_unsent - timedelta(microseconds=1), timeout=None)
+    return {
+        "checked": len(rows),
+        "alerts_sent": len({row["farmer__email"] for row in sent_rows}),
+        "products_alerted": len(sent_rows),
+        "checked_at": started_at.isoformat(),
+    }
+
+
+@shared_task
+def write_inventory_checkpoints_task():
+    """
+    Periodic (e.g. daily) job: checkpoint the ledger balance of every product
+    that had inventory records since the previous run.
+    """
+    written = write_inventory_checkpoints()
+    return {"checkpoints_written": written, "checked_at": timezone.now().isoformat()}
@@ -0,0 +1,79 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from farmers.models import Farmer
+from marketplace.models import Category, Product
+
+
+def _counts(category):
+    category.refresh_from_db()
+    return category.products_count, category.active_products_count
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "category-counts"}}
+
+
+@pytest.fixture
+def farmer():
+    return Farmer.objects.create(contact_name="Farmer Count")
+
+
+@pytest.mark.django_db
+def test_counts_follow_create_toggle_reassign_and_delete(farmer):
+    grains = Category.objects.create(name="Grains", slug="grains")
+    tubers = Category.objects.create(name="Tubers", slug="tubers")
+
+    maize = Product.objects.create(farmer=farmer, title="Maize", category=grains, price="1.00")
+    Product.objects.create(farmer=farmer, title="Rice", category=grains, price="1.00", is_active=False)
+    assert _counts(grains) == (2, 1)
+
+    maize.is_active = False
+    maize.save()
+    assert _counts(grains) == (2, 0)
+
+    maize.category = tubers
+    maize.is_active = True
+    maize.save()
+    assert _counts(grains) == (1, 0)
+    assert _counts(tubers) == (1, 1)
+
+    maize.delete()
+    assert _counts(tubers) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_recount_command_repairs_counts(farmer):
+    grains = Category.objects.create(name="Grains", slug="grains")
+    Product.objects.create(farmer=farmer, title="Maize", category=grains, price="1.00")
+    Category.objects.filter(pk=grains.pk).update(products_count=42, active_products_count=7)
+
+    call_command("recount_category_products")
+    assert _counts(grains) == (1, 1)
+
+
+@pytest.mark.django_db
+def test_category_list_is_cached_and_invalidated(client, farmer, locmem_cache, django_capture_on_commit_callbacks):
+    grains = Category.objects.create(name="Grains", slug="grains")
+    Product.objects.create(farmer=farmer, title="Maize", category=grains, price="1.00")
+
+    r = client.get("/api/marketplace/categories/")
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["data"]["results"][0]["products_count"] == 1
+
+    with CaptureQueriesContext(connection) as ctx:
+        client.get("/api/marketplace/categories/")
+    assert len(ctx.captured_queries) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Product.objects.create(farmer=farmer, title="Rice", category=grains, price="1.00")
+        # the version is only bumped on commit: readers keep the committed counts until then
+        r = client.get("/api/marketplace/categories/")
+        assert r.json()["data"]["results"][0]["products_count"] == 1
+    r = client.get("/api/marketplace/categories/")
+    assert r.json()["data"]["results"][0]["products_count"] == 2
+    assert r.json()["data"]["results"][0]["active_products_count"] == 2
@@ -0,0 +1,130 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from rest_framework import status
+
+from farmers.models import Farmer, FarmerProduct
+from farmers import services as farmer_services
+from marketplace.models import Product, CommodityPrice
+from marketplace import services
+
+
+@pytest.fixture
+def farmers():
+    return [Farmer.objects.create(contact_name=f"Farmer {i}") for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_index_combines_both_catalogues_and_tracks_changes(farmers, django_capture_on_commit_callbacks):
+    a, b, c = farmers
+    with django_capture_on_commit_callbacks(execute=True):
+        Product.objects.create(farmer=a, title="Maize", unit="kg", price="30.00", quantity="5")
+        cheap = Product.objects.create(farmer=b, title=" maize ", unit="KG", price="10.00", quantity="5")
+        FarmerProduct.objects.create(farmer=c, title="MAIZE", unit="kg", price_per_unit="20.00", quantity_available="2")
+
+    row = CommodityPrice.objects.get(title="maize", unit="kg")
+    assert (row.min_price, row.median_price, row.max_price) == (Decimal("10.00"), Decimal("20.00"), Decimal("30.00"))
+    assert row.offers_count == 3
+    assert row.top_offers[0]["product_id"] == str(cheap.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cheap.is_active = False
+        cheap.save()
+    row.refresh_from_db()
+    assert row.offers_count == 2
+    assert row.min_price == Decimal("20.00")
+    assert row.median_price == Decimal("25.00")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cheap.is_active = True
+        cheap.title = "Yellow Maize"
+        cheap.save()
+    assert CommodityPrice.objects.get(title="yellow maize").offers_count == 1
+    assert CommodityPrice.objects.get(title="maize").offers_count == 2
+
+
+@pytest.mark.django_db
+def test_sold_out_and_deleted_offers_leave_the_index(farmers, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        product = FarmerProduct.objects.create(
+            farmer=farmers[0], title="Eggs", unit="crate", price_per_unit="5.00", quantity_available="1"
+        )
+    assert CommodityPrice.objects.filter(title="eggs").exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        farmer_services.reserve_bulk_stock([{"product_id": product.id, "quantity": 1}])
+    assert not CommodityPrice.objects.filter(title="eggs").exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        listing = Product.objects.create(farmer=farmers[1], title="Eggs", unit="crate", price="6.00", quantity="3")
+    assert CommodityPrice.objects.get(title="eggs").offers_count == 1
+    with django_capture_on_commit_callbacks(execute=True):
+        listing.delete()
+    assert not CommodityPrice.objects.filter(title="eggs").exists()
+
+
+@pytest.mark.django_db
+def test_rebuild_command_and_endpoint(client, farmers):
+    Product.objects.create(farmer=farmers[0], title="Rice", unit="bag", price="100.00", quantity="1")
+    Product.objects.create(farmer=farmers[1], title="Rice", unit="bag", price="90.00", quantity="1")
+    CommodityPrice.objects.all().delete()
+    CommodityPrice.objects.create(
+        title="ghost", unit="kg", display_title="Ghost", min_price=1, median_price=1, max_price=1, offers_count=1
+    )
+
+    call_command("rebuild_commodity_index")
+    assert list(CommodityPrice.objects.values_list("title", flat=True)) == ["rice"]
+
+    r = client.get("/api/marketplace/commodities/", {"title": "RICE", "unit": "bag"})
+    assert r.status_code == status.HTTP_200_OK
+    result = r.json()["data"]["results"][0]
+    assert result["min_price"] == "90.00"
+    assert result["offers_count"] == 2
+
+    r_prefix = client.get("/api/marketplace/commodities/", {"q": "ri"})
+    assert r_prefix.json()["data"]["count"] == 1
+
+
+@pytest.mark.django_db
+def test_bulk_reprice_refreshes_index(farmers, django_capture_on_commit_callbacks):
+    product = Product.objects.create(farmer=farmers[0], title="Beans", unit="kg", price="10.00", quantity="1")
+    with django_capture_on_commit_callbacks(execute=True):
+        services.bulk_reprice_products(Product.objects.filter(pk=product.pk), "percent", "50")
+    assert CommodityPrice.objects.get(title="beans").min_price == Decimal("15.00")
+
+
+@pytest.mark.django_db
+def test_keys_follow_the_database_normalisation(farmers, django_capture_on_commit_callbacks):
+    # Python's strip()/lower() would turn this into "épis" and miss the indexed row on delete
+    with django_capture_on_commit_callbacks(execute=True):
+        product = Product.objects.create(farmer=farmers[0], title=" Épis\t", unit="KG", price="4.00", quantity="1")
+    row = CommodityPrice.objects.get()
+    assert services.commodity_key(product.title, product.unit) == (row.title, row.unit)
+    with django_capture_on_commit_callbacks(execute=True):
+        product.delete()
+    assert not CommodityPrice.objects.exists()
+
+
+@pytest.mark.django_db
+def test_refresh_runs_after_commit_and_locks_the_row_before_reading_offers(farmers, monkeypatch):
+    product = Product.objects.create(farmer=farmers[0], title="Millet", unit="kg", price="8.00", quantity="1")
+    # still inside the saving transaction: nothing recomputed from an uncommitted snapshot
+    assert not CommodityPrice.objects.exists()
+
+    stale = CommodityPrice.objects.create(
+        title="millet", unit="kg", display_title="Millet", min_price=1, median_price=1, max_price=1, offers_count=9
+    )
+    real_offers = services._commodity_offers
+    seen = []
+
+    def checking_offers(keys):
+        # every key already has its (locked) row when offers are read
+        seen.append(CommodityPrice.objects.filter(title__in=[k[0] for k in keys]).count())
+        return real_offers(keys)
+
+    monkeypatch.setattr(services, "_commodity_offers", checking_offers)
+    services.refresh_commodity_prices({(product.title, product.unit), ("sorghum", "kg")})
+    assert seen == [1 + 1]
+    stale.refresh_from_db()
+    assert (stale.min_price, stale.offers_count) == (Decimal("8.00"), 1)
+    assert not CommodityPrice.objects.filter(title="sorghum").exists()
@@ -0,0 +1,114 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+
+from farmers.models import Farmer
+from marketplace.models import Product, InventoryRecord, InventoryCheckpoint, InventoryCheckpointRun
+from marketplace import services
+
+User = get_user_model()
+
+
+def _record(product, change_type, quantity, at):
+    record = InventoryRecord.objects.create(product=product, change_type=change_type, quantity=quantity)
+    InventoryRecord.objects.filter(pk=record.pk).update(created_at=at)
+    return record
+
+
+@pytest.fixture
+def product():
+    farmer = Farmer.objects.create(contact_name="Farmer Ledger")
+    return Product.objects.create(farmer=farmer, title="Yam", slug="yam", price="10.00", quantity="0.000")
+
+
+@pytest.mark.django_db
+def test_checkpoints_only_process_new_records(product):
+    now = timezone.now()
+    _record(product, "IN", 10, now - timedelta(days=3))
+    _record(product, "OUT", 4, now - timedelta(days=2))
+
+    assert services.write_inventory_checkpoints(as_of=now - timedelta(days=1)) == 1
+    assert InventoryCheckpoint.objects.get(product=product).balance == Decimal("6")
+
+    # No new records -> nothing to write
+    assert services.write_inventory_checkpoints(as_of=now - timedelta(hours=12)) == 0
+
+    _record(product, "RETURN", 1, now - timedelta(hours=6))
+    assert services.write_inventory_checkpoints(as_of=now) == 1
+    latest = InventoryCheckpoint.objects.filter(product=product).order_by("-as_of").first()
+    assert latest.balance == Decimal("7")
+
+
+@pytest.mark.django_db
+def test_get_stock_at_uses_checkpoint_plus_delta(product):
+    now = timezone.now()
+    _record(product, "IN", 10, now - timedelta(days=5))
+    _record(product, "OUT", 3, now - timedelta(days=4))
+    services.write_inventory_checkpoints(as_of=now - timedelta(days=3))
+    _record(product, "OUT", 2, now - timedelta(days=2))
+
+    assert services.get_stock_at(product.id, now - timedelta(days=6)) == Decimal("0")
+    assert services.get_stock_at(product.id, now - timedelta(days=4, hours=12)) == Decimal("10")
+    assert services.get_stock_at(product.id, now - timedelta(days=1)) == Decimal("5")
+
+    # Prove the checkpoint is used: older history no longer matters after it
+    InventoryRecord.objects.filter(created_at__lt=now - timedelta(days=3)).delete()
+    assert services.get_stock_at(product.id, now) == Decimal("5")
+
+
+@pytest.mark.django_db
+def test_detect_inventory_drift(product):
+    now = timezone.now()
+    farmer = product.farmer
+    in_sync = Product.objects.create(farmer=farmer, title="Rice", slug="rice", price="5.00", quantity="4.000")
+    _record(in_sync, "IN", 4, now - timedelta(days=2))
+    services.write_inventory_checkpoints(as_of=now - timedelta(days=1))
+
+    product.quantity = Decimal("3.000")
+    product.save(update_fields=["quantity"])
+    _record(product, "IN", 2, now - timedelta(hours=1))
+
+    drift = services.detect_inventory_drift()
+    assert [row["product_id"] for row in drift] == [product.id]
+    assert drift[0]["ledger"] == Decimal("2")
+    assert drift[0]["drift"] == Decimal("1")
+
+
+@pytest.mark.django_db
+def test_stock_at_and_drift_endpoints(client, product):
+    admin = User.objects.create_superuser(username="admin_ledger", password="p", email="admin_ledger@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+    _record(product, "IN", 5, timezone.now() - timedelta(days=1))
+
+    r = client.get(f"/api/marketplace/products/{product.id}/stock-at/")
+    assert r.status_code == status.HTTP_200_OK
+    assert Decimal(str(r.json()["data"]["stock"])) == Decimal("5")
+
+    r_bad = client.get(f"/api/marketplace/products/{product.id}/stock-at/", {"at": "yesterday"})
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
+
+    r_drift = client.get("/api/marketplace/products/inventory-drift/")
+    assert r_drift.status_code == status.HTTP_200_OK
+    assert len(r_drift.json()["data"]) == 1
+
+
+@pytest.mark.django_db
+def test_checkpoints_leave_unsettled_records_for_the_next_run(product):
+    now = timezone.now()
+    _record(product, "IN", 10, now - timedelta(hours=1))
+    # written "just now": may belong to a transaction that has not committed yet
+    _record(product, "IN", 5, now - timedelta(seconds=30))
+
+    assert services.write_inventory_checkpoints() == 1
+    run = InventoryCheckpointRun.objects.get()
+    assert run.processed_until < now - services.INVENTORY_CHECKPOINT_SETTLE + timedelta(seconds=1)
+    assert InventoryCheckpoint.objects.get(product=product).balance == Decimal("10")
+
+    # an explicit as_of never reaches past the settle window either
+    assert services.write_inventory_checkpoints(as_of=now + timedelta(hours=1)) == 0
+    assert services.get_stock_at(product.id, now) == Decimal("15")
@@ -54,3 +54,31 @@ def test_marketplace_inventory_requires_auth(client):
 
     r = client.get(f"/api/marketplace/products/{product.id}/inventory/")
     assert r.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_product_image_direct_upload(client, settings, tmp_path):
+    settings.DIRECT_UPLOAD_BACKEND = "core.uploads.LocalDirectUpload"
+    settings.DIRECT_UPLOAD_LOCAL_ROOT = str(tmp_path)
+    settings.DIRECT_UPLOAD_LOCAL_URL = "http://storage.test/uploads/"
+    admin = User.objects.create_superuser(username="admin_image", password="p", email="admin_image@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+    product = Product.objects.create(farmer=Farmer.objects.create(contact_name="Farmer Image"), title="Yam", price="5.00")
+
+    r_ticket = client.post(f"/api/marketplace/products/{product.id}/images/upload-ticket/")
+    assert r_ticket.status_code == status.HTTP_201_CREATED
+    ticket = r_ticket.json()["data"]
+
+    (tmp_path / ticket["key"]).parent.mkdir(parents=True)
+    (tmp_path / ticket["key"]).write_bytes(b"\x89PNG")
+    r = client.post(
+        f"/api/marketplace/products/{product.id}/images/confirm-upload/",
+        {"upload_ticket": ticket["ticket"], "upload": {}, "alt_text": "Fresh yam", "order": 1},
+        format="json",
+    )
+    assert r.status_code == status.HTTP_201_CREATED
+    image = product.images.get()
+    assert image.image_url == f"http://storage.test/uploads/{ticket['key']}"
+    assert (image.alt_text, image.order) == ("Fresh yam", 1)
@@ -1,29 +1,132 @@
 import pytest
+from django.core import mail
 
 from marketplace.task import send_low_stock_alerts
 from marketplace.models import Product, Category
 from farmers.models import Farmer
 
 
-@pytest.mark.django_db
-def test_send_low_stock_alerts(monkeypatch):
-    farmer = Farmer.objects.create(contact_name="Farmer Alert", email="farmer@example.com")
-    category = Category.objects.create(name="Cat", slug="cat")
-    Product.objects.create(
+def _product(farmer, title, quantity="1.000", **kwargs):
+    return Product.objects.create(
         farmer=farmer,
-        title="Beans",
-        slug="beans",
-        category=category,
+        title=title,
+        slug=title.lower(),
         price="10.00",
-        quantity="1.000",
+        quantity=quantity,
         min_order="1.000",
         is_active=True,
+        **kwargs,
     )
 
-    sent = {"count": 0}
-    def fake_send_mail(*args, **kwargs):
-        sent["count"] += 1
 
-    monkeypatch.setattr("marketplace.task.send_mail", fake_send_mail)
+@pytest.mark.django_db
+def test_send_low_stock_alerts():
+    farmer = Farmer.objects.create(contact_name="Farmer Alert", email="farmer@example.com")
+    category = Category.objects.create(name="Cat", slug="cat")
+    _product(farmer, "Beans", category=category)
+
     result = send_low_stock_alerts(threshold=2)
     assert result["alerts_sent"] == 1
+    assert len(mail.outbox) == 1
+    assert "Beans" in mail.outbox[0].subject
+
+
+@pytest.mark.django_db
+def test_low_stock_alerts_are_one_digest_per_farmer_over_one_connection(monkeypatch, django_assert_max_num_queries):
+    busy = Farmer.objects.create(contact_name="Busy Farmer", email="busy@example.com")
+    other = Farmer.objects.create(contact_name="Other Farmer", email="other@example.com")
+    no_email = Farmer.objects.create(contact_name="No Email")
+    for i in range(5):
+        _product(busy, f"Crop{i}")
+    _product(other, "Okra")
+    _product(no_email, "Yam")
+    _product(busy, "Plenty", quantity="50.000")
+
+    connections = {"count": 0}
+    from django.core import mail as django_mail
+    real_get_connection = django_mail.get_connection
+
+    def counting_get_connection(*args, **kwargs):
+        connections["count"] += 1
+        return real_get_connection(*args, **kwargs)
+
+    monkeypatch.setattr("marketplace.task.get_connection", counting_get_connection)
+    with django_assert_max_num_queries(2):
+        result = send_low_stock_alerts(threshold=2)
+
+    assert connections["count"] == 1
+    assert result["checked"] == 6
+    assert result["alerts_sent"] == 2
+    assert result["products_alerted"] == 6
+    busy_digest = next(m for m in mail.outbox if m.to == ["busy@example.com"])
+    assert all(f"Crop{i}" in busy_digest.body for i in range(5))
+    assert "Plenty" not in busy_digest.body
+
+
+@pytest.mark.django_db
+def test_low_stock_alerts_skip_products_already_alerted_until_they_change():
+    farmer = Farmer.objects.create(contact_name="Repeat", email="repeat@example.com")
+    beans = _product(farmer, "Beans")
+    _product(farmer, "Rice")
+
+    assert send_low_stock_alerts(threshold=2)["alerts_sent"] == 1
+    second = send_low_stock_alerts(threshold=2)
+    assert second["checked"] == 0
+    assert second["alerts_sent"] == 0
+
+    beans.quantity = "0.500"
+    beans.save(update_fields=["quantity", "updated_at"])
+    third = send_low_stock_alerts(threshold=2)
+    assert third["checked"] == 1
+    assert "Beans" in mail.outbox[-1].subject
+
+
+@pytest.mark.django_db
+def test_low_stock_alerts_retry_when_sending_fails(monkeypatch):
+    farmer = Farmer.objects.create(contact_name="Flaky", email="flaky@example.com")
+    _product(farmer, "Beans")
+
+    class BrokenConnection:
+        def send_messages(self, messages):
+            raise RuntimeError("smtp down")
+
+    monkeypatch.setattr("marketplace.task.get_connection", lambda: BrokenConnection())
+    assert send_low_stock_alerts(threshold=2)["alerts_sent"] == 0
+
+    monkeypatch.undo()
+    assert send_low_stock_alerts(threshold=2)["alerts_sent"] == 1
+
+
+@pytest.mark.django_db
+def test_low_stock_alerts_only_stamp_farmers_whose_digest_was_sent(monkeypatch):
+    ok = Farmer.objects.create(contact_name="Ok", email="ok@example.com")
+    bounced = Farmer.objects.create(contact_name="Bounced", email="bounced@example.com")
+    _product(ok, "Beans")
+    _product(bounced, "Rice")
+    _product(bounced, "Yam")
+
+    from django.core import mail as django_mail
+    real_connection = django_mail.get_connection()
+
+    class PartialConnection:
+        def open(self):
+            return real_connection.open()
+
+        def close(self):
+            return real_connection.close()
+
+        def send_messages(self, messages):
+            if messages[0].to == ["bounced@example.com"]:
+                return 0
+            return real_connection.send_messages(messages)
+
+    monkeypatch.setattr("marketplace.task.get_connection", lambda: PartialConnection())
+    result = send_low_stock_alerts(threshold=2)
+    assert (result["checked"], result["alerts_sent"], result["products_alerted"]) == (3, 1, 1)
+    assert set(Product.objects.filter(low_stock_alerted_at__isnull=False).values_list("title", flat=True)) == {"Beans"}
+
+    # the cursor stayed before the unsent products, so the next run retries only them
+    monkeypatch.undo()
+    retry = send_low_stock_alerts(threshold=2)
+    assert (retry["checked"], retry["alerts_sent"], retry["products_alerted"]) == (2, 1, 2)
+    assert mail.outbox[-1].to == ["bounced@example.com"]
@@ -0,0 +1,123 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from farmers.models import Farmer
+from marketplace.models import Product, PriceHistory
+from marketplace import services
+
+User = get_user_model()
+
+
+def _verified_user(**kwargs):
+    user = User.objects.create_user(password="StrongPass123", **kwargs)
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    return user
+
+
+@pytest.fixture
+def farmer():
+    return Farmer.objects.create(contact_name="Farmer Price")
+
+
+@pytest.mark.django_db
+def test_price_history_only_written_on_change(farmer):
+    product = Product.objects.create(farmer=farmer, title="Maize", price="10.00")
+    product.quantity = Decimal("3")
+    product.save()
+    assert PriceHistory.objects.count() == 0
+
+    product.price = Decimal("12.50")
+    product.save()
+    entry = PriceHistory.objects.get()
+    assert (entry.old_price, entry.new_price) == (Decimal("10.00"), Decimal("12.50"))
+
+
+@pytest.mark.django_db
+def test_bulk_reprice_uses_constant_queries(farmer):
+    small = [Product.objects.create(farmer=farmer, title=f"S{i}", price="10.00") for i in range(2)]
+    large = [Product.objects.create(farmer=farmer, title=f"L{i}", price="10.00") for i in range(30)]
+
+    with CaptureQueriesContext(connection) as small_ctx:
+        services.bulk_reprice_products(Product.objects.filter(pk__in=[p.pk for p in small]), "percent", "10")
+    with CaptureQueriesContext(connection) as large_ctx:
+        changed = services.bulk_reprice_products(Product.objects.filter(pk__in=[p.pk for p in large]), "absolute", "-2.5")
+
+    assert changed == 30
+    assert len(large_ctx.captured_queries) == len(small_ctx.captured_queries)
+    assert set(Product.objects.filter(pk__in=[p.pk for p in small]).values_list("price", flat=True)) == {Decimal("11.00")}
+    assert set(Product.objects.filter(pk__in=[p.pk for p in large]).values_list("price", flat=True)) == {Decimal("7.50")}
+    assert PriceHistory.objects.count() == 32
+
+
+@pytest.mark.django_db
+def test_bulk_reprice_never_goes_negative_and_validates_mode(farmer):
+    product = Product.objects.create(farmer=farmer, title="Eggs", price="1.00")
+    services.bulk_reprice_products(Product.objects.filter(pk=product.pk), "absolute", "-5")
+    product.refresh_from_db()
+    assert product.price == Decimal("0.00")
+    with pytest.raises(ValueError):
+        services.bulk_reprice_products(Product.objects.all(), "double", "2")
+
+
+@pytest.mark.django_db
+def test_reprice_endpoint_limits_farmers_to_their_products(client, farmer):
+    user = _verified_user(email="price_farmer@example.com", full_name="Price Farmer", role="farmer")
+    farmer.user = user
+    farmer.save()
+    other = Farmer.objects.create(contact_name="Other Farmer")
+    mine = Product.objects.create(farmer=farmer, title="Mine", price="10.00")
+    theirs = Product.objects.create(farmer=other, title="Theirs", price="10.00")
+
+    client.force_login(user)
+    r = client.post("/api/marketplace/products/reprice/", {"mode": "percent", "value": "50"}, format="json")
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["data"]["repriced"] == 1
+    mine.refresh_from_db()
+    theirs.refresh_from_db()
+    assert mine.price == Decimal("15.00")
+    assert theirs.price == Decimal("10.00")
+
+    r_bad = client.post("/api/marketplace/products/reprice/", {"mode": "percent", "value": "abc"}, format="json")
+    assert r_bad.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_price_history_endpoint_downsamples(client, farmer):
+    user = _verified_user(email="price_viewer@example.com", full_name="Viewer")
+    product = Product.objects.create(farmer=farmer, title="Beans", price="10.00")
+    start = timezone.now() - timedelta(days=100)
+    for day in range(100):
+        entry = PriceHistory.objects.create(product=product, old_price=Decimal(10 + day), new_price=Decimal(11 + day))
+        PriceHistory.objects.filter(pk=entry.pk).update(changed_at=start + timedelta(days=day, hours=1))
+
+    series = services.get_price_series(product, start=start, points=10)
+    assert len(series) <= 10
+    assert series[0]["price"] == Decimal("10")
+    assert series[-1]["price"] == Decimal("110")
+
+    client.force_login(user)
+    r = client.get(f"/api/marketplace/products/{product.id}/price-history/", {"points": "20"})
+    assert r.status_code == status.HTTP_200_OK
+    assert 2 <= len(r.json()["data"]) <= 20
+
+
+@pytest.mark.django_db
+def test_price_series_before_the_first_change_uses_the_replaced_price(farmer):
+    product = Product.objects.create(farmer=farmer, title="Cassava", price="100.00")
+    product.price = Decimal("150.00")
+    product.save()
+    changed_at = PriceHistory.objects.get().changed_at
+
+    window_start = changed_at - timedelta(days=3)
+    series = services.get_price_series(product, start=window_start, end=changed_at - timedelta(days=1))
+    assert [Decimal(point["price"]) for point in series] == [Decimal("100.00")]
+
+    untouched = Product.objects.create(farmer=farmer, title="Yam", price="80.00")
+    assert [Decimal(p["price"]) for p in services.get_price_series(untouched, start=window_start)] == [Decimal("80.00")]
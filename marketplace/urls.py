@@ -1,7 +1,7 @@
 # marketplace/urls.py
 from rest_framework.routers import DefaultRouter
 from .views import (
-    CategoryViewSet, ProductViewSet, ProductImageViewSet, InventoryRecordViewSet
+    CategoryViewSet, ProductViewSet, ProductImageViewSet, InventoryRecordViewSet, CommodityPriceViewSet
 )
 
 router = DefaultRouter()
@@ -9,5 +9,6 @@ router.register(r'categories', CategoryViewSet, basename='marketplace-category')
 router.register(r'products', ProductViewSet, basename='marketplace-product')
 router.register(r'product-images', ProductImageViewSet, basename='product-image')
 router.register(r'inventory-records', InventoryRecordViewSet, basename='inventory-record')
+router.register(r'commodities', CommodityPriceViewSet, basename='commodity-price')
 
 urlpatterns = router.urls
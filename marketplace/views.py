@@ -2,17 +2,26 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from accounts.permissions import IsEmailVerified
+from core.uploads import UploadError, confirm_upload, issue_upload_ticket
 
-from .models import Category, Product, ProductImage, InventoryRecord
+from .models import Category, Product, ProductImage, InventoryRecord, CommodityPrice
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
-    ProductCreateUpdateSerializer, ProductImageSerializer, InventoryRecordSerializer
+    ProductCreateUpdateSerializer, ProductImageSerializer, InventoryRecordSerializer,
+    CommodityPriceSerializer,
 )
 from .permissions import IsAdminOrReadOnly, IsFarmerOrAdmin
 from .filters import ProductFilter
-from .services import adjust_product_stock
+from .services import (
+    adjust_product_stock, get_stock_at, detect_inventory_drift, get_category_list_cache_version,
+    bulk_reprice_products, get_price_series, commodity_key,
+)
 
 try:
     from django_filters.rest_framework import DjangoFilterBackend
@@ -20,12 +29,25 @@ except ImportError:  # pragma: no cover - optional dependency for tests
     DjangoFilterBackend = None
 
 
+CATEGORY_LIST_CACHE_KEY = "marketplace_category_list_v1"
+CATEGORY_LIST_CACHE_TTL = 60 * 60 * 24  # counters are maintained, so the list only changes on invalidation
+
+
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly, IsEmailVerified]
     lookup_field = 'id'
 
+    def list(self, request, *args, **kwargs):
+        cache_key = f"{CATEGORY_LIST_CACHE_KEY}:{get_category_list_cache_version()}:{request.get_full_path()}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return Response(cached)
+        response = super().list(request, *args, **kwargs)
+        cache.set(cache_key, response.data, timeout=CATEGORY_LIST_CACHE_TTL)
+        return response
+
 
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.select_related('farmer', 'category').prefetch_related('images').all()
@@ -50,6 +72,11 @@ class ProductViewSet(viewsets.ModelViewSet):
             return
         serializer.save(created_by=user)
 
+    def perform_update(self, serializer):
+        # lets the price-history signal attribute the change
+        serializer.instance._price_changed_by = self.request.user
+        serializer.save()
+
     @action(detail=True, methods=['post'], permission_classes=[IsFarmerOrAdmin, IsEmailVerified])
     def adjust_stock(self, request, pk=None):
         """
@@ -70,6 +97,41 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(ProductDetailSerializer(updated, context={'request': request}).data)
 
+    @action(detail=True, methods=['post'], url_path='images/upload-ticket', permission_classes=[IsFarmerOrAdmin, IsEmailVerified])
+    def image_upload_ticket(self, request, pk=None):
+        """
+        Short-lived signed ticket for uploading a product image straight to
+        storage; finish with images/confirm-upload.
+        """
+        product = self.get_object()
+        try:
+            ticket = issue_upload_ticket('product_image', product.pk, request.user)
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(ticket, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='images/confirm-upload', permission_classes=[IsFarmerOrAdmin, IsEmailVerified])
+    def confirm_image_upload(self, request, pk=None):
+        """
+        Attach a directly uploaded image to the product.
+        payload: {"upload_ticket": "...", "upload": {<storage response>}, "alt_text": "...", "order": 0}
+        """
+        product = self.get_object()
+        try:
+            order = int(request.data.get('order', 0))
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid order"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            image_url = confirm_upload(
+                request.data.get('upload_ticket'), request.data.get('upload') or {}, 'product_image', product.pk, request.user
+            )
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        image = ProductImage.objects.create(
+            product=product, image_url=image_url, alt_text=request.data.get('alt_text', '')[:255], order=max(order, 0)
+        )
+        return Response(ProductImageSerializer(image).data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
     def inventory(self, request, pk=None):
         product = self.get_object()
@@ -81,6 +143,72 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = InventoryRecordSerializer(records, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='stock-at', permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
+    def stock_at(self, request, pk=None):
+        """
+        Ledger stock at a point in time. Query: ?at=2025-01-31T23:59:59Z (defaults to now)
+        """
+        product = self.get_object()
+        at_param = request.query_params.get('at')
+        at = parse_datetime(at_param) if at_param else timezone.now()
+        if at is None:
+            return Response({"detail": "Invalid at timestamp"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return Response({"product": str(product.id), "at": at.isoformat(), "stock": get_stock_at(product.id, at)})
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
+    def reprice(self, request):
+        """
+        Bulk reprice the products matched by the usual list filters (query string)
+        and optional ids. Farmers can only reprice their own products.
+        payload: {"mode": "percent", "value": "-10", "ids": ["<uuid>", ...]}
+        """
+        user = request.user
+        queryset = self.filter_queryset(self.get_queryset())
+        if not user.is_staff:
+            farmer_profile = getattr(user, 'farmer_profile', None)
+            if farmer_profile is None:
+                return Response({"detail": "Not permitted."}, status=status.HTTP_403_FORBIDDEN)
+            queryset = queryset.filter(farmer=farmer_profile)
+        ids = request.data.get('ids')
+        if ids:
+            queryset = queryset.filter(pk__in=ids)
+        try:
+            changed = bulk_reprice_products(
+                queryset, request.data.get('mode'), request.data.get('value'), changed_by=user
+            )
+        except (ValueError, ArithmeticError, DjangoValidationError) as e:
+            return Response({"detail": str(e) or "Invalid value"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"repriced": changed})
+
+    @action(detail=True, methods=['get'], url_path='price-history', permission_classes=[permissions.IsAuthenticated, IsEmailVerified])
+    def price_history(self, request, pk=None):
+        """
+        Downsampled price series. Query: ?start=<iso>&end=<iso>&points=100
+        """
+        product = self.get_object()
+        bounds = {}
+        for name in ('start', 'end'):
+            raw = request.query_params.get(name)
+            if raw:
+                parsed = parse_datetime(raw)
+                if parsed is None:
+                    return Response({"detail": f"Invalid {name} timestamp"}, status=status.HTTP_400_BAD_REQUEST)
+                bounds[name] = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+        try:
+            points = min(max(int(request.query_params.get('points', 100)), 2), 1000)
+        except ValueError:
+            return Response({"detail": "Invalid points"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_price_series(product, points=points, **bounds))
+
+    @action(detail=False, methods=['get'], url_path='inventory-drift', permission_classes=[permissions.IsAdminUser, IsEmailVerified])
+    def inventory_drift(self, request):
+        """
+        Admin-only: products whose quantity disagrees with the inventory ledger.
+        """
+        return Response(detect_inventory_drift())
+
 
 class ProductImageViewSet(viewsets.ModelViewSet):
     queryset = ProductImage.objects.select_related('product').all()
@@ -92,3 +220,25 @@ class InventoryRecordViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = InventoryRecord.objects.select_related('product', 'performed_by').all()
     serializer_class = InventoryRecordSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsEmailVerified]
+
+
+class CommodityPriceViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Cross-farmer price comparison served from the materialised commodity index.
+    ?title=maize&unit=kg is an exact (normalised) lookup; ?q=mai is a title prefix search.
+    """
+    queryset = CommodityPrice.objects.all()
+    serializer_class = CommodityPriceSerializer
+    permission_classes = [IsAdminOrReadOnly, IsEmailVerified]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        if params.get('title'):
+            title, unit = commodity_key(params['title'], params.get('unit', ''))
+            qs = qs.filter(title=title)
+            if unit:
+                qs = qs.filter(unit=unit)
+        elif params.get('q'):
+            qs = qs.filter(title__startswith=commodity_key(params['q'], '')[0])
+        return qs
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
+
+    def ready(self):
+        # keep the compiled template cache in step with template edits;
+        # QuerySet.update() bypasses this, call
+        # services.invalidate_notification_template_cache() after bulk edits
+        from django.db.models.signals import post_delete, post_save
+
+        from .models import NotificationTemplate
+        from .services import notification_template_changed
+
+        post_save.connect(notification_template_changed, sender=NotificationTemplate,
+                          dispatch_uid="notification_template_saved")
+        post_delete.connect(notification_template_changed, sender=NotificationTemplate,
+                            dispatch_uid="notification_template_deleted")
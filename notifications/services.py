@@ -1,6 +1,9 @@
 import logging
+import time
+import uuid
 from django.template import Template, Context
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.utils import timezone
 from django.db import transaction
@@ -58,23 +61,122 @@ class NotificationDispatchError(Exception):
     """Custom exception for notification dispatch failures"""
     pass
 
-def render_notification_template(event, channel, context):
+NOTIFICATION_TEMPLATE_CACHE_VERSION_KEY = "notifications:templates:version"
+NOTIFICATION_TEMPLATE_VERSION_CHECK_SECONDS = getattr(settings, "NOTIFICATION_TEMPLATE_VERSION_CHECK_SECONDS", 5)
+
+_template_table = None
+_template_checked_at = 0.0
+
+
+class CompiledNotificationTemplate:
+    """Pre-compiled subject/body templates of one NotificationTemplate, tagged with its updated_at."""
+
+    def __init__(self, template):
+        self.updated_at = template.updated_at
+        self.subject = Template(template.subject) if template.subject else None
+        self.body_text = Template(template.body_text)
+        self.body_html = Template(template.body_html) if template.body_html else None
+
+    def render(self, context):
+        subject = self.subject.render(Context(context)) if self.subject else ""
+        body_text = self.body_text.render(Context(context))
+        body_html = self.body_html.render(Context(context)) if self.body_html else None
+        return subject, body_text, body_html
+
+
+class NotificationTemplateTable:
+    """
+    Every active NotificationTemplate, compiled once and keyed by
+    (event, channel). Reloading keeps the compiled entries whose
+    updated_at has not changed, so editing one template recompiles only it.
+    """
+
+    def __init__(self, version, templates):
+        self.version = version
+        self.templates = templates
+
+    @classmethod
+    def load(cls, version, previous=None):
+        reusable = previous.templates if previous is not None else {}
+        templates = {}
+        for template in NotificationTemplate.objects.filter(is_active=True):
+            key = (template.event, template.channel)
+            compiled = reusable.get(key)
+            if compiled is None or compiled.updated_at != template.updated_at:
+                compiled = CompiledNotificationTemplate(template)
+            templates[key] = compiled
+        return cls(version, templates)
+
+    def get(self, event, channel):
+        return self.templates.get((event, channel))
+
+
+def get_notification_template_cache_version():
+    version = cache.get(NOTIFICATION_TEMPLATE_CACHE_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(NOTIFICATION_TEMPLATE_CACHE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_notification_template_cache():
+    """Bump the shared template version so every process reloads its compiled templates."""
+    global _template_checked_at
+    cache.set(NOTIFICATION_TEMPLATE_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    # keep the table so unchanged templates are not recompiled, but re-check now
+    _template_checked_at = None
+
+
+def get_notification_template_table():
+    """
+    Process-wide NotificationTemplateTable, reloaded only when the shared
+    cache version changes. The version itself is re-read at most every
+    NOTIFICATION_TEMPLATE_VERSION_CHECK_SECONDS.
+    """
+    global _template_table, _template_checked_at
+    now = time.monotonic()
+    table, checked_at = _template_table, _template_checked_at
+    if table is not None and checked_at is not None and now - checked_at < NOTIFICATION_TEMPLATE_VERSION_CHECK_SECONDS:
+        return table
+    version = get_notification_template_cache_version()
+    if table is None or table.version != version:
+        table = _template_table = NotificationTemplateTable.load(version, previous=table)
+    _template_checked_at = now
+    return table
+
+
+def warm_notification_templates():
+    """
+    Compile every active template at process start so the first broadcast
+    does not pay for it. Best effort: returns the number of templates, or 0
+    when the database is not reachable yet.
+    """
     try:
-        template = NotificationTemplate.objects.get(
-            event=event,
-            channel=channel,
-            is_active=True
-        )
-    except NotificationTemplate.DoesNotExist:
-        raise NotificationDispatchError(
-            f"No active template for event={event}, channel={channel}"
-        )
+        return len(get_notification_template_table().templates)
+    except Exception:
+        logger.warning("Could not warm notification templates", exc_info=True)
+        return 0
+
+
+def render_notification_template(event, channel, context):
+    compiled = get_notification_template_table().get(event, channel)
+    if compiled is None:
+        # not in this process's table yet, e.g. created in a transaction that
+        # has not committed (the version is only bumped on commit)
+        template = NotificationTemplate.objects.filter(event=event, channel=channel, is_active=True).first()
+        if template is None:
+            raise NotificationDispatchError(
+                f"No active template for event={event}, channel={channel}"
+            )
+        compiled = CompiledNotificationTemplate(template)
+    return compiled.render(context)
+
+
+def notification_template_changed(sender, **kwargs):
+    # after commit, so no process recompiles the old row under the new version
+    transaction.on_commit(invalidate_notification_template_cache)
 
-    subject = Template(template.subject).render(Context(context)) if template.subject else ""
-    body_text = Template(template.body_text).render(Context(context))
-    body_html = Template(template.body_html).render(Context(context)) if template.body_html else None
 
-    return subject, body_text, body_html
 def _get_user_phone(user):
     for attr in ['customerprofile', 'farmerprofile', 'vendorprofile', 'logisticsagentprofile']:
         profile = getattr(user, attr, None)
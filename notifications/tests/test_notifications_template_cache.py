@@ -0,0 +1,127 @@
+import os
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+
+from notifications.models import NotificationTemplate, NotificationChannel
+from notifications import services
+
+User = get_user_model()
+
+
+def _template(**kwargs):
+    defaults = {
+        "event": "order.shipped",
+        "channel": NotificationChannel.EMAIL,
+        "subject": "Order {{ order_id }} shipped",
+        "body_text": "Hi {{ user.full_name }}, order {{ order_id }} is on its way.",
+        "body_html": "<p>Hi {{ user.full_name }}, order <b>{{ order_id }}</b> is on its way.</p>",
+        "is_active": True,
+    }
+    defaults.update(kwargs)
+    return NotificationTemplate.objects.create(**defaults)
+
+
+def _render_uncached(event, channel, context):
+    # rendering as it was before the cache: one query and three compilations per message
+    template = NotificationTemplate.objects.get(event=event, channel=channel, is_active=True)
+    subject = Template(template.subject).render(Context(context)) if template.subject else ""
+    body_text = Template(template.body_text).render(Context(context))
+    body_html = Template(template.body_html).render(Context(context)) if template.body_html else None
+    return subject, body_text, body_html
+
+
+@pytest.mark.django_db
+def test_repeat_renders_hit_no_database(django_capture_on_commit_callbacks):
+    user = User.objects.create_user(email="cache_render@example.com", password="p", full_name="Ada")
+    with django_capture_on_commit_callbacks(execute=True):
+        _template()
+    assert services.warm_notification_templates() == NotificationTemplate.objects.filter(is_active=True).count()
+    compiled = services.get_notification_template_table().get("order.shipped", NotificationChannel.EMAIL)
+
+    with CaptureQueriesContext(connection) as ctx:
+        for order_id in range(20):
+            subject, body_text, body_html = services.render_notification_template(
+                "order.shipped", NotificationChannel.EMAIL, {"user": user, "order_id": order_id}
+            )
+    assert len(ctx.captured_queries) == 0
+    assert subject == "Order 19 shipped"
+    assert body_text == "Hi Ada, order 19 is on its way."
+    assert body_html == "<p>Hi Ada, order <b>19</b> is on its way.</p>"
+    assert services.get_notification_template_table().get("order.shipped", NotificationChannel.EMAIL) is compiled
+
+
+@pytest.mark.django_db
+def test_saving_a_template_invalidates_only_that_entry_on_commit(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        shipped = _template()
+        _template(event="order.created", body_text="Created", body_html="", subject="")
+    table = services.get_notification_template_table()
+    created_entry = table.get("order.created", NotificationChannel.EMAIL)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        shipped.body_text = "Shipped {{ order_id }}"
+        shipped.save()
+        # the shared version is only bumped once the edit commits
+        _, body_text, _ = services.render_notification_template(
+            "order.shipped", NotificationChannel.EMAIL, {"order_id": 7}
+        )
+        assert body_text == "Hi , order 7 is on its way."
+    _, body_text, _ = services.render_notification_template("order.shipped", NotificationChannel.EMAIL, {"order_id": 7})
+    assert body_text == "Shipped 7"
+    assert services.get_notification_template_table().get("order.created", NotificationChannel.EMAIL) is created_entry
+
+    with django_capture_on_commit_callbacks(execute=True):
+        shipped.is_active = False
+        shipped.save()
+    with pytest.raises(services.NotificationDispatchError):
+        services.render_notification_template("order.shipped", NotificationChannel.EMAIL, {})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        NotificationTemplate.objects.filter(event="order.created").delete()
+    with pytest.raises(services.NotificationDispatchError):
+        services.render_notification_template("order.created", NotificationChannel.EMAIL, {})
+
+
+@pytest.mark.django_db
+def test_template_created_before_commit_is_rendered_from_the_database():
+    services.warm_notification_templates()
+    _template(event="order.paid", subject="", body_html="", body_text="Paid {{ order_id }}")
+    assert services.render_notification_template("order.paid", NotificationChannel.EMAIL, {"order_id": 3}) == (
+        "", "Paid 3", None,
+    )
+
+
+def test_warm_up_never_raises_without_a_database():
+    # no django_db mark: database access raises, warm-up must swallow it
+    assert services.warm_notification_templates() == 0
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="benchmark; set RUN_BENCHMARKS=1 to run")
+@pytest.mark.django_db
+def test_benchmark_broadcast_rendering_messages_per_second(record_property, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(email="cache_bench@example.com", password="p", full_name="Bench")
+    with django_capture_on_commit_callbacks(execute=True):
+        _template()
+    messages = 2000
+
+    started = time.perf_counter()
+    for order_id in range(messages):
+        before = _render_uncached("order.shipped", NotificationChannel.EMAIL, {"user": user, "order_id": order_id})
+    record_property("uncached_messages_per_second", round(messages / (time.perf_counter() - started)))
+
+    services.warm_notification_templates()
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        for order_id in range(messages):
+            after = services.render_notification_template(
+                "order.shipped", NotificationChannel.EMAIL, {"user": user, "order_id": order_id}
+            )
+    record_property("cached_messages_per_second", round(messages / (time.perf_counter() - started)))
+
+    assert after == before
+    assert len(ctx.captured_queries) == 0
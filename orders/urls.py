@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, OrderCreateAPIView
+from .views import OrderViewSet, OrderCreateAPIView, order_status_stream
 
 router = DefaultRouter()
 router.register('', OrderViewSet, basename='order')
 
 urlpatterns = [
     path('create/', OrderCreateAPIView.as_view(), name='order-create'),  # ✅ BEFORE router
+    path('<int:pk>/stream/', order_status_stream, name='order-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
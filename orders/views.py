@@ -2,11 +2,16 @@ from rest_framework import viewsets, permissions, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from .models import Order
 from .serializers import OrderSerializer
 import logging
 from accounts.permissions import IsEmailVerified
 from core.logging_utils import log_event
+from core.pubsub import publish_on_commit
+from core.streams import status_stream_response
 
 admin_logger = logging.getLogger('admin_actions')
 
@@ -93,6 +98,13 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         order.status = new_status
         order.save()
+        publish_on_commit(f"order:{order.id}", {
+            "event": "order.status",
+            "order_id": order.id,
+            "old_status": old_status,
+            "status": new_status,
+            "at": timezone.now().isoformat(),
+        })
 
         admin_logger.info(
             f"Admin {request.user.username} updated order {order.id} "
@@ -112,3 +124,17 @@ class OrderViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+
+# ----------------------------
+# Status stream (SSE / long-poll) for the order owner and staff
+# ----------------------------
+async def order_status_stream(request, pk):
+    def resolve(user):
+        order = get_object_or_404(Order, pk=pk)
+        if not (user.is_staff or order.user_id == user.pk):
+            raise PermissionDenied
+        snapshot = {"order_id": order.id, "status": order.status, "updated_at": order.updated_at}
+        return f"order:{order.id}", snapshot
+
+    return await status_stream_response(request, resolve)
+
@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import GeneratedReport
+from .models import GeneratedReport, FarmerMonthlyRollup, FarmerRollupRefresh, LogisticsDailyKpi
 
 @admin.register(GeneratedReport)
 class GeneratedReportAdmin(admin.ModelAdmin):
@@ -19,3 +19,26 @@ class GeneratedReportAdmin(admin.ModelAdmin):
 
 	def has_delete_permission(self, request, obj=None):
 		return False
+
+
+@admin.register(FarmerMonthlyRollup)
+class FarmerMonthlyRollupAdmin(admin.ModelAdmin):
+	list_display = ("farmer", "month", "farmer_product", "listing", "approved_quantity", "stock_in", "stock_out", "is_closed")
+	list_filter = ("is_closed", "month")
+	raw_id_fields = ("farmer", "farmer_product", "listing")
+	readonly_fields = ("refreshed_at",)
+
+
+@admin.register(FarmerRollupRefresh)
+class FarmerRollupRefreshAdmin(admin.ModelAdmin):
+	list_display = ("started_at", "keys_refreshed", "full_rebuild")
+	list_filter = ("full_rebuild",)
+	readonly_fields = ("started_at", "keys_refreshed", "full_rebuild")
+
+
+@admin.register(LogisticsDailyKpi)
+class LogisticsDailyKpiAdmin(admin.ModelAdmin):
+	list_display = ("day", "dimension", "key", "deliveries", "failed", "on_time", "with_eta", "computed_at")
+	list_filter = ("dimension", "day")
+	search_fields = ("key",)
+	readonly_fields = ("computed_at",)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
+
+    def ready(self):
+        # import signals to queue rollup keys left behind by edited/deleted supply records
+        import reports.signals  # noqa: F401
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reports.services import refresh_farmer_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Incrementally refresh farmer monthly rollups (use --full to rebuild every month, including closed ones, "
+        "e.g. after bulk edits or deletes that bypass model signals)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute all months from scratch")
+
+    def handle(self, *args, **options):
+        result = refresh_farmer_rollups(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {result['refreshed']} rollup rows; closed {result['closed']}."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from reports.services import refresh_logistics_kpis
+
+
+class Command(BaseCommand):
+    help = "Store logistics KPIs for recently closed days (use --rebuild to recompute days already stored)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="How many of the latest closed days to cover")
+        parser.add_argument("--rebuild", action="store_true", help="Recompute those days even if already stored")
+
+    def handle(self, *args, **options):
+        stored = refresh_logistics_kpis(days=options["days"], rebuild=options["rebuild"])
+        self.stdout.write(self.style.SUCCESS(f"Stored logistics KPIs for {stored} day(s)."))
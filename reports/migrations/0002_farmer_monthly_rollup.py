@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0003_farmer_directory_search'),
+        ('marketplace', '0006_commodity_price_index'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('approved_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('pending_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('approved_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('rejected_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('completed_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('stock_in', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('stock_out', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('is_closed', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField()),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='farmers.farmer')),
+                ('farmer_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farmers.farmerproduct')),
+                ('listing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.product')),
+            ],
+            options={
+                'verbose_name': 'Farmer Monthly Rollup',
+                'verbose_name_plural': 'Farmer Monthly Rollups',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['farmer', 'month'], name='reports_far_farmer__28efd7_idx'), models.Index(fields=['month', 'is_closed'], name='reports_far_month_9c5fc9_idx'), models.Index(fields=['refreshed_at'], name='reports_far_refresh_dfce67_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('farmer_product__isnull', False)), fields=('farmer', 'month', 'farmer_product'), name='uniq_rollup_farmer_product_month'), models.UniqueConstraint(condition=models.Q(('listing__isnull', False)), fields=('farmer', 'month', 'listing'), name='uniq_rollup_listing_month'), models.UniqueConstraint(condition=models.Q(('farmer_product__isnull', True), ('listing__isnull', True)), fields=('farmer', 'month'), name='uniq_rollup_unlinked_supply_month')],
+            },
+        ),
+    ]
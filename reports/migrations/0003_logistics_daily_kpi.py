@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_farmer_monthly_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogisticsDailyKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(choices=[('all', 'All dispatches'), ('agent', 'Agent'), ('zone', 'Dropoff zone')], max_length=10)),
+                ('key', models.CharField(blank=True, help_text='Agent id or zone; empty for all dispatches', max_length=255)),
+                ('deliveries', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0, help_text='Dispatches that ended FAILED or RETURNED')),
+                ('with_eta', models.PositiveIntegerField(default=0, help_text='Deliveries that had an estimated delivery time')),
+                ('on_time', models.PositiveIntegerField(default=0)),
+                ('pickup_to_delivery_count', models.PositiveIntegerField(default=0)),
+                ('pickup_to_delivery_seconds', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Logistics Daily KPI',
+                'verbose_name_plural': 'Logistics Daily KPIs',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'dimension', 'key'), name='uniq_logistics_kpi_day_key')],
+            },
+        ),
+    ]
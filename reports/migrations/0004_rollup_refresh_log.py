@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0004_document_review_queue'),
+        ('reports', '0003_logistics_daily_kpi'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerRollupRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('keys_refreshed', models.PositiveIntegerField(default=0)),
+                ('full_rebuild', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Farmer Rollup Refresh',
+                'verbose_name_plural': 'Farmer Rollup Refreshes',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FarmerRollupDirtyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('farmer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='farmers.farmer')),
+                ('farmer_product', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='farmers.farmerproduct')),
+            ],
+            options={
+                'verbose_name': 'Farmer Rollup Dirty Key',
+                'verbose_name_plural': 'Farmer Rollup Dirty Keys',
+            },
+        ),
+    ]
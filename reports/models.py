@@ -36,3 +36,149 @@ class GeneratedReport(models.Model):
 
 	def __str__(self):
 		return f"{self.get_report_type_display()} report at {self.generated_at:%Y-%m-%d %H:%M:%S}"
+
+
+class FarmerMonthlyRollup(models.Model):
+	"""
+	Pre-aggregated monthly supply and stock figures per farmer and product.
+	Supply columns come from farmers.SupplyRecord (keyed by farmer_product),
+	stock columns from marketplace.InventoryRecord (keyed by listing), so a row
+	has at most one of the two product references set.
+	Maintained incrementally by reports.services.refresh_farmer_rollups; rows
+	for closed months are frozen (is_closed) and no longer recomputed.
+	"""
+	farmer = models.ForeignKey("farmers.Farmer", on_delete=models.CASCADE, related_name="monthly_rollups")
+	farmer_product = models.ForeignKey(
+		"farmers.FarmerProduct", on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+	)
+	listing = models.ForeignKey("marketplace.Product", on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+	month = models.DateField(help_text="First day of the month")
+
+	pending_count = models.PositiveIntegerField(default=0)
+	approved_count = models.PositiveIntegerField(default=0)
+	rejected_count = models.PositiveIntegerField(default=0)
+	completed_count = models.PositiveIntegerField(default=0)
+	pending_quantity = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+	approved_quantity = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+	rejected_quantity = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+	completed_quantity = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+	stock_in = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+	stock_out = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+
+	is_closed = models.BooleanField(default=False)
+	refreshed_at = models.DateTimeField()
+
+	class Meta:
+		ordering = ["-month"]
+		verbose_name = "Farmer Monthly Rollup"
+		verbose_name_plural = "Farmer Monthly Rollups"
+		indexes = [
+			models.Index(fields=["farmer", "month"]),
+			models.Index(fields=["month", "is_closed"]),
+			models.Index(fields=["refreshed_at"]),
+		]
+		constraints = [
+			models.UniqueConstraint(
+				fields=["farmer", "month", "farmer_product"],
+				condition=models.Q(farmer_product__isnull=False),
+				name="uniq_rollup_farmer_product_month",
+			),
+			models.UniqueConstraint(
+				fields=["farmer", "month", "listing"],
+				condition=models.Q(listing__isnull=False),
+				name="uniq_rollup_listing_month",
+			),
+			models.UniqueConstraint(
+				fields=["farmer", "month"],
+				condition=models.Q(farmer_product__isnull=True, listing__isnull=True),
+				name="uniq_rollup_unlinked_supply_month",
+			),
+		]
+
+	def __str__(self):
+		return f"{self.farmer_id} {self.month:%Y-%m}"
+
+
+class FarmerRollupRefresh(models.Model):
+	"""
+	One run of reports.services.refresh_farmer_rollups. The latest run's
+	started_at is the next incremental run's watermark, so it advances even
+	when a run found nothing to recompute.
+	"""
+	started_at = models.DateTimeField()
+	keys_refreshed = models.PositiveIntegerField(default=0)
+	full_rebuild = models.BooleanField(default=False)
+
+	class Meta:
+		ordering = ["-id"]
+		verbose_name = "Farmer Rollup Refresh"
+		verbose_name_plural = "Farmer Rollup Refreshes"
+
+	def __str__(self):
+		return f"{self.started_at:%Y-%m-%d %H:%M} ({self.keys_refreshed} keys)"
+
+
+class FarmerRollupDirtyKey(models.Model):
+	"""
+	A supply (farmer, farmer_product, month) that no current SupplyRecord may
+	point at any more: the previous key of a record whose farmer, product or
+	supply_date changed, or the key of a deleted record. Written by
+	reports.signals and consumed by the next refresh_farmer_rollups. The
+	references are unconstrained so keys of deleted farmers and products can
+	still be queued.
+	"""
+	farmer = models.ForeignKey(
+		"farmers.Farmer", on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+	)
+	farmer_product = models.ForeignKey(
+		"farmers.FarmerProduct", on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+		related_name="+",
+	)
+	month = models.DateField(help_text="First day of the month")
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		verbose_name = "Farmer Rollup Dirty Key"
+		verbose_name_plural = "Farmer Rollup Dirty Keys"
+
+	def __str__(self):
+		return f"{self.farmer_id} {self.farmer_product_id or '-'} {self.month:%Y-%m}"
+
+
+class LogisticsDailyKpi(models.Model):
+	"""
+	Delivery KPIs for one closed day: for all dispatches (dimension "all",
+	empty key), per assigned agent and per dropoff zone. Stored by
+	reports.services.store_logistics_kpis once a day can no longer change;
+	open days are computed live. The "all" row is always written, so its
+	presence marks a day as stored.
+	"""
+	DIMENSION_CHOICES = [
+		("all", "All dispatches"),
+		("agent", "Agent"),
+		("zone", "Dropoff zone"),
+	]
+
+	day = models.DateField()
+	dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+	key = models.CharField(max_length=255, blank=True, help_text="Agent id or zone; empty for all dispatches")
+
+	deliveries = models.PositiveIntegerField(default=0)
+	failed = models.PositiveIntegerField(default=0, help_text="Dispatches that ended FAILED or RETURNED")
+	with_eta = models.PositiveIntegerField(default=0, help_text="Deliveries that had an estimated delivery time")
+	on_time = models.PositiveIntegerField(default=0)
+	pickup_to_delivery_count = models.PositiveIntegerField(default=0)
+	pickup_to_delivery_seconds = models.FloatField(default=0)
+
+	computed_at = models.DateTimeField()
+
+	class Meta:
+		ordering = ["-day"]
+		verbose_name = "Logistics Daily KPI"
+		verbose_name_plural = "Logistics Daily KPIs"
+		constraints = [
+			models.UniqueConstraint(fields=["day", "dimension", "key"], name="uniq_logistics_kpi_day_key"),
+		]
+
+	def __str__(self):
+		return f"{self.day} {self.dimension} {self.key or '*'}: {self.deliveries} delivered"
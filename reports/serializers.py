@@ -42,3 +42,57 @@ class DashboardSummarySerializer(serializers.Serializer):
     orders = OrderReportSerializer()
     payments = PaymentReportSerializer()
     reviews = ReviewReportSerializer()
+
+class RollupTotalsSerializer(serializers.Serializer):
+    pending_count = serializers.IntegerField()
+    approved_count = serializers.IntegerField()
+    rejected_count = serializers.IntegerField()
+    completed_count = serializers.IntegerField()
+    pending_quantity = serializers.DecimalField(max_digits=16, decimal_places=3)
+    approved_quantity = serializers.DecimalField(max_digits=16, decimal_places=3)
+    rejected_quantity = serializers.DecimalField(max_digits=16, decimal_places=3)
+    completed_quantity = serializers.DecimalField(max_digits=16, decimal_places=3)
+    stock_in = serializers.DecimalField(max_digits=16, decimal_places=3)
+    stock_out = serializers.DecimalField(max_digits=16, decimal_places=3)
+
+class MonthlyRollupSerializer(RollupTotalsSerializer):
+    month = serializers.DateField()
+
+class FarmerStatementSerializer(serializers.Serializer):
+    farmer = serializers.UUIDField()
+    start_month = serializers.DateField()
+    end_month = serializers.DateField()
+    months = MonthlyRollupSerializer(many=True)
+
+class SupplyReportSerializer(serializers.Serializer):
+    totals = RollupTotalsSerializer()
+    months = MonthlyRollupSerializer(many=True)
+
+class LogisticsKpiSerializer(serializers.Serializer):
+    deliveries = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    success_rate = serializers.FloatField(allow_null=True)
+    on_time_rate = serializers.FloatField(allow_null=True)
+    avg_pickup_to_delivery_minutes = serializers.FloatField(allow_null=True)
+
+class LogisticsDayKpiSerializer(LogisticsKpiSerializer):
+    day = serializers.DateField()
+
+class LogisticsAgentKpiSerializer(LogisticsKpiSerializer):
+    agent = serializers.CharField()
+    agent_name = serializers.CharField()
+    deliveries_per_day = serializers.FloatField()
+    days = LogisticsDayKpiSerializer(many=True)
+
+class LogisticsZoneKpiSerializer(LogisticsKpiSerializer):
+    zone = serializers.CharField(allow_blank=True)
+    deliveries_per_day = serializers.FloatField()
+    days = LogisticsDayKpiSerializer(many=True)
+
+class LogisticsReportSerializer(serializers.Serializer):
+    start_day = serializers.DateField()
+    end_day = serializers.DateField()
+    totals = LogisticsKpiSerializer()
+    days = LogisticsDayKpiSerializer(many=True)
+    agents = LogisticsAgentKpiSerializer(many=True)
+    zones = LogisticsZoneKpiSerializer(many=True)
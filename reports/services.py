@@ -1,8 +1,38 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Count, Sum, Avg, Q
+from django.db.models import Count, Sum, Avg, Q, Min, F, DateField, Window
+from django.db.models.functions import RowNumber, TruncMonth
 from accounts.models import User
 from orders.models import Order
 from reviews.models import Review
+from farmers.models import SupplyRecord
+from logistics.models import DispatchStatusUpdate, LogisticsAgent
+from logistics.services import dispatch_area
+from marketplace.models import InventoryRecord
+from .models import FarmerMonthlyRollup, FarmerRollupDirtyKey, FarmerRollupRefresh, LogisticsDailyKpi
+
+# A month is frozen this many days after it ends; later corrections need a rebuild
+ROLLUP_CLOSE_GRACE_DAYS = getattr(settings, "FARMER_ROLLUP_CLOSE_GRACE_DAYS", 7)
+# Re-scan a little before the watermark to catch transactions that committed late
+ROLLUP_REFRESH_OVERLAP = timedelta(minutes=10)
+ROLLUP_SUPPLY_FIELDS = (
+    "pending_count", "approved_count", "rejected_count", "completed_count",
+    "pending_quantity", "approved_quantity", "rejected_quantity", "completed_quantity",
+)
+ROLLUP_STOCK_FIELDS = ("stock_in", "stock_out")
+
+# A day's logistics KPIs are stored once it is this many days old (late offline syncs settle first)
+LOGISTICS_KPI_CLOSE_GRACE_DAYS = getattr(settings, "LOGISTICS_KPI_CLOSE_GRACE_DAYS", 2)
+LOGISTICS_KPI_MAX_DAYS = 366
+LOGISTICS_KPI_FIELDS = (
+    "deliveries", "failed", "with_eta", "on_time", "pickup_to_delivery_count", "pickup_to_delivery_seconds",
+)
+FAILED_DISPATCH_STATUSES = ("FAILED", "RETURNED")
 
 
 def get_user_report(start_date, end_date):
@@ -77,3 +107,427 @@ def get_dashboard_summary(start_date, end_date):
         "payments": get_payment_report(start_date, end_date),
         "reviews": get_review_report(start_date, end_date),
     }
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def rollup_month(value):
+    """The rollup month a supply_date/created_at falls in, in the current time zone (as TruncMonth)."""
+    return _month_start(timezone.localtime(value))
+
+
+def _month_datetime(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def closed_months_before(now=None):
+    """First month that is still open; every earlier month is frozen."""
+    now = timezone.localtime(now or timezone.now())
+    return _month_start((now - timedelta(days=ROLLUP_CLOSE_GRACE_DAYS)).date())
+
+
+def _supply_aggregates():
+    aggregates = {}
+    for status_value, _ in SupplyRecord.STATUS_CHOICES:
+        prefix = status_value.lower()
+        aggregates[f"{prefix}_count"] = Count("id", filter=Q(status=status_value))
+        aggregates[f"{prefix}_quantity"] = Sum("quantity", filter=Q(status=status_value))
+    return aggregates
+
+
+def _stock_aggregates():
+    return {
+        "stock_in": Sum("quantity", filter=~Q(change_type="OUT")),
+        "stock_out": Sum("quantity", filter=Q(change_type="OUT")),
+    }
+
+
+def _dirty_keys(qs, date_field, farmer_path, product_path, open_from, since):
+    if since is not None:
+        qs = qs.filter(**{f"{date_field[1]}__gte": since})
+    if open_from is not None:
+        qs = qs.filter(**{f"{date_field[0]}__gte": _month_datetime(open_from)})
+    return set(
+        qs.annotate(month=TruncMonth(date_field[0], output_field=DateField()))
+        .values_list(farmer_path, product_path, "month")
+        .distinct()
+        .order_by()
+    )
+
+
+def _recompute(qs, date_field, farmer_path, product_path, keys, aggregates):
+    """Aggregate the source rows for the given (farmer, product, month) keys in one grouped query."""
+    if not keys:
+        return {}
+    months = {k[2] for k in keys}
+    rows = (
+        qs.filter(
+            **{f"{farmer_path}__in": {k[0] for k in keys}},
+            **{
+                f"{date_field}__gte": _month_datetime(min(months)),
+                f"{date_field}__lt": _month_datetime(_next_month(max(months))),
+            },
+        )
+        .annotate(month=TruncMonth(date_field, output_field=DateField()))
+        .values(farmer_path, product_path, "month")
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {(r[farmer_path], r[product_path], r["month"]): r for r in rows}
+
+
+def _upsert_rollups(keys, totals, product_attr, fields, now):
+    """
+    Write recomputed totals for `keys`; existing rows for keys with no
+    remaining source rows are zeroed, missing ones are not created.
+    """
+    if not keys:
+        return 0
+    existing = {
+        (r.farmer_id, getattr(r, product_attr), r.month): r
+        for r in FarmerMonthlyRollup.objects.filter(
+            farmer_id__in={k[0] for k in keys},
+            month__in={k[2] for k in keys},
+            listing__isnull=(product_attr == "farmer_product_id"),
+        )
+    }
+
+    to_create, to_update = [], []
+    for key in keys:
+        values = totals.get(key, {})
+        row = existing.get(key)
+        if row is None:
+            if not values:
+                continue
+            row = FarmerMonthlyRollup(farmer_id=key[0], month=key[2], **{product_attr: key[1]})
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        for field in fields:
+            default = 0 if field.endswith("_count") else Decimal("0")
+            setattr(row, field, values.get(field) or default)
+        row.refreshed_at = now
+
+    FarmerMonthlyRollup.objects.bulk_create(to_create)
+    FarmerMonthlyRollup.objects.bulk_update(to_update, [*fields, "refreshed_at"])
+    return len(to_create) + len(to_update)
+
+
+def refresh_farmer_rollups(now=None, full=False) -> dict:
+    """
+    Bring FarmerMonthlyRollup up to date from SupplyRecord and InventoryRecord.
+
+    Only (farmer, product, month) keys touched since the previous run's start
+    are recomputed (supply rows by updated_at, inventory rows by created_at,
+    plus the keys reports.signals queued for moved or deleted supply rows),
+    each in one grouped query per source, so the cost follows the amount of
+    new activity rather than the length of history. Months older than the
+    close grace period are frozen first and never recomputed again, unless
+    `full` rebuilds everything.
+
+    Bulk QuerySet.update()/delete() on SupplyRecord and deleted InventoryRecord
+    rows are not seen incrementally; run with `full` after such edits.
+    """
+    now = now or timezone.now()
+    open_from = None if full else closed_months_before(now)
+
+    with transaction.atomic():
+        watermark = None
+        if not full:
+            # locking the last run serialises concurrent refreshes
+            last_run = FarmerRollupRefresh.objects.select_for_update().order_by("-id").first()
+            if last_run is not None:
+                watermark = last_run.started_at - ROLLUP_REFRESH_OVERLAP
+
+        closed = 0
+        if not full:
+            closed = FarmerMonthlyRollup.objects.filter(month__lt=open_from, is_closed=False).update(is_closed=True)
+
+        queued = list(FarmerRollupDirtyKey.objects.values_list("id", "farmer_id", "farmer_product_id", "month"))
+        supply_qs = SupplyRecord.objects.all()
+        supply_keys = _dirty_keys(
+            supply_qs, ("supply_date", "updated_at"), "farmer_id", "product_id", open_from, watermark
+        )
+        supply_keys.update(
+            (farmer_id, product_id, month)
+            for _, farmer_id, product_id, month in queued
+            if open_from is None or month >= open_from
+        )
+        supply_totals = _recompute(
+            supply_qs, "supply_date", "farmer_id", "product_id", supply_keys, _supply_aggregates()
+        )
+
+        stock_qs = InventoryRecord.objects.all()
+        stock_keys = _dirty_keys(
+            stock_qs, ("created_at", "created_at"), "product__farmer_id", "product_id", open_from, watermark
+        )
+        stock_totals = _recompute(
+            stock_qs, "created_at", "product__farmer_id", "product_id", stock_keys, _stock_aggregates()
+        )
+
+        refreshed = _upsert_rollups(supply_keys, supply_totals, "farmer_product_id", ROLLUP_SUPPLY_FIELDS, now)
+        refreshed += _upsert_rollups(stock_keys, stock_totals, "listing_id", ROLLUP_STOCK_FIELDS, now)
+
+        if full:
+            FarmerMonthlyRollup.objects.filter(refreshed_at__lt=now).delete()
+            FarmerMonthlyRollup.objects.filter(month__lt=closed_months_before(now)).update(is_closed=True)
+
+        FarmerRollupDirtyKey.objects.filter(id__in=[row[0] for row in queued]).delete()
+        FarmerRollupRefresh.objects.create(started_at=now, keys_refreshed=refreshed, full_rebuild=full)
+
+    return {"refreshed": refreshed, "closed": closed}
+
+
+def _rollup_totals(qs):
+    fields = (*ROLLUP_SUPPLY_FIELDS, *ROLLUP_STOCK_FIELDS)
+    return qs.order_by().values("month").annotate(**{f: Sum(f) for f in fields}).order_by("month")
+
+
+def get_farmer_statement(farmer_id, start_month, end_month):
+    """
+    Month-by-month supply and stock statement for one farmer, read only from
+    FarmerMonthlyRollup: one grouped query over at most (months x products) rows.
+    """
+    qs = FarmerMonthlyRollup.objects.filter(farmer_id=farmer_id, month__gte=start_month, month__lte=end_month)
+    return {
+        "farmer": farmer_id,
+        "start_month": start_month,
+        "end_month": end_month,
+        "months": list(_rollup_totals(qs)),
+    }
+
+
+def get_supply_report(start_date, end_date):
+    """
+    Platform-wide supply and stock totals for the months overlapping the range,
+    read only from FarmerMonthlyRollup.
+    """
+    qs = FarmerMonthlyRollup.objects.filter(
+        month__gte=_month_start(timezone.localtime(start_date)),
+        month__lte=_month_start(timezone.localtime(end_date)),
+    )
+    months = list(_rollup_totals(qs))
+    totals = {
+        field: sum((m[field] or 0 for m in months), 0 if field.endswith("_count") else Decimal("0"))
+        for field in (*ROLLUP_SUPPLY_FIELDS, *ROLLUP_STOCK_FIELDS)
+    }
+    return {"totals": totals, "months": months}
+
+
+def first_open_kpi_day(now=None):
+    """First day whose logistics KPIs may still change; every earlier day is stored."""
+    return timezone.localdate(now or timezone.now()) - timedelta(days=LOGISTICS_KPI_CLOSE_GRACE_DAYS)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def dispatch_outcomes(start, end):
+    """
+    One row per dispatch that reached DELIVERED, FAILED or RETURNED in
+    [start, end), with its first pickup, delivery and failure times, agent,
+    dropoff address and ETA. Window functions partitioned by dispatch do the
+    per-dispatch work inside the database, in a single query; callers drop
+    dispatches whose first outcome came before `start`.
+    """
+    finished = DispatchStatusUpdate.objects.filter(
+        status__in=("DELIVERED", *FAILED_DISPATCH_STATUSES), occurred_at__gte=start, occurred_at__lt=end
+    ).values("dispatch_id")
+    per_dispatch = {"partition_by": [F("dispatch_id")]}
+
+    def first(*states):
+        return Window(Min("occurred_at", filter=Q(status__in=states)), **per_dispatch)
+
+    return (
+        DispatchStatusUpdate.objects.filter(dispatch_id__in=finished)
+        .annotate(
+            picked_up_at=first("PICKED_UP"),
+            delivered_at=first("DELIVERED"),
+            failed_at=first(*FAILED_DISPATCH_STATUSES),
+            row_number=Window(RowNumber(), order_by=F("occurred_at").asc(), **per_dispatch),
+        )
+        .filter(row_number=1)
+        .values(
+            "dispatch_id", "dispatch__assigned_agent", "dispatch__dropoff_address",
+            "dispatch__estimated_delivery_time", "picked_up_at", "delivered_at", "failed_at",
+        )
+        .order_by()
+    )
+
+
+def compute_logistics_kpis(first_day, last_day):
+    """
+    Live KPIs for the local days first_day..last_day, keyed by
+    (day, dimension, key) with LOGISTICS_KPI_FIELDS values. A dispatch
+    counts on the day of its first outcome: delivered, or failed/returned.
+    """
+    start, end = _day_start(first_day), _day_start(last_day + timedelta(days=1))
+    kpis = defaultdict(lambda: dict.fromkeys(LOGISTICS_KPI_FIELDS, 0))
+    for row in dispatch_outcomes(start, end).iterator(chunk_size=2000):
+        delivered_at, failed_at = row["delivered_at"], row["failed_at"]
+        finished_at = min(moment for moment in (delivered_at, failed_at) if moment is not None)
+        if not start <= finished_at < end:
+            continue
+        day = timezone.localtime(finished_at).date()
+        keys = [(day, "all", ""), (day, "zone", dispatch_area(row["dispatch__dropoff_address"]))]
+        if row["dispatch__assigned_agent"]:
+            keys.append((day, "agent", str(row["dispatch__assigned_agent"])))
+
+        delivered = finished_at == delivered_at
+        eta = row["dispatch__estimated_delivery_time"]
+        picked_up_at = row["picked_up_at"]
+        for key in keys:
+            values = kpis[key]
+            if not delivered:
+                values["failed"] += 1
+                continue
+            values["deliveries"] += 1
+            if eta is not None:
+                values["with_eta"] += 1
+                values["on_time"] += delivered_at <= eta
+            if picked_up_at is not None and picked_up_at <= delivered_at:
+                values["pickup_to_delivery_count"] += 1
+                values["pickup_to_delivery_seconds"] += (delivered_at - picked_up_at).total_seconds()
+    return kpis
+
+
+def store_logistics_kpis(first_day, last_day, now=None):
+    """
+    Compute and store LogisticsDailyKpi rows for the closed days in
+    first_day..last_day that are not stored yet. Returns the number of days stored.
+    """
+    now = now or timezone.now()
+    last_day = min(last_day, first_open_kpi_day(now) - timedelta(days=1))
+    if first_day > last_day:
+        return 0
+    stored = set(
+        LogisticsDailyKpi.objects.filter(dimension="all", day__gte=first_day, day__lte=last_day)
+        .values_list("day", flat=True)
+    )
+    missing = [
+        first_day + timedelta(days=offset)
+        for offset in range((last_day - first_day).days + 1)
+        if first_day + timedelta(days=offset) not in stored
+    ]
+    if not missing:
+        return 0
+
+    kpis = compute_logistics_kpis(missing[0], missing[-1])
+    for day in missing:
+        kpis[(day, "all", "")]  # an empty day still gets its marker row
+    LogisticsDailyKpi.objects.bulk_create(
+        [
+            LogisticsDailyKpi(day=day, dimension=dimension, key=key, computed_at=now, **values)
+            for (day, dimension, key), values in kpis.items()
+            if day not in stored
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return len(missing)
+
+
+def refresh_logistics_kpis(days=7, rebuild=False, now=None):
+    """
+    Nightly: store the KPIs of days that closed recently (the last `days`
+    closed days). `rebuild` recomputes those days even if already stored.
+    """
+    now = now or timezone.now()
+    last_day = first_open_kpi_day(now) - timedelta(days=1)
+    first_day = last_day - timedelta(days=days - 1)
+    if rebuild:
+        LogisticsDailyKpi.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+    return store_logistics_kpis(first_day, last_day, now)
+
+
+def _kpi_summary(values):
+    deliveries, failed = values["deliveries"], values["failed"]
+    return {
+        "deliveries": deliveries,
+        "failed": failed,
+        "success_rate": round(deliveries / (deliveries + failed), 4) if deliveries + failed else None,
+        "on_time_rate": round(values["on_time"] / values["with_eta"], 4) if values["with_eta"] else None,
+        "avg_pickup_to_delivery_minutes": (
+            round(values["pickup_to_delivery_seconds"] / values["pickup_to_delivery_count"] / 60, 1)
+            if values["pickup_to_delivery_count"] else None
+        ),
+    }
+
+
+def _sum_kpis(rows):
+    total = dict.fromkeys(LOGISTICS_KPI_FIELDS, 0)
+    for values in rows:
+        for field in LOGISTICS_KPI_FIELDS:
+            total[field] += values[field]
+    return total
+
+
+def get_logistics_report(start_date, end_date, now=None):
+    """
+    Delivery KPIs for the local days from start_date to end_date: per day
+    for all dispatches, and per agent and per dropoff zone (range totals
+    plus a daily breakdown). Closed days come from LogisticsDailyKpi (stored
+    on first request if the nightly job has not done so) and open days are
+    computed live, so a month-long report reads at most two open days of
+    status updates.
+    """
+    now = now or timezone.now()
+    first_day = timezone.localtime(start_date).date()
+    last_day = timezone.localtime(end_date).date()
+    day_count = (last_day - first_day).days + 1
+    if day_count > LOGISTICS_KPI_MAX_DAYS:
+        raise ValueError(f"Logistics reports cover at most {LOGISTICS_KPI_MAX_DAYS} days.")
+
+    first_open = first_open_kpi_day(now)
+    kpis = {}
+    if first_day < first_open:
+        store_logistics_kpis(first_day, last_day, now)
+        for row in LogisticsDailyKpi.objects.filter(
+            day__gte=first_day, day__lte=min(last_day, first_open - timedelta(days=1))
+        ).values("day", "dimension", "key", *LOGISTICS_KPI_FIELDS):
+            kpis[(row["day"], row["dimension"], row["key"])] = row
+    if last_day >= first_open:
+        kpis.update(compute_logistics_kpis(max(first_day, first_open), last_day))
+
+    by_dimension = defaultdict(lambda: defaultdict(dict))
+    for (day, dimension, key), values in kpis.items():
+        by_dimension[dimension][key][day] = values
+    empty = dict.fromkeys(LOGISTICS_KPI_FIELDS, 0)
+    days = [first_day + timedelta(days=offset) for offset in range(max(day_count, 0))]
+
+    def breakdown(dimension, label):
+        entries = []
+        for key, per_day in by_dimension[dimension].items():
+            total = _sum_kpis(per_day.values())
+            entries.append({
+                label: key,
+                **_kpi_summary(total),
+                "deliveries_per_day": round(total["deliveries"] / day_count, 2),
+                "days": [{"day": day, **_kpi_summary(per_day[day])} for day in sorted(per_day)],
+            })
+        entries.sort(key=lambda entry: (-entry["deliveries"], entry[label]))
+        return entries
+
+    overall = by_dimension["all"][""]
+    agents = breakdown("agent", "agent")
+    names = {
+        str(pk): name
+        for pk, name in LogisticsAgent.objects.filter(pk__in=[entry["agent"] for entry in agents]).values_list("id", "full_name")
+    }
+    for entry in agents:
+        entry["agent_name"] = names.get(entry["agent"], "")
+    return {
+        "start_day": first_day,
+        "end_day": last_day,
+        "totals": _kpi_summary(_sum_kpis(overall.values())),
+        "days": [{"day": day, **_kpi_summary(overall.get(day, empty))} for day in days],
+        "agents": agents,
+        "zones": breakdown("zone", "zone"),
+    }
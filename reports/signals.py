@@ -0,0 +1,38 @@
+# reports/signals.py
+"""
+Queue the rollup keys a SupplyRecord leaves behind: its previous
+(farmer, product, month) when one of those changes, and its key when it is
+deleted. refresh_farmer_rollups finds every other change by updated_at.
+QuerySet.update()/delete() and the product SET_NULL on FarmerProduct delete
+bypass these handlers; run `refresh_farmer_rollups --full` after such bulk edits.
+"""
+from django.db.models.signals import pre_save, post_delete
+from django.dispatch import receiver
+
+from farmers.models import SupplyRecord
+
+from .models import FarmerRollupDirtyKey
+from .services import rollup_month
+
+
+@receiver(pre_save, sender=SupplyRecord, dispatch_uid="reports_supply_previous_rollup_key")
+def queue_previous_rollup_key(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values("farmer_id", "product_id", "supply_date").first()
+    if previous is None:
+        return
+    month = rollup_month(previous["supply_date"])
+    if (previous["farmer_id"], previous["product_id"], month) != (
+        instance.farmer_id, instance.product_id, rollup_month(instance.supply_date)
+    ):
+        FarmerRollupDirtyKey.objects.create(
+            farmer_id=previous["farmer_id"], farmer_product_id=previous["product_id"], month=month
+        )
+
+
+@receiver(post_delete, sender=SupplyRecord, dispatch_uid="reports_supply_deleted_rollup_key")
+def queue_deleted_rollup_key(sender, instance, **kwargs):
+    FarmerRollupDirtyKey.objects.create(
+        farmer_id=instance.farmer_id, farmer_product_id=instance.product_id, month=rollup_month(instance.supply_date)
+    )
@@ -0,0 +1,23 @@
+try:
+    from celery import shared_task
+except ImportError:  # pragma: no cover - optional dependency for tests
+    def shared_task(func=None, **_kwargs):
+        if func is None:
+            def wrapper(f):
+                return f
+            return wrapper
+        return func
+
+from .services import refresh_farmer_rollups, refresh_logistics_kpis
+
+
+@shared_task
+def refresh_farmer_rollups_task():
+    """Periodic (e.g. every 15 minutes) incremental refresh of FarmerMonthlyRollup."""
+    return refresh_farmer_rollups()
+
+
+@shared_task
+def refresh_logistics_kpis_task():
+    """Nightly: store the KPIs of logistics days that have just closed."""
+    return refresh_logistics_kpis()
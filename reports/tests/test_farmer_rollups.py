@@ -0,0 +1,176 @@
+import pytest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from farmers.models import Farmer, FarmerProduct, SupplyRecord
+from marketplace.models import InventoryRecord, Product
+from reports import services
+from reports.models import FarmerMonthlyRollup, FarmerRollupDirtyKey, FarmerRollupRefresh
+
+User = get_user_model()
+
+
+def _at(year, month, day=10):
+    return timezone.make_aware(datetime(year, month, day, 12))
+
+
+@pytest.fixture
+def farm():
+    farmer = Farmer.objects.create(contact_name="Rollup Farmer")
+    product = FarmerProduct.objects.create(farmer=farmer, title="Maize", price_per_unit=1, quantity_available=1)
+    listing = Product.objects.create(farmer=farmer, title="Maize", price="1.00")
+    return farmer, product, listing
+
+
+def _supply(farmer, product, quantity, when, status_value="PENDING"):
+    return SupplyRecord.objects.create(
+        farmer=farmer, product=product, quantity=quantity, supply_date=when, status=status_value
+    )
+
+
+def _movement(listing, change_type, quantity, when):
+    record = InventoryRecord.objects.create(product=listing, change_type=change_type, quantity=quantity)
+    InventoryRecord.objects.filter(pk=record.pk).update(created_at=when)
+
+
+@pytest.mark.django_db
+def test_refresh_rolls_up_supply_and_stock_by_month(farm):
+    farmer, product, listing = farm
+    now = _at(2026, 3, 20)
+    _supply(farmer, product, "10", _at(2026, 3), "APPROVED")
+    _supply(farmer, product, "4", _at(2026, 3), "APPROVED")
+    _supply(farmer, product, "2", _at(2026, 3), "REJECTED")
+    _supply(farmer, None, "1", _at(2026, 3))
+    _movement(listing, "IN", 8, _at(2026, 3))
+    _movement(listing, "OUT", 3, _at(2026, 3))
+
+    services.refresh_farmer_rollups(now=now)
+    row = FarmerMonthlyRollup.objects.get(farmer_product=product)
+    assert (row.month, row.approved_count, row.approved_quantity) == (date(2026, 3, 1), 2, Decimal("14"))
+    assert (row.rejected_count, row.rejected_quantity) == (1, Decimal("2"))
+    stock = FarmerMonthlyRollup.objects.get(listing=listing)
+    assert (stock.stock_in, stock.stock_out) == (Decimal("8"), Decimal("3"))
+    assert FarmerMonthlyRollup.objects.get(farmer_product=None, listing=None).pending_count == 1
+
+    # A status change is picked up incrementally and re-homes the quantity
+    record = SupplyRecord.objects.filter(status="REJECTED").get()
+    record.status = "APPROVED"
+    record.save()
+    services.refresh_farmer_rollups(now=now + timedelta(hours=1))
+    row.refresh_from_db()
+    assert (row.approved_count, row.rejected_count) == (3, 0)
+    assert row.rejected_quantity == Decimal("0")
+
+
+@pytest.mark.django_db
+def test_closed_months_are_frozen(farm):
+    farmer, product, _ = farm
+    _supply(farmer, product, "5", _at(2026, 1))
+    services.refresh_farmer_rollups(now=_at(2026, 1, 25))
+
+    services.refresh_farmer_rollups(now=_at(2026, 3, 1))
+    row = FarmerMonthlyRollup.objects.get(month=date(2026, 1, 1))
+    assert row.is_closed
+
+    # A late correction to a closed month does not move the frozen figures ...
+    _supply(farmer, product, "7", _at(2026, 1))
+    services.refresh_farmer_rollups(now=_at(2026, 3, 2))
+    row.refresh_from_db()
+    assert row.pending_quantity == Decimal("5")
+
+    # ... until an explicit rebuild
+    call_command("refresh_farmer_rollups", "--full")
+    row.refresh_from_db()
+    assert row.pending_quantity == Decimal("12")
+    assert row.is_closed
+
+
+@pytest.mark.django_db
+def test_statement_cost_is_independent_of_history_length(client, farm):
+    farmer, product, listing = farm
+    user = User.objects.create_user(email="rollup_farmer@example.com", password="p", full_name="Rollup", role="farmer")
+    user.is_verified = True
+    user.save(update_fields=["is_verified"])
+    farmer.user = user
+    farmer.save()
+    client.force_login(user)
+
+    today = timezone.localdate()
+    _supply(farmer, product, "1", timezone.now())
+    services.refresh_farmer_rollups()
+    with CaptureQueriesContext(connection) as short:
+        r = client.get("/api/reports/farmer-statements/")
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["data"]["months"][-1]["pending_count"] == 1
+
+    for months_back in range(1, 40):
+        when = timezone.now() - timedelta(days=31 * months_back)
+        _supply(farmer, product, "1", when)
+        _movement(listing, "IN", 1, when)
+    services.refresh_farmer_rollups(full=True)
+    with CaptureQueriesContext(connection) as long:
+        r = client.get("/api/reports/farmer-statements/", {"end_month": f"{today:%Y-%m}"})
+    assert len(r.json()["data"]["months"]) == 12
+    assert len(long.captured_queries) == len(short.captured_queries)
+
+
+@pytest.mark.django_db
+def test_admin_supply_report_reads_rollups(client, farm):
+    farmer, product, _ = farm
+    admin = User.objects.create_superuser(username="admin_rollup", password="p", email="admin_rollup@test.com")
+    client.force_login(admin)
+    _supply(farmer, product, "6", timezone.now(), "APPROVED")
+    services.refresh_farmer_rollups()
+
+    r = client.get("/api/reports/supply/?period=monthly")
+    assert r.status_code == status.HTTP_200_OK
+    assert Decimal(r.json()["data"]["totals"]["approved_quantity"]) == Decimal("6")
+
+    r_statement = client.get("/api/reports/farmer-statements/", {"farmer": str(farmer.id)})
+    assert r_statement.status_code == status.HTTP_200_OK
+    assert client.get("/api/reports/farmer-statements/").status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_watermark_advances_on_runs_without_changes(farm):
+    farmer, product, _ = farm
+    services.refresh_farmer_rollups(now=_at(2026, 3, 20))
+    services.refresh_farmer_rollups(now=_at(2026, 3, 21))
+    assert FarmerRollupRefresh.objects.first().started_at == _at(2026, 3, 21)
+
+    # Both runs wrote no rollups, yet an edit older than the last run is not rescanned
+    record = _supply(farmer, product, "5", _at(2026, 3))
+    SupplyRecord.objects.filter(pk=record.pk).update(updated_at=_at(2026, 3, 20) + timedelta(hours=6))
+    assert services.refresh_farmer_rollups(now=_at(2026, 3, 22))["refreshed"] == 0
+    assert not FarmerMonthlyRollup.objects.exists()
+
+
+@pytest.mark.django_db
+def test_moved_and_deleted_supply_clear_their_previous_keys(farm):
+    farmer, product, _ = farm
+    other = FarmerProduct.objects.create(farmer=farmer, title="Beans", price_per_unit=1, quantity_available=1)
+    now = _at(2026, 3, 20)
+    moved = _supply(farmer, product, "5", _at(2026, 3))
+    deleted = _supply(farmer, None, "3", _at(2026, 3))
+    services.refresh_farmer_rollups(now=now)
+
+    moved.supply_date = _at(2026, 4)
+    moved.product = other
+    moved.save()
+    deleted.delete()
+    assert FarmerRollupDirtyKey.objects.count() == 2
+    services.refresh_farmer_rollups(now=now + timedelta(hours=1))
+
+    def pending(key_product, month):
+        return FarmerMonthlyRollup.objects.get(farmer_product=key_product, listing=None, month=month).pending_quantity
+
+    assert pending(product, date(2026, 3, 1)) == Decimal("0")
+    assert pending(None, date(2026, 3, 1)) == Decimal("0")
+    assert pending(other, date(2026, 4, 1)) == Decimal("5")
+    assert not FarmerRollupDirtyKey.objects.exists()
@@ -0,0 +1,103 @@
+import pytest
+from datetime import date, datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from logistics.models import Dispatch, DispatchStatusUpdate, LogisticsAgent
+from reports import services
+from reports.models import LogisticsDailyKpi
+
+User = get_user_model()
+
+NOW = timezone.make_aware(datetime(2026, 10, 19, 12))  # days up to Oct 16 are closed
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2026, 10, day, hour, minute))
+
+
+def _dispatch(agent, dropoff, timeline, eta=None):
+    dispatch = Dispatch.objects.create(assigned_agent=agent, dropoff_address=dropoff, estimated_delivery_time=eta)
+    for state, moment in timeline:
+        DispatchStatusUpdate.objects.create(dispatch=dispatch, status=state, occurred_at=moment)
+    return dispatch
+
+
+@pytest.fixture
+def agents():
+    return LogisticsAgent.objects.create(full_name="Ada"), LogisticsAgent.objects.create(full_name="Bayo")
+
+
+@pytest.fixture
+def deliveries(agents):
+    ada, bayo = agents
+    _dispatch(ada, "1 Road, Yaba", [
+        ("ASSIGNED", _at(10, 8)), ("PICKED_UP", _at(10, 8, 30)), ("DELIVERED", _at(10, 9, 30)),
+    ], eta=_at(10, 10))
+    _dispatch(ada, "2 Road, Yaba", [
+        ("ASSIGNED", _at(10, 9)), ("PICKED_UP", _at(10, 10)), ("DELIVERED", _at(10, 12)),
+    ], eta=_at(10, 11))
+    _dispatch(bayo, "3 Road, Ikeja", [("ASSIGNED", _at(11, 9)), ("FAILED", _at(11, 15))])
+    _dispatch(bayo, "4 Road, Ikeja", [("PICKED_UP", _at(18, 9)), ("DELIVERED", _at(18, 9, 30))])
+    # Delivered before the range; a duplicate DELIVERED inside it must not count again
+    _dispatch(ada, "5 Road, Yaba", [("DELIVERED", _at(5, 9)), ("DELIVERED", _at(10, 9))])
+
+
+@pytest.mark.django_db
+def test_report_combines_stored_closed_days_with_live_open_days(agents, deliveries):
+    report = services.get_logistics_report(_at(10, 0), _at(18, 0), now=NOW)
+    assert report["totals"] == {
+        "deliveries": 3, "failed": 1, "success_rate": 0.75, "on_time_rate": 0.5, "avg_pickup_to_delivery_minutes": 70.0,
+    }
+    assert len(report["days"]) == 9
+    assert [(d["day"], d["deliveries"], d["failed"]) for d in report["days"] if d["deliveries"] or d["failed"]] == [
+        (date(2026, 10, 10), 2, 0), (date(2026, 10, 11), 0, 1), (date(2026, 10, 18), 1, 0),
+    ]
+    ada, bayo = report["agents"]
+    assert (ada["agent_name"], ada["deliveries"], ada["on_time_rate"], ada["deliveries_per_day"]) == ("Ada", 2, 0.5, 0.22)
+    assert (bayo["agent_name"], bayo["deliveries"], bayo["failed"], bayo["avg_pickup_to_delivery_minutes"]) == (
+        "Bayo", 1, 1, 30.0,
+    )
+    assert [(z["zone"], z["deliveries"]) for z in report["zones"]] == [("yaba", 2), ("ikeja", 1)]
+
+    # Closed days Oct 10-16 were stored; the open days were not
+    stored_days = set(LogisticsDailyKpi.objects.filter(dimension="all").values_list("day", flat=True))
+    assert stored_days == {date(2026, 10, day) for day in range(10, 17)}
+
+
+@pytest.mark.django_db
+def test_closed_days_are_served_from_storage_until_rebuilt(agents, deliveries):
+    services.get_logistics_report(_at(10, 0), _at(16, 0), now=NOW)
+    _dispatch(agents[0], "6 Road, Yaba", [("DELIVERED", _at(12, 9))])
+
+    with CaptureQueriesContext(connection) as ctx:
+        report = services.get_logistics_report(_at(10, 0), _at(16, 0), now=NOW)
+    assert report["totals"]["deliveries"] == 2
+    assert not any("logistics_dispatchstatusupdate" in q["sql"] for q in ctx.captured_queries)
+
+    assert services.refresh_logistics_kpis(days=7, rebuild=True, now=NOW) == 7
+    assert services.get_logistics_report(_at(10, 0), _at(16, 0), now=NOW)["totals"]["deliveries"] == 3
+
+
+@pytest.mark.django_db
+def test_logistics_report_endpoint_and_command(client, agents, deliveries):
+    admin = User.objects.create_superuser(username="kpi_admin", password="p", email="kpi_admin@test.com")
+    admin.is_verified = True
+    admin.save(update_fields=["is_verified"])
+    client.force_login(admin)
+
+    r = client.get("/api/reports/logistics/", {"period": "custom", "start_date": "2026-10-10", "end_date": "2026-10-18"})
+    assert r.status_code == status.HTTP_200_OK
+    data = r.json()["data"]
+    assert data["totals"]["deliveries"] == 3
+    assert data["agents"][0]["agent_name"] == "Ada"
+
+    r_long = client.get("/api/reports/logistics/", {"period": "custom", "start_date": "2020-01-01", "end_date": "2026-10-18"})
+    assert r_long.status_code == status.HTTP_400_BAD_REQUEST
+
+    call_command("refresh_logistics_kpis", "--days", "3")
+    assert LogisticsDailyKpi.objects.filter(dimension="all").count() >= 3
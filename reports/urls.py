@@ -5,6 +5,9 @@ from .views import (
     OrderReportViewSet,
     PaymentReportViewSet,
     ReviewReportViewSet,
+    FarmerStatementViewSet,
+    SupplyReportViewSet,
+    LogisticsReportViewSet,
 )
 
 router = DefaultRouter()
@@ -13,5 +16,8 @@ router.register(r"users", UserReportViewSet, basename="reports-users")
 router.register(r"orders", OrderReportViewSet, basename="reports-orders")
 router.register(r"payments", PaymentReportViewSet, basename="reports-payments")
 router.register(r"reviews", ReviewReportViewSet, basename="reports-reviews")
+router.register(r"farmer-statements", FarmerStatementViewSet, basename="reports-farmer-statements")
+router.register(r"supply", SupplyReportViewSet, basename="reports-supply")
+router.register(r"logistics", LogisticsReportViewSet, basename="reports-logistics")
 
 urlpatterns = router.urls
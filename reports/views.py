@@ -1,10 +1,11 @@
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
-from rest_framework.permissions import IsAdminUser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from accounts.permissions import IsEmailVerified
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 from rest_framework.exceptions import ValidationError
+from django.core.exceptions import ValidationError as DjangoValidationError
 
 from . import services
 from .serializers import (
@@ -13,7 +14,11 @@ from .serializers import (
     PaymentReportSerializer,
     ReviewReportSerializer,
     DashboardSummarySerializer,
+    FarmerStatementSerializer,
+    SupplyReportSerializer,
+    LogisticsReportSerializer,
 )
+from farmers.models import Farmer
 def parse_date_range(request):
     now = timezone.now()
     period = request.query_params.get("period", "custom")
@@ -83,3 +88,69 @@ class ReviewReportViewSet(ViewSet):
         data = services.get_review_report(start_date, end_date)
         serializer = ReviewReportSerializer(data)
         return Response(serializer.data)
+
+
+def parse_month(value, default):
+    if not value:
+        return default
+    try:
+        year, month = (int(part) for part in value.split("-")[:2])
+        return date(year, month, 1)
+    except (TypeError, ValueError):
+        raise ValidationError("Months must be given as YYYY-MM.")
+
+
+class FarmerStatementViewSet(ViewSet):
+    """
+    Farmer-facing monthly statement built from FarmerMonthlyRollup only.
+    Farmers see their own profile; staff pass ?farmer=<id>.
+    Range: ?start_month=YYYY-MM&end_month=YYYY-MM (default: the last 12 months).
+    """
+    permission_classes = [IsAuthenticated, IsEmailVerified]
+
+    def list(self, request):
+        if request.user.is_staff:
+            farmer_id = request.query_params.get("farmer")
+            if not farmer_id:
+                raise ValidationError("Provide ?farmer=<id>.")
+            try:
+                farmer = Farmer.objects.only("id").get(pk=farmer_id)
+            except (Farmer.DoesNotExist, ValueError, DjangoValidationError):
+                raise ValidationError("Unknown farmer.")
+        else:
+            farmer = getattr(request.user, "farmer_profile", None)
+            if farmer is None:
+                raise ValidationError("No farmer profile is linked to this account.")
+
+        today = timezone.localdate()
+        end_month = parse_month(request.query_params.get("end_month"), date(today.year, today.month, 1))
+        default_start = date(end_month.year - (end_month.month < 12), (end_month.month % 12) + 1, 1)
+        start_month = parse_month(request.query_params.get("start_month"), default_start)
+        data = services.get_farmer_statement(farmer.id, start_month, end_month)
+        serializer = FarmerStatementSerializer(data)
+        return Response(serializer.data)
+class SupplyReportViewSet(ViewSet):
+    permission_classes = [IsAdminUser, IsEmailVerified]
+
+    def list(self, request):
+        start_date, end_date = parse_date_range(request)
+        data = services.get_supply_report(start_date, end_date)
+        serializer = SupplyReportSerializer(data)
+        return Response(serializer.data)
+
+
+class LogisticsReportViewSet(ViewSet):
+    """
+    Daily delivery KPIs (success and on-time rates, pickup-to-delivery time,
+    per-agent throughput) overall, per agent and per dropoff zone.
+    """
+    permission_classes = [IsAdminUser, IsEmailVerified]
+
+    def list(self, request):
+        start_date, end_date = parse_date_range(request)
+        try:
+            data = services.get_logistics_report(start_date, end_date)
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+        serializer = LogisticsReportSerializer(data)
+        return Response(serializer.data)